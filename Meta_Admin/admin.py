@@ -1,8 +1,17 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
 from django import forms
+from django.db import transaction
+from django.db.models import Case, Count, F, Value, When
+from django.db.models.functions import Replace
 from django.shortcuts import render, redirect
+from django.utils import timezone
+
+from core.versioning import bump_version
 
 from .models import Project, Task, Tag, ProjectFile, SubTask, Category
+from .signals import TASKS_TABLES
+from .stats import invalidate_tasks_stats
 
 
 class ReplaceCharactersForm(forms.Form):
@@ -15,35 +24,115 @@ class ProjectAdmin(admin.ModelAdmin):
     list_display = ("id", "name", "count_of_files", "created_at")
     actions = ["replace_characters"]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate_files_count()
+
+    @admin.display(description="Кол-во файлов", ordering="files_count")
+    def count_of_files(self, obj):
+        """Число файлов проекта (значение уже посчитано в SQL)."""
+        return obj.count_of_files
+
+    # сколько примеров «было -> станет» показывать в предпросмотре
+    PREVIEW_LIMIT = 10
+
     @admin.action(description="Заменить символы в названии")
     def replace_characters(self, request, queryset):
-        # Нажали кнопку "Выполнить замену" на нашей форме
-        if "apply" in request.POST:
+        """
+        Замена одним UPDATE ... SET name = REPLACE(name, old, new).
+        "preview" — только счётчики и несколько примеров, "apply" — замена
+        после проверки уникальности новых названий.
+        """
+        context = {
+            # id выбранных строк берём из POST как есть: объекты не загружаются
+            "selected_ids": request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            "select_across": request.POST.get("select_across", "0"),
+        }
+        if "apply" in request.POST or "preview" in request.POST:
             form = ReplaceCharactersForm(request.POST)
             if form.is_valid():
                 old_char = form.cleaned_data["old_char"]
                 new_char = form.cleaned_data["new_char"]
 
-                for obj in queryset:
-                    if obj.name:
-                        obj.name = obj.name.replace(old_char, new_char)
-                        obj.save()
-
-                self.message_user(request, "Символы в названиях успешно заменены")
-                return redirect(request.get_full_path())
+                if "preview" in request.POST:
+                    context["preview"] = self._replace_preview(queryset, old_char, new_char)
+                else:
+                    with transaction.atomic():
+                        conflicts = self._replace_conflicts(queryset, old_char, new_char)
+                        if not conflicts:
+                            updated = self._renamed(queryset, old_char, new_char).update(
+                                name=self._replaced_name(old_char, new_char)
+                            )
+                    if not conflicts:
+                        self.message_user(request, f"Символы заменены в названиях проектов: {updated}")
+                        return redirect(request.get_full_path())
+                    self.message_user(
+                        request,
+                        "Замена не выполнена: совпадут названия " + ", ".join(f"«{name}»" for name in conflicts),
+                        level=messages.ERROR,
+                    )
         else:
             # Первый заход — просто показываем форму
             form = ReplaceCharactersForm()
 
-        context = {
-            "form": form,
-            "queryset": queryset,
-        }
+        context["form"] = form
         return render(request, "admin/replace_characters.html", context)
 
+    @staticmethod
+    def _replaced_name(old_char, new_char):
+        return Replace(F("name"), Value(old_char), Value(new_char))
+
+    def _renamed(self, queryset, old_char, new_char):
+        # сравнение с результатом REPLACE вместо name__contains: LIKE в SQLite
+        # не различает регистр, а REPLACE различает
+        return queryset.alias(new_name=self._replaced_name(old_char, new_char)).exclude(name=F("new_name"))
+
+    def _replace_preview(self, queryset, old_char, new_char):
+        counts = queryset.aggregate(selected=Count("pk"))
+        renamed = self._renamed(queryset, old_char, new_char)
+        counts["affected"] = renamed.count()
+        counts["examples"] = list(
+            renamed.annotate(new_name=self._replaced_name(old_char, new_char))
+            .order_by("pk")
+            .values_list("name", "new_name")[: self.PREVIEW_LIMIT]
+        )
+        counts["conflicts"] = self._replace_conflicts(queryset, old_char, new_char)
+        return counts
+
+    def _replace_conflicts(self, queryset, old_char, new_char):
+        """
+        Названия, которые после замены встретятся больше одного раза —
+        среди выбранных или совпадут с невыбранным проектом. Один запрос
+        с GROUP BY по всем проектам. Project.name уникально, поэтому
+        проверка покрывает и unique_project_name_description.
+        """
+        selected = queryset.values("pk")
+        return list(
+            Project.objects.order_by()
+            .annotate(
+                new_name=Case(
+                    When(pk__in=selected, then=self._replaced_name(old_char, new_char)),
+                    default=F("name"),
+                )
+            )
+            .values("new_name")
+            .annotate(total=Count("pk"))
+            .filter(total__gt=1)
+            .values_list("new_name", flat=True)[: self.PREVIEW_LIMIT]
+        )
+
+
+class IndexedSearchMixin:
+    """Поиск в changelist через QuerySet.search() (поисковый индекс) вместо LIKE по search_fields."""
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
+
 
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ("id", "title", "project", "status", "priority", "assignee", "due_date")
     list_filter = ("status", "priority", "project")
     search_fields = ("title", "description")
@@ -57,38 +146,46 @@ class TaskAdmin(admin.ModelAdmin):
         "set_priority_very_high",
     ]
 
+    def _update_tasks(self, queryset, **fields):
+        # update() не вызывает сигналы и не трогает auto_now, поэтому
+        # updated_at, кэш статистики и версию для ETag обновляем сами
+        updated = queryset.update(updated_at=timezone.now(), **fields)
+        invalidate_tasks_stats()
+        bump_version(TASKS_TABLES)
+        return updated
+
     # ---------- СТАТУСЫ ----------
 
     @admin.action(description="Статус: Закрыто")
     def set_status_closed(self, request, queryset):
-        updated = queryset.update(status="Closed")
+        updated = self._update_tasks(queryset, status="Closed")
         self.message_user(request, f"Статус 'Closed' установлен у {updated} задач.")
 
     @admin.action(description="Статус: Новая")
     def set_status_new(self, request, queryset):
-        updated = queryset.update(status="New")
+        updated = self._update_tasks(queryset, status="New")
         self.message_user(request, f"Статус 'New' установлен у {updated} задач.")
 
     # ---------- ПРИОРИТЕТЫ ----------
 
     @admin.action(description="Приоритет: Низкий")
     def set_priority_low(self, request, queryset):
-        updated = queryset.update(priority="Low")
+        updated = self._update_tasks(queryset, priority="Low")
         self.message_user(request, f"Приоритет 'Low' установлен у {updated} задач.")
 
     @admin.action(description="Приоритет: Средний")
     def set_priority_medium(self, request, queryset):
-        updated = queryset.update(priority="Medium")
+        updated = self._update_tasks(queryset, priority="Medium")
         self.message_user(request, f"Приоритет 'Medium' установлен у {updated} задач.")
 
     @admin.action(description="Приоритет: Высокий")
     def set_priority_high(self, request, queryset):
-        updated = queryset.update(priority="High")
+        updated = self._update_tasks(queryset, priority="High")
         self.message_user(request, f"Приоритет 'High' установлен у {updated} задач.")
 
     @admin.action(description="Приоритет: Очень высокий")
     def set_priority_very_high(self, request, queryset):
-        updated = queryset.update(priority="Very High")
+        updated = self._update_tasks(queryset, priority="Very High")
         self.message_user(request, f"Приоритет 'Very High' установлен у {updated} задач.")
 
 
@@ -105,7 +202,7 @@ from .models import Project, Task, Tag, ProjectFile, SubTask, Category
 
 
 @admin.register(SubTask)
-class SubTaskAdmin(admin.ModelAdmin):
+class SubTaskAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ("id", "title", "task", "status", "created_at")
     list_filter = ("task", "status")
     search_fields = ("title", "description", "task__title")
@@ -118,24 +215,30 @@ class SubTaskAdmin(admin.ModelAdmin):
         "set_status_closed",
     ]
 
+    def _update_subtasks(self, queryset, **fields):
+        # update() не вызывает сигналы — версию для ETag списков поднимаем сами
+        updated = queryset.update(**fields)
+        bump_version(TASKS_TABLES)
+        return updated
+
     @admin.action(description="Статус подзадачи: New")
     def set_status_new(self, request, queryset):
-        updated = queryset.update(status=Task.STATUS_NEW)
+        updated = self._update_subtasks(queryset, status=Task.STATUS_NEW)
         self.message_user(request, f"Статус 'New' установлен у {updated} подзадач.")
 
     @admin.action(description="Статус подзадачи: Pending")
     def set_status_pending(self, request, queryset):
-        updated = queryset.update(status=Task.STATUS_PENDING)
+        updated = self._update_subtasks(queryset, status=Task.STATUS_PENDING)
         self.message_user(request, f"Статус 'Pending' установлен у {updated} подзадач.")
 
     @admin.action(description="Статус подзадачи: In Progress")
     def set_status_in_progress(self, request, queryset):
-        updated = queryset.update(status=Task.STATUS_IN_PROGRESS)
+        updated = self._update_subtasks(queryset, status=Task.STATUS_IN_PROGRESS)
         self.message_user(request, f"Статус 'In Progress' установлен у {updated} подзадач.")
 
     @admin.action(description="Статус подзадачи: Closed")
     def set_status_closed(self, request, queryset):
-        updated = queryset.update(status=Task.STATUS_CLOSED)
+        updated = self._update_subtasks(queryset, status=Task.STATUS_CLOSED)
         self.message_user(request, f"Статус 'Closed' установлен у {updated} подзадач.")
 
 
@@ -1,20 +1,37 @@
+import hashlib
+
 from django.contrib.admin.templatetags.admin_list import pagination
-from django.utils import timezone
-from django.db.models import Count
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Prefetch, sql
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
-from rest_framework.pagination import PageNumberPagination
-
-from .models import Task, SubTask
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.parsers import JSONParser
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from core.fastpath import FastListSerializer, wants_fast_path
+from core.response_cache import get_cached_payload
+from core.versioning import bump_version, concrete_fields, row_condition, row_version, versions_condition
+
+from .models import Task, SubTask, Tag
+from .parsers import NDJSONParser
+from .search import get_search_backend
+from .signals import TASKS_TABLES
+from .stats import get_tasks_stats, parse_project_ids
 from .serializers import (
     TaskCreateSerializer,
     TaskSerializer,
+    TaskDetailSerializer,
     SubTaskSerializer,
     SubTaskCreateSerializer,
+    SubTaskBulkSerializer,
 )
 
 
@@ -53,80 +70,117 @@ def create_task(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class TaskCursorPagination(CursorPagination):
+    """Cursor-пагинация списка задач: без OFFSET и без COUNT(*)."""
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = "-created_at"
+
+
+# Быстрый путь (?fast=1) для списков: тот же JSON, но из .values()
+fast_task_list = FastListSerializer(TaskSerializer)
+fast_subtask_list = FastListSerializer(SubTaskSerializer)
+
+
+def tasks_for_list(include_subtasks=False):
+    """
+    Задачи для списка: M2M tags и (опционально) подзадачи подгружаются
+    через prefetch_related — по одному запросу на связь на всю страницу.
+    Для тегов нужен только id (сериализуются списком PK).
+    """
+    prefetches = [Prefetch("tags", queryset=Tag.objects.only("id").order_by("id"))]
+    if include_subtasks:
+        prefetches.append(Prefetch("subtasks", queryset=SubTask.objects.order_by("-created_at")))
+    return Task.objects.prefetch_related(*prefetches)
+
+
+@versions_condition(TASKS_TABLES)
 @api_view(["GET"])
 def tasks_list(request):
     """
-    Получение списка задач.
+    Получение списка задач (cursor-пагинация).
 
     Если параметр ?day_of_week не передан — вернуть все задачи.
     Если передан — отфильтровать задачи по дню недели поля due_date.
     Пример: /api/tasks/?day_of_week=вторник
+    ?include=subtasks — добавить в каждую задачу вложенные подзадачи.
+    ?fast=1 — сериализация через .values() (без вложенных подзадач).
     """
-    tasks = Task.objects.all()
+    include = {value.strip() for value in request.query_params.get("include", "").split(",")}
+    include_subtasks = "subtasks" in include
+    serializer_class = TaskDetailSerializer if include_subtasks else TaskSerializer
 
-    day_param = request.query_params.get("day_of_week")
+    tasks = tasks_for_list(include_subtasks)
 
-    # Параметр не передан — возвращаем все задачи
-    if not day_param:
-        serializer = TaskSerializer(tasks, many=True)
-        return Response(serializer.data)
+    day_param = request.query_params.get("day_of_week")
 
     # Параметр передан — фильтруем по дню недели
-    day_name = day_param.strip().lower()
-    weekday_num = DAY_NAME_TO_WEEKDAY.get(day_name)
-
-    if weekday_num is None:
-        return Response(
-            {
-                "detail": "Некорректный день недели.",
-                "allowed_values": list(DAY_NAME_TO_WEEKDAY.keys()),
-            },
-            status=status.HTTP_400_BAD_REQUEST,
-        )
-
-    # Фильтрация по полю due_date
-    tasks = tasks.filter(due_date__week_day=weekday_num)
-
-    serializer = TaskSerializer(tasks, many=True)
-    return Response(serializer.data)
+    if day_param:
+        day_name = day_param.strip().lower()
+        weekday_num = DAY_NAME_TO_WEEKDAY.get(day_name)
+
+        if weekday_num is None:
+            return Response(
+                {
+                    "detail": "Некорректный день недели.",
+                    "allowed_values": list(DAY_NAME_TO_WEEKDAY.keys()),
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Фильтрация по сохранённому дню недели due_date (индекс, без функции над столбцом)
+        tasks = tasks.filter(due_weekday=weekday_num)
+
+    paginator = TaskCursorPagination()
+    if wants_fast_path(request) and not include_subtasks:
+        page = paginator.paginate_queryset(fast_task_list.values(tasks), request)
+        return paginator.get_paginated_response(fast_task_list.serialize(page))
+
+    page = paginator.paginate_queryset(tasks, request)
+    serializer = serializer_class(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
+@row_condition(Task.objects.all(), ["updated_at"], modified_field="updated_at")
 @api_view(["GET"])
 def task_detail(request, pk):
     """
     Получение одной задачи по её ID.
+    ETag/Last-Modified берутся из updated_at (изменение тегов его тоже
+    обновляет), так что опрос без изменений отвечает 304 одним запросом,
+    а сериализованный ответ кэшируется по той же версии.
     """
-    try:
-        task = Task.objects.get(pk=pk)
-    except Task.DoesNotExist:
-        return Response({"detail": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
+    def serialize():
+        task = Task.objects.filter(pk=pk).first()
+        return None if task is None else TaskSerializer(task).data
 
-    serializer = TaskSerializer(task)
-    return Response(serializer.data)
+    data = get_cached_payload(Task, pk, row_version(request, pk), serialize)
+    if data is None:
+        return Response({"detail": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(data)
 
 
 @api_view(["GET"])
 def tasks_stats(request):
     """
-    Статистика задач:
+    Статистика задач (один агрегирующий запрос, кэш на несколько секунд):
     - общее количество
-    - количество по каждому статусу
+    - количество по каждому статусу и приоритету
     - количество просроченных задач (due_date < сейчас)
-    """
 
-    now = timezone.now()
-    qs = Task.objects.filter(deleted_at__isnull=True)
-
-    total_tasks = qs.count()
-    tasks_by_status = qs.values("status").annotate(count=Count("id"))
-    overdue_tasks = qs.filter(due_date__lt=now).count()
+    ?project=all   -> дополнительно разбивка по всем проектам
+    ?project=1,2   -> статистика и разбивка только по указанным проектам
+    """
+    try:
+        project_ids = parse_project_ids(request.query_params.get("project"))
+    except ValueError:
+        return Response(
+            {"detail": "Параметр project должен быть 'all' или списком id через запятую."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
-    data = {
-        "total_tasks": total_tasks,
-        "tasks_by_status": list(tasks_by_status),
-        "overdue_tasks": overdue_tasks,
-    }
-    return Response(data)
+    return Response(get_tasks_stats(project_ids))
 
 @api_view(["GET"])
 def subtask_statuses(request):
@@ -139,7 +193,81 @@ def subtask_statuses(request):
 
 # ---------- SUBTASKS ----------
 
-class SubTaskPagination(PageNumberPagination):
+class CachedCountPagination(PageNumberPagination):
+    """
+    Постраничная пагинация без COUNT(*) на каждый запрос.
+
+    Страница читается с запасом в один объект (page_size + 1): по нему
+    понятно, есть ли следующая страница. Поле "count" в ответе берётся
+    из кэша по "подписи" фильтра (SQL запроса) и может быть null, если
+    точное число ещё никто не запрашивал. На последней странице число
+    известно бесплатно и тоже кладётся в кэш.
+    ?exact_count=1 — посчитать COUNT(*) честно (и обновить кэш).
+    """
+    exact_count_query_param = "exact_count"
+    count_cache_ttl = 60  # секунд
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        raw_page = request.query_params.get(self.page_query_param) or 1
+        try:
+            self.page_number = int(raw_page)
+            if self.page_number < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_page_message)
+
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        if not rows and self.page_number > 1:
+            raise NotFound(self.invalid_page_message)
+
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+
+        cache_key = self.get_count_cache_key(queryset)
+        if not self.has_next:
+            self.count = offset + len(rows)
+            cache.set(cache_key, self.count, self.count_cache_ttl)
+        elif request.query_params.get(self.exact_count_query_param) in ("1", "true"):
+            self.count = queryset.count()
+            cache.set(cache_key, self.count, self.count_cache_ttl)
+        else:
+            self.count = cache.get(cache_key)
+
+        return rows
+
+    def get_count_cache_key(self, queryset):
+        sql, params = queryset.order_by().query.sql_with_params()
+        signature = hashlib.md5(repr((sql, params)).encode()).hexdigest()
+        return f"pagination_count:{signature}"
+
+    def get_paginated_response(self, data):
+        return Response({
+            "count": self.count,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.exact_count_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number <= 1:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.exact_count_query_param)
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+
+class SubTaskPagination(CachedCountPagination):
     """
     Пагинация для подзадач:
     по 5 объектов на страницу, без возможности менять размер страницы.
@@ -149,17 +277,33 @@ class SubTaskPagination(PageNumberPagination):
     max_page_size = 5
 
 
+def paginate_subtasks(queryset, request):
+    """Страница подзадач: обычный сериализатор или быстрый путь (?fast=1)."""
+    paginator = SubTaskPagination()
+    if wants_fast_path(request):
+        page = paginator.paginate_queryset(fast_subtask_list.values(queryset), request)
+        return paginator.get_paginated_response(fast_subtask_list.serialize(page))
+
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = SubTaskSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
 class SubTaskListCreateView(APIView):
     """
     GET  /api/subtasks/       -> список всех подзадач (с пагинацией, сортировка по -created_at)
     POST /api/subtasks/       -> создание подзадачи
     """
 
+    @method_decorator(versions_condition(TASKS_TABLES))
     def get(self, request):
         """
         Фильтры:
-        - ?task_title=...  -> по названию главной задачи (Task.title, icontains)
-        - ?status=...      -> по статусу подзадачи (status, iexact)
+        - ?task_title=...  -> по названию главной задачи (подстрока, поисковый индекс)
+        - ?status=...      -> по статусу подзадачи (без учёта регистра)
+        - ?search=...      -> поиск по названию, описанию и названию задачи,
+                              самые релевантные сначала
+        - ?fast=1          -> сериализация через .values(), JSON тот же
 
         Если фильтры не переданы — вернётся обычный список с пагинацией.
         """
@@ -170,21 +314,24 @@ class SubTaskListCreateView(APIView):
         # --- читаем фильтры из query-параметров ---
         task_title = request.query_params.get("task_title")
         status_param = request.query_params.get("status")
+        search = request.query_params.get("search")
 
         # Фильтр по названию главной задачи
         if task_title:
-            queryset = queryset.filter(task__title__icontains=task_title)
+            queryset = queryset.search(task_title, fields=["task_title"])
+
+        # Полнотекстовый поиск с ранжированием
+        if search:
+            queryset = queryset.search(search, rank=True).order_by("search_rank", "-created_at")
 
-        # Фильтр по статусу подзадачи
+        # Фильтр по статусу подзадачи: регистр не важен, но сравниваем точным
+        # значением из choices, чтобы работал индекс (status, created_at)
         if status_param:
-            queryset = queryset.filter(status__iexact=status_param)
+            statuses = {value.lower(): value for value, _ in SubTask.STATUS_CHOICES}
+            queryset = queryset.filter(status=statuses.get(status_param.lower(), status_param))
 
         # --- пагинация ---
-        paginator = SubTaskPagination()
-        page = paginator.paginate_queryset(queryset, request)
-
-        serializer = SubTaskSerializer(page, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        return paginate_subtasks(queryset, request)
 
     def post(self, request):
         serializer = SubTaskCreateSerializer(data=request.data)
@@ -195,22 +342,181 @@ class SubTaskListCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+SUBTASK_BULK_MAX_ITEMS = 50_000
+SUBTASK_BULK_BATCH_SIZE = 500
+SUBTASK_BULK_FIELDS = ["title", "description", "deadline", "task", "status"]
+
+
+def _as_int(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _auto_increment_step():
+    """
+    Шаг автоинкремента, если id строк одного многострочного INSERT идут
+    подряд, иначе None. На MySQL это гарантируют innodb_autoinc_lock_mode
+    0 и 1; в режиме 2 (interleaved) id одного INSERT могут перемежаться
+    с соседними транзакциями.
+    """
+    if connection.vendor != "mysql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT @@innodb_autoinc_lock_mode, @@auto_increment_increment")
+        lock_mode, increment = cursor.fetchone()
+    return increment if lock_mode in (0, 1) else None
+
+
+def _bulk_insert(model, objs, batch_size):
+    """
+    bulk_create с id новых строк и на бэкендах без RETURNING (MySQL).
+    Кусок вставляется одним многострочным INSERT, id считаются от
+    LAST_INSERT_ID() (id первой строки) с шагом автоинкремента; если
+    сервер не гарантирует id подряд — INSERT на строку. Сигналы, как и
+    у bulk_create, не отправляются.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objs, batch_size=batch_size)
+
+    opts = model._meta
+    fields = [field for field in opts.concrete_fields if field is not opts.pk and not field.generated]
+    step = _auto_increment_step()
+    if step is None:
+        batch_size = 1
+    batch_size = min(batch_size, connection.ops.bulk_batch_size(fields, objs) or batch_size)
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            chunk = objs[start:start + batch_size]
+            query = sql.InsertQuery(model)
+            query.insert_values(fields, chunk)
+            for statement, params in query.get_compiler(connection=connection).as_sql():
+                cursor.execute(statement, params)
+            first_id = connection.ops.last_insert_id(cursor, opts.db_table, opts.pk.column)
+            for offset, obj in enumerate(chunk):
+                obj.pk = first_id + offset * (step or 1)
+                obj._state.adding = False
+                obj._state.db = connection.alias
+    return objs
+
+
+class SubTaskBulkView(APIView):
+    """
+    POST /api/subtasks/bulk/  -> пакетное создание/обновление подзадач
+
+    Тело — JSON-массив или NDJSON (Content-Type: application/x-ndjson).
+    Элемент без "id" создаёт подзадачу, элемент с "id" обновляет существующую
+    (поля как у PUT; повтор того же id в пачке — ошибка элемента). Главные
+    задачи и обновляемые подзадачи загружаются двумя запросами на всю пачку,
+    запись — многострочными INSERT/bulk_update кусками в одной транзакции.
+    Ошибки возвращаются по индексам элементов, валидные элементы при этом
+    сохраняются.
+    """
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {"detail": "Ожидается JSON-массив подзадач или NDJSON."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > SUBTASK_BULK_MAX_ITEMS:
+            return Response(
+                {"detail": f"Не больше {SUBTASK_BULK_MAX_ITEMS} подзадач за один запрос."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        objects = [item for item in items if isinstance(item, dict)]
+        task_ids = {_as_int(item.get("task")) for item in objects} - {None}
+        subtask_ids = {_as_int(item.get("id")) for item in objects} - {None}
+
+        # Проверка существования FK — по одному запросу на всю пачку
+        tasks = Task.objects.in_bulk(task_ids)
+        existing = SubTask.objects.in_bulk(subtask_ids)
+
+        serializer = SubTaskBulkSerializer(data=items, many=True, context={"tasks": tasks})
+        serializer.is_valid()
+        errors = dict(serializer.item_errors)
+
+        to_create, to_update = [], []
+        seen = {}  # id -> индекс первого элемента с ним
+        for index, data in serializer.validated_data:
+            raw_id = items[index].get("id")
+            if raw_id is None:
+                to_create.append(SubTask(**data))
+                continue
+
+            subtask = existing.get(_as_int(raw_id))
+            if subtask is None:
+                errors[index] = {"id": [f"Подзадача с id={raw_id} не найдена."]}
+                continue
+            if subtask.pk in seen:
+                errors[index] = {"id": [f"Подзадача с id={raw_id} уже обновляется элементом {seen[subtask.pk]}."]}
+                continue
+            seen[subtask.pk] = index
+            for field, value in data.items():
+                setattr(subtask, field, value)
+            to_update.append(subtask)
+
+        with transaction.atomic():
+            created = _bulk_insert(SubTask, to_create, SUBTASK_BULK_BATCH_SIZE)
+            SubTask.objects.bulk_update(to_update, SUBTASK_BULK_FIELDS, batch_size=SUBTASK_BULK_BATCH_SIZE)
+            # bulk-операции не вызывают сигналы — индексируем и поднимаем версию сами
+            get_search_backend().index(SubTask, [subtask.pk for subtask in created + to_update])
+            if created or to_update:
+                bump_version(TASKS_TABLES)
+
+        if errors and not (created or to_update):
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        elif created:
+            response_status = status.HTTP_201_CREATED
+        else:
+            response_status = status.HTTP_200_OK
+
+        return Response(
+            {
+                "created": [subtask.pk for subtask in created],
+                "updated": [subtask.pk for subtask in to_update],
+                "errors": [
+                    {"index": index, "errors": errors[index]}
+                    for index in sorted(errors)
+                ],
+            },
+            status=response_status,
+        )
+
+
+subtask_condition = method_decorator(row_condition(SubTask.objects.all(), concrete_fields(SubTask)))
+
+
 class SubTaskDetailUpdateDeleteView(APIView):
     """
     GET    /api/subtasks/<id>/   -> получить подзадачу
     PUT    /api/subtasks/<id>/   -> полное обновление
     PATCH  /api/subtasks/<id>/   -> частичное обновление
     DELETE /api/subtasks/<id>/   -> удалить подзадачу
+
+    ETag — отпечаток строки подзадачи: GET с If-None-Match отвечает 304,
+    изменение с устаревшим If-Match — 412.
     """
 
     def get_object(self, pk):
         return get_object_or_404(SubTask, pk=pk)
 
+    @subtask_condition
     def get(self, request, pk):
-        subtask = self.get_object(pk)
-        serializer = SubTaskSerializer(subtask)
-        return Response(serializer.data)
+        def serialize():
+            return SubTaskSerializer(self.get_object(pk)).data
 
+        return Response(get_cached_payload(SubTask, pk, row_version(request, pk), serialize))
+
+    @subtask_condition
     def put(self, request, pk):
         subtask = self.get_object(pk)
         serializer = SubTaskCreateSerializer(subtask, data=request.data)
@@ -220,6 +526,7 @@ class SubTaskDetailUpdateDeleteView(APIView):
             return Response(out_serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @subtask_condition
     def patch(self, request, pk):
         subtask = self.get_object(pk)
         serializer = SubTaskCreateSerializer(subtask, data=request.data, partial=True)
@@ -229,11 +536,13 @@ class SubTaskDetailUpdateDeleteView(APIView):
             return Response(out_serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @subtask_condition
     def delete(self, request, pk):
         subtask = self.get_object(pk)
         subtask.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+@versions_condition(TASKS_TABLES)
 @api_view(["GET"])
 def subtasks_by_weekday(request, weekday):
     """
@@ -252,12 +561,7 @@ def subtasks_by_weekday(request, weekday):
             status=400
         )
 
-    queryset = SubTask.objects.filter(task__due_date__week_day=weekday_num).order_by("-created_at")
-
-    paginator = SubTaskPagination()
-    page = paginator.paginate_queryset(queryset,request)
-
-    serializer = SubTaskSerializer(page, many=True)
-    return paginator.get_paginated_response(serializer.data)
+    queryset = SubTask.objects.filter(task__due_weekday=weekday_num).order_by("-created_at")
+    return paginate_subtasks(queryset, request)
 
 
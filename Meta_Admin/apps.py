@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class MetaAdminConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'Meta_Admin'
+
+    def ready(self):
+        from . import signals  # noqa: F401
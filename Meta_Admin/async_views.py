@@ -0,0 +1,92 @@
+"""
+Async-версии читающих эндпоинтов задач (для запуска под core.asgi).
+
+Один ASGI-воркер держит много одновременно опрашивающих клиентов без
+потока на каждый запрос. JSON и ETag те же, что у api_views.py; списки
+листаются по ключу ?after_id= (новые первыми) вместо курсора/номера страницы.
+"""
+from django.views.decorators.http import require_GET
+
+from core.async_api import keyset_page, render_json
+from core.response_cache import aget_cached_payload
+from core.versioning import arow_condition, aversions_condition, row_version
+
+from .api_views import DAY_NAME_TO_WEEKDAY, tasks_for_list
+from .models import SubTask, Task
+from .serializers import SubTaskSerializer, TaskSerializer
+from .signals import TASKS_TABLES
+from .stats import aget_tasks_stats, parse_project_ids
+
+
+@require_GET
+@aversions_condition(TASKS_TABLES)
+async def tasks_list(request):
+    """
+    GET /api/async/tasks/?after_id=&page_size=&day_of_week= -> список задач
+    """
+    tasks = tasks_for_list()
+
+    day_param = request.GET.get("day_of_week")
+    if day_param:
+        weekday_num = DAY_NAME_TO_WEEKDAY.get(day_param.strip().lower())
+        if weekday_num is None:
+            return render_json(
+                {
+                    "detail": "Некорректный день недели.",
+                    "allowed_values": list(DAY_NAME_TO_WEEKDAY.keys()),
+                },
+                status=400,
+            )
+        tasks = tasks.filter(due_weekday=weekday_num)
+
+    return await keyset_page(
+        request, tasks, lambda page: TaskSerializer(page, many=True).data, max_page_size=200,
+    )
+
+
+@require_GET
+@arow_condition(Task.objects.all(), ["updated_at"], modified_field="updated_at")
+async def task_detail(request, pk):
+    """
+    GET /api/async/tasks/<pk>/ -> одна задача (ETag/Last-Modified по updated_at)
+    """
+    async def serialize():
+        task = await Task.objects.prefetch_related("tags").filter(pk=pk).afirst()
+        return None if task is None else TaskSerializer(task).data
+
+    data = await aget_cached_payload(Task, pk, row_version(request, pk), serialize)
+    if data is None:
+        return render_json({"detail": "Task not found"}, status=404)
+    return render_json(data)
+
+
+@require_GET
+async def tasks_stats(request):
+    """
+    GET /api/async/tasks/stats/?project= -> статистика задач (тот же кэш, что у sync-версии)
+    """
+    try:
+        project_ids = parse_project_ids(request.GET.get("project"))
+    except ValueError:
+        return render_json(
+            {"detail": "Параметр project должен быть 'all' или списком id через запятую."},
+            status=400,
+        )
+    return render_json(await aget_tasks_stats(project_ids))
+
+
+@require_GET
+@aversions_condition(TASKS_TABLES)
+async def subtasks_list(request):
+    """
+    GET /api/async/subtasks/?after_id=&page_size=&status= -> список подзадач
+    """
+    subtasks = SubTask.objects.all()
+    status_param = request.GET.get("status")
+    if status_param:
+        statuses = {value.lower(): value for value, _ in SubTask.STATUS_CHOICES}
+        subtasks = subtasks.filter(status=statuses.get(status_param.lower(), status_param))
+
+    return await keyset_page(
+        request, subtasks, lambda page: SubTaskSerializer(page, many=True).data, max_page_size=200,
+    )
@@ -0,0 +1,82 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from Meta_Admin.models import Project, Task
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает фильтр задач по дню недели через due_date__week_day "
+        "и через индексированное поле due_weekday. Данные создаются во "
+        "временной транзакции и откатываются после замера."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000, help="Сколько задач сгенерировать (например, 1000000).")
+        parser.add_argument("--repeat", type=int, default=5, help="Сколько раз повторять каждый запрос.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options["rows"], options["batch_size"], options["seed"])
+
+            weekday = 3  # вторник
+            variants = {
+                "due_date__week_day": Task.objects.filter(due_date__week_day=weekday),
+                "due_weekday": Task.objects.filter(due_weekday=weekday),
+            }
+            for name, queryset in variants.items():
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.explain(queryset)
+                self.measure("count()", lambda: queryset.count(), options["repeat"])
+                self.measure("first page (50)", lambda: list(queryset[:50]), options["repeat"])
+
+            transaction.set_rollback(True)
+
+    def seed(self, rows, batch_size, seed):
+        rnd = random.Random(seed)
+        project = Project.objects.create(name="benchmark-weekday", description="benchmark")
+        start = timezone.now()
+        self.stdout.write(f"Создаём {rows} задач...")
+
+        for offset in range(0, rows, batch_size):
+            batch = []
+            for i in range(offset, min(offset + batch_size, rows)):
+                due_date = start + timedelta(minutes=rnd.randint(0, 60 * 24 * 365))
+                batch.append(Task(
+                    title=f"benchmark task {i:09d}",
+                    priority="Low",
+                    project=project,
+                    due_date=due_date,
+                    # bulk_create не вызывает save(), поэтому считаем поле сами
+                    due_weekday=Task.weekday_of(due_date),
+                ))
+            Task.objects.bulk_create(batch)
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        if connection.vendor == "sqlite":
+            prefix = "EXPLAIN QUERY PLAN "
+        else:
+            prefix = "EXPLAIN "
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            for row in cursor.fetchall():
+                self.stdout.write(f"  plan: {row[-1]}")
+
+    def measure(self, label, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        self.stdout.write(
+            f"  {label}: min {timings[0]:.2f} ms, median {timings[len(timings) // 2]:.2f} ms"
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Meta_Admin.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Полностью перестраивает поисковый индекс задач и подзадач (FTS5 на SQLite)."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with transaction.atomic():
+            backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Поисковый индекс перестроен ({type(backend).__name__})."))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:22
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_due_weekday(apps, schema_editor):
+    """Заполняет due_weekday пачками по id, не загружая всю таблицу в память."""
+    Task = apps.get_model('Meta_Admin', 'Task')
+
+    last_id = 0
+    while True:
+        batch = list(
+            Task.objects.filter(id__gt=last_id, due_date__isnull=False)
+            .order_by('id')
+            .only('id', 'due_date')[:BACKFILL_BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for task in batch:
+            due_date = task.due_date
+            if timezone.is_aware(due_date):
+                due_date = timezone.localtime(due_date)
+            task.due_weekday = due_date.isoweekday() % 7 + 1
+        Task.objects.bulk_update(batch, ['due_weekday'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Meta_Admin', '0008_subtask_status_alter_subtask_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='due_weekday',
+            field=models.PositiveSmallIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_due_weekday, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+import sqlite3
+
+from django.db import migrations
+
+
+# Теневые FTS5-таблицы для Meta_Admin/search.py (SQLiteFTSBackend).
+# На других СУБД и на SQLite без trigram-токенизатора миграция ничего не делает.
+TRIGRAM_MIN_SQLITE = (3, 34, 0)
+
+CREATE_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS "task_manager_task_fts"
+       USING fts5(title, description, tokenize = 'trigram')""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS "task_manager_subtask_fts"
+       USING fts5(title, description, task_title, tokenize = 'trigram')""",
+]
+
+POPULATE_SQL = [
+    """INSERT INTO "task_manager_task_fts" (rowid, title, description)
+       SELECT id, title, COALESCE(description, '') FROM "task_manager_task" """,
+    """INSERT INTO "task_manager_subtask_fts" (rowid, title, description, task_title)
+       SELECT s.id, s.title, COALESCE(s.description, ''), t.title
+       FROM "task_manager_subtask" s JOIN "task_manager_task" t ON t.id = s.task_id""",
+]
+
+DROP_SQL = [
+    'DROP TABLE IF EXISTS "task_manager_subtask_fts"',
+    'DROP TABLE IF EXISTS "task_manager_task_fts"',
+]
+
+
+def _fts_supported(schema_editor):
+    return (
+        schema_editor.connection.vendor == 'sqlite'
+        and sqlite3.sqlite_version_info >= TRIGRAM_MIN_SQLITE
+    )
+
+
+def create_search_tables(apps, schema_editor):
+    if not _fts_supported(schema_editor):
+        return
+    for sql in CREATE_SQL + POPULATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_tables(apps, schema_editor):
+    if not _fts_supported(schema_editor):
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Meta_Admin', '0010_indexes_for_filters_and_ordering'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
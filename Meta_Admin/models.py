@@ -1,11 +1,32 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.core.validators import MinLengthValidator, MaxValueValidator
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django import forms
 from django.shortcuts import render, redirect
 
 
 
+class ProjectQuerySet(models.QuerySet):
+    def annotate_files_count(self):
+        """
+        Аннотация files_count — число файлов проекта одним коррелированным
+        подзапросом к through-таблице (её использует Project.count_of_files).
+        """
+        through = Project.files.through
+        files = (
+            through.objects.filter(project_id=models.OuterRef("pk"))
+            .order_by()
+            .values("project_id")
+            .annotate(total=models.Count("pk"))
+            .values("total")
+        )
+        return self.annotate(
+            files_count=Coalesce(models.Subquery(files, output_field=models.IntegerField()), 0)
+        )
+
+
 class Project(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField()
@@ -19,6 +40,8 @@ class Project(models.Model):
         verbose_name='Файлы'
     )
 
+    objects = ProjectQuerySet.as_manager()
+
     class Meta:
         ordering = ['-name']
         verbose_name = 'Проект'
@@ -35,7 +58,13 @@ class Project(models.Model):
 
     @property
     def count_of_files(self):
-        """Кол-во файлов, связанных с этим проектом."""
+        """
+        Кол-во файлов, связанных с этим проектом.
+        Если объект получен через annotate_files_count(), берём готовое значение из SQL.
+        """
+        annotated = self.__dict__.get("files_count")
+        if annotated is not None:
+            return annotated
         return self.files.count()
 
 
@@ -57,6 +86,73 @@ PRIORITY_CHOICES = [
 ]
 
 
+class SearchQuerySet(models.QuerySet):
+    """
+    search() — поиск подстроки по текстовым полям через бэкенд из
+    Meta_Admin/search.py (FTS5 на SQLite, icontains на остальных БД).
+    search_fields: логическое имя поля -> lookup для запасного icontains.
+
+    Результат search(rank=True) нельзя объединять с другими запросами
+    (|, &, ^, union/intersection/difference) — TypeError: на FTS5 ранг
+    берётся из INNER JOIN, который отфильтровал бы и вторую часть условия.
+    """
+    search_fields = {}
+
+    def search(self, query, fields=None, rank=False):
+        from .search import get_search_backend
+
+        fields = list(fields or self.search_fields)
+        return get_search_backend().search(self, query, fields, rank=rank)
+
+    def _reject_ranked_search(self, operation, *others):
+        from .search import uses_match_join
+
+        if any(isinstance(qs, models.QuerySet) and uses_match_join(qs) for qs in (self, *others)):
+            raise TypeError(
+                f"Нельзя применить {operation} к результату search(rank=True): "
+                "объедините условия до поиска или ищите без rank."
+            )
+
+    def __or__(self, other):
+        self._reject_ranked_search("|", other)
+        return super().__or__(other)
+
+    def __and__(self, other):
+        self._reject_ranked_search("&", other)
+        return super().__and__(other)
+
+    def __xor__(self, other):
+        self._reject_ranked_search("^", other)
+        return super().__xor__(other)
+
+    def union(self, *other_qs, all=False):
+        self._reject_ranked_search("union()", *other_qs)
+        return super().union(*other_qs, all=all)
+
+    def intersection(self, *other_qs):
+        self._reject_ranked_search("intersection()", *other_qs)
+        return super().intersection(*other_qs)
+
+    def difference(self, *other_qs):
+        self._reject_ranked_search("difference()", *other_qs)
+        return super().difference(*other_qs)
+
+
+class TaskQuerySet(SearchQuerySet):
+    search_fields = {
+        "title": "title",
+        "description": "description",
+    }
+
+
+class SubTaskQuerySet(SearchQuerySet):
+    search_fields = {
+        "title": "title",
+        "description": "description",
+        "task_title": "task__title",
+    }
+
+
 class Task(models.Model):
     STATUS_NEW = "New"
     STATUS_PENDING = "Pending"
@@ -100,16 +196,56 @@ class Task(models.Model):
     deleted_at = models.DateTimeField(null=True, blank=True)
 
     due_date = models.DateTimeField(null=True, blank=True)
+    # День недели due_date в нумерации Django (__week_day): 1 — воскресенье, 7 — суббота.
+    # Хранится отдельно и индексируется, чтобы фильтр по дню недели не
+    # оборачивал due_date в функцию и не сканировал всю таблицу.
+    due_weekday = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, db_index=True)
     tags = models.ManyToManyField('Tag', blank=True, related_name='tasks')
 
+    objects = TaskQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
+    @staticmethod
+    def weekday_of(value):
+        """Номер дня недели как у lookup'а __week_day (с учётом текущей таймзоны)."""
+        if value is None:
+            return None
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.isoweekday() % 7 + 1
+
+    def save(self, *args, **kwargs):
+        self.due_weekday = self.weekday_of(self.due_date)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "due_date" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "due_weekday"}
+        super().save(*args, **kwargs)
+
     class Meta:
         db_table = 'task_manager_task'
         ordering = ['-created_at']
         verbose_name = 'Task'
         verbose_name_plural = 'Tasks'
+        indexes = [
+            # списки (API и админка) сортируются по -created_at
+            models.Index(fields=['created_at'], name='task_created_at_idx'),
+            models.Index(fields=['status', 'created_at'], name='task_status_created_idx'),
+            models.Index(fields=['priority', 'created_at'], name='task_priority_created_idx'),
+            # живые задачи: фильтр API по статусу без удалённых
+            models.Index(
+                fields=['status', 'created_at'],
+                name='task_live_status_created_idx',
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+            # покрывающий индекс для tasks_stats: все счётчики читаются из индекса
+            models.Index(
+                fields=['project', 'status', 'priority', 'due_date'],
+                name='task_live_stats_idx',
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+        ]
 
 class Tag(models.Model):
     name = models.CharField(max_length=20, unique=True)
@@ -161,6 +297,8 @@ class SubTask(models.Model):
         verbose_name="Статус подзадачи",
     )
 
+    objects = SubTaskQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.title} ({self.task})"
 
@@ -169,6 +307,11 @@ class SubTask(models.Model):
         ordering = ['-created_at']
         verbose_name = 'SubTask'
         verbose_name_plural = 'SubTasks'
+        indexes = [
+            models.Index(fields=['created_at'], name='subtask_created_at_idx'),
+            models.Index(fields=['status', 'created_at'], name='subtask_status_created_idx'),
+            models.Index(fields=['task', 'created_at'], name='subtask_task_created_idx'),
+        ]
 
 class Category(models.Model):
     name = models.CharField(
@@ -0,0 +1,256 @@
+"""
+Полнотекстовый (подстрочный) поиск по задачам и подзадачам.
+
+На SQLite используется теневая таблица FTS5 с токенизатором trigram:
+MATCH по фразе ищет подстроку без учёта регистра, как icontains, но
+через индекс, а не LIKE '%x%' по всей таблице. Для остальных баз
+работает LikeSearchBackend (обычный icontains), а свой бэкенд можно
+подключить настройкой META_ADMIN_SEARCH_BACKEND (dotted path к классу).
+
+Теневые таблицы обновляются сигналами (Meta_Admin/signals.py), а массовые
+операции (bulk_create/bulk_update) должны вызывать index() сами.
+Полная перестройка — команда rebuild_search_index.
+"""
+from dataclasses import dataclass
+from functools import reduce
+import operator
+import sqlite3
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import Expression, RawSQL
+from django.db.models.sql.constants import INNER
+from django.utils.module_loading import import_string
+
+
+# токенизатор trigram появился в SQLite 3.34
+TRIGRAM_MIN_SQLITE = (3, 34, 0)
+
+
+class LikeSearchBackend:
+    """Запасной бэкенд для любой БД: icontains по полям, ранжирования нет."""
+
+    def search(self, queryset, query, fields, rank=False):
+        lookups = [queryset.search_fields[field] for field in fields]
+        condition = reduce(operator.or_, (Q(**{f"{lookup}__icontains": query}) for lookup in lookups))
+        queryset = queryset.filter(condition)
+        if rank:
+            queryset = queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+        return queryset
+
+    # Поиск через LIKE не требует отдельного индекса
+    def index(self, model, ids):
+        pass
+
+    def index_subtasks_of_task(self, task_id):
+        pass
+
+    def remove(self, model, ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class MatchJoin:
+    """
+    INNER JOIN (SELECT rowid, rank FROM <fts> WHERE <fts> MATCH %s) к таблице модели.
+    MATCH выполняется один раз на весь запрос, а rank берётся из JOIN'а,
+    а не коррелированным подзапросом на каждую строку. Объект кладётся в
+    query.alias_map рядом с обычными Join и повторяет их интерфейс.
+
+    Объединение запросов (|, &, ^, union() ...) о таком JOIN'е не знает:
+    INNER JOIN отфильтровал бы и вторую половину OR. Поэтому SearchQuerySet
+    не даёт объединять запросы с MatchJoin (см. uses_match_join).
+    """
+    join_type = INNER
+    nullable = False
+    filtered_relation = None
+
+    def __init__(self, table_name, fts_table, match, parent_alias, table_alias):
+        self.table_name = table_name
+        self.fts_table = fts_table
+        self.match = match
+        self.parent_alias = parent_alias
+        self.table_alias = table_alias
+
+    def as_sql(self, compiler, connection):
+        qn = compiler.quote_name_unless_alias
+        fts, alias = connection.ops.quote_name(self.fts_table), qn(self.table_alias)
+        sql = (
+            f"INNER JOIN (SELECT rowid, rank FROM {fts} WHERE {fts} MATCH %s) {alias} "
+            f"ON {alias}.rowid = {qn(self.parent_alias)}.{connection.ops.quote_name('id')}"
+        )
+        return sql, [self.match]
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(
+            self.table_name,
+            self.fts_table,
+            self.match,
+            change_map.get(self.parent_alias, self.parent_alias),
+            change_map.get(self.table_alias, self.table_alias),
+        )
+
+    @property
+    def identity(self):
+        return self.__class__, self.fts_table, self.match, self.parent_alias
+
+    def __eq__(self, other):
+        return isinstance(other, MatchJoin) and self.identity == other.identity
+
+    def __hash__(self):
+        return hash(self.identity)
+
+
+def uses_match_join(queryset):
+    """Есть ли в запросе JOIN ранжированного поиска (search(rank=True) на FTS5)."""
+    return any(isinstance(join, MatchJoin) for join in queryset.query.alias_map.values())
+
+
+class MatchRank(Expression):
+    """Столбец rank из MatchJoin (алиас переименовывается вместе с JOIN'ом)."""
+    output_field = FloatField()
+
+    def __init__(self, alias):
+        super().__init__()
+        self.alias = alias
+
+    def as_sql(self, compiler, connection):
+        return f"{compiler.quote_name_unless_alias(self.alias)}.rank", []
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(change_map.get(self.alias, self.alias))
+
+    def get_group_by_cols(self):
+        return [self]
+
+
+@dataclass(frozen=True)
+class SearchDocument:
+    """Как строки модели попадают в FTS-таблицу."""
+    table: str
+    columns: tuple
+    select: str  # SELECT id, <columns...> FROM ... (с алиасом src)
+
+
+class SQLiteFTSBackend(LikeSearchBackend):
+    """FTS5 + trigram: подстрочный поиск за миллисекунды и ранжирование по bm25."""
+
+    # trigram-индекс находит только подстроки от трёх символов
+    MIN_QUERY_LENGTH = 3
+    CHUNK_SIZE = 500
+
+    def __init__(self):
+        from .models import SubTask, Task
+
+        task_table = Task._meta.db_table
+        subtask_table = SubTask._meta.db_table
+        self.documents = {
+            Task: SearchDocument(
+                table=f"{task_table}_fts",
+                columns=("title", "description"),
+                select=(
+                    f'SELECT src.id, src.title, COALESCE(src.description, \'\') '
+                    f'FROM "{task_table}" src'
+                ),
+            ),
+            SubTask: SearchDocument(
+                table=f"{subtask_table}_fts",
+                columns=("title", "description", "task_title"),
+                select=(
+                    f'SELECT src.id, src.title, COALESCE(src.description, \'\'), task.title '
+                    f'FROM "{subtask_table}" src JOIN "{task_table}" task ON task.id = src.task_id'
+                ),
+            ),
+        }
+
+    # ---------- поиск ----------
+
+    @staticmethod
+    def match_expression(query, fields):
+        phrase = '"' + query.replace('"', '""') + '"'
+        return "{" + " ".join(fields) + "} : " + phrase
+
+    def search(self, queryset, query, fields, rank=False):
+        query = query.strip()
+        if len(query) < self.MIN_QUERY_LENGTH:
+            return super().search(queryset, query, fields, rank=rank)
+
+        document = self.documents[queryset.model]
+        match = self.match_expression(query, fields)
+        if not rank:
+            return queryset.filter(
+                pk__in=RawSQL(f'SELECT rowid FROM "{document.table}" WHERE "{document.table}" MATCH %s', [match])
+            )
+
+        # JOIN с результатом MATCH и фильтрует, и даёт rank — один FTS-запрос на весь SELECT
+        queryset = queryset.all()
+        query = queryset.query
+        parent_alias = query.get_initial_alias()
+        alias, _ = query.table_alias(f"{document.table}_match", create=True)
+        query.alias_map[alias] = MatchJoin(f"{document.table}_match", document.table, match, parent_alias, alias)
+        return queryset.annotate(search_rank=MatchRank(alias))
+
+    # ---------- поддержка индекса ----------
+
+    def _insert_sql(self, document, where):
+        columns = ", ".join(document.columns)
+        return f'INSERT INTO "{document.table}" (rowid, {columns}) {document.select} WHERE {where}'
+
+    def index(self, model, ids):
+        """Переиндексирует строки модели с указанными id (вставка или замена)."""
+        document = self.documents[model]
+        ids = list(ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(ids), self.CHUNK_SIZE):
+                chunk = ids[start:start + self.CHUNK_SIZE]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(f'DELETE FROM "{document.table}" WHERE rowid IN ({placeholders})', chunk)
+                cursor.execute(self._insert_sql(document, f"src.id IN ({placeholders})"), chunk)
+
+    def index_subtasks_of_task(self, task_id):
+        """Название задачи хранится в строках подзадач — обновляем их одним INSERT ... SELECT."""
+        from .models import SubTask
+
+        document = self.documents[SubTask]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM "{document.table}" WHERE rowid IN '
+                f'(SELECT id FROM "{SubTask._meta.db_table}" WHERE task_id = %s)',
+                [task_id],
+            )
+            cursor.execute(self._insert_sql(document, "src.task_id = %s"), [task_id])
+
+    def remove(self, model, ids):
+        document = self.documents[model]
+        ids = list(ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(ids), self.CHUNK_SIZE):
+                chunk = ids[start:start + self.CHUNK_SIZE]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(f'DELETE FROM "{document.table}" WHERE rowid IN ({placeholders})', chunk)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            for document in self.documents.values():
+                cursor.execute(f'DELETE FROM "{document.table}"')
+                cursor.execute(self._insert_sql(document, "1 = 1"))
+
+
+_backend = None
+
+
+def get_search_backend():
+    """Бэкенд из settings.META_ADMIN_SEARCH_BACKEND или по типу БД."""
+    global _backend
+    if _backend is None:
+        path = getattr(settings, "META_ADMIN_SEARCH_BACKEND", None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == "sqlite" and sqlite3.sqlite_version_info >= TRIGRAM_MIN_SQLITE:
+            _backend = SQLiteFTSBackend()
+        else:
+            _backend = LikeSearchBackend()
+    return _backend
@@ -55,6 +55,58 @@ class SubTaskCreateSerializer(serializers.ModelSerializer):
 
 
 
+# ===== Пакетная загрузка SubTask =====
+
+class TaskFromContextField(serializers.PrimaryKeyRelatedField):
+    """
+    PK главной задачи проверяется по словарю context["tasks"], который
+    view загружает одним запросом на всю пачку, а не через get() на каждый элемент.
+    """
+
+    def to_internal_value(self, data):
+        tasks = self.context.get("tasks")
+        if tasks is None:
+            return super().to_internal_value(data)
+
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+        task = tasks.get(pk)
+        if task is None:
+            self.fail("does_not_exist", pk_value=data)
+        return task
+
+
+class SubTaskBulkListSerializer(serializers.ListSerializer):
+    """
+    Валидирует каждый элемент отдельно и не прерывает всю пачку из-за
+    одной ошибки: валидные элементы попадают в validated_data как
+    (index, data), ошибки — в item_errors[index].
+    """
+
+    def to_internal_value(self, data):
+        self.item_errors = {}
+        valid = []
+        for index, item in enumerate(data):
+            try:
+                valid.append((index, self.child.run_validation(item)))
+            except serializers.ValidationError as exc:
+                self.item_errors[index] = exc.detail
+        return valid
+
+
+class SubTaskBulkSerializer(SubTaskCreateSerializer):
+    """Элемент пакетной загрузки подзадач (POST /api/subtasks/bulk/)."""
+    task = TaskFromContextField(queryset=Task.objects.all())
+
+    class Meta(SubTaskCreateSerializer.Meta):
+        list_serializer_class = SubTaskBulkListSerializer
+
+
 # ===== Category serializers =====
 
 class CategoryCreateSerializer(serializers.ModelSerializer):
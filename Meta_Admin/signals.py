@@ -0,0 +1,75 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.versioning import track_versions
+
+from .models import SubTask, Task
+from .search import get_search_backend
+from .stats import invalidate_tasks_stats
+
+
+# ======== Версии для условных запросов (ETag) ========
+
+# Группа таблиц, от которой зависят списки задач и подзадач
+TASKS_TABLES = "meta_admin.tasks"
+track_versions(TASKS_TABLES, Task, SubTask, Task.tags.through)
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def touch_tasks_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Теги входят в ответ task_detail, а его ETag строится по updated_at —
+    поэтому изменение тегов тоже отмечаем в updated_at задачи.
+    """
+    if not reverse:
+        task_ids = [instance.pk] if action.startswith("post") else []
+    elif action == "pre_clear":
+        # tag.tasks.clear(): после очистки связей уже не узнать, какие были
+        task_ids = list(instance.tasks.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove"):
+        task_ids = list(pk_set)
+    else:
+        task_ids = []
+    if task_ids:
+        Task.objects.filter(pk__in=task_ids).update(updated_at=timezone.now())
+
+
+# ======== Сброс кэша статистики задач ========
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def reset_tasks_stats_cache(sender, **kwargs):
+    invalidate_tasks_stats()
+
+
+# ======== Поисковый индекс задач и подзадач ========
+
+@receiver(pre_save, sender=Task)
+def remember_previous_title(sender, instance, raw=False, **kwargs):
+    """Название задачи продублировано в индексе подзадач — запоминаем старое."""
+    instance._previous_title = None
+    if not raw and instance.pk is not None:
+        instance._previous_title = (
+            Task.objects.filter(pk=instance.pk).values_list("title", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Task)
+def index_task(sender, instance, created, **kwargs):
+    backend = get_search_backend()
+    backend.index(Task, [instance.pk])
+    previous_title = getattr(instance, "_previous_title", None)
+    if not created and previous_title is not None and previous_title != instance.title:
+        backend.index_subtasks_of_task(instance.pk)
+
+
+@receiver(post_save, sender=SubTask)
+def index_subtask(sender, instance, **kwargs):
+    get_search_backend().index(SubTask, [instance.pk])
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=SubTask)
+def remove_from_search_index(sender, instance, **kwargs):
+    get_search_backend().remove(sender, [instance.pk])
@@ -0,0 +1,150 @@
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Task
+
+
+# Дашборд опрашивает статистику каждые несколько секунд, поэтому результат
+# кэшируется на короткий интервал ("корзину" времени) и дополнительно
+# сбрасывается сигналами при любом изменении задач.
+TASKS_STATS_CACHE_TTL = 10  # секунд
+TASKS_STATS_GENERATION_KEY = "tasks_stats:generation"
+
+
+def _choice_values(field_name):
+    return [value for value, _ in Task._meta.get_field(field_name).choices]
+
+
+def _stats_aggregates(now):
+    """
+    Все счётчики одним SELECT через условную агрегацию COUNT(...) FILTER (...).
+    Алиасы — по индексу, т.к. значения выбора могут содержать пробелы ("Very High").
+    """
+    aggregates = {
+        "total_tasks": Count("id"),
+        "overdue_tasks": Count("id", filter=Q(due_date__lt=now)),
+    }
+    for index, value in enumerate(_choice_values("status")):
+        aggregates[f"status_{index}"] = Count("id", filter=Q(status=value))
+    for index, value in enumerate(_choice_values("priority")):
+        aggregates[f"priority_{index}"] = Count("id", filter=Q(priority=value))
+    return aggregates
+
+
+def _format_row(row):
+    return {
+        "total_tasks": row["total_tasks"],
+        "tasks_by_status": [
+            {"status": value, "count": row[f"status_{index}"]}
+            for index, value in enumerate(_choice_values("status"))
+        ],
+        "tasks_by_priority": [
+            {"priority": value, "count": row[f"priority_{index}"]}
+            for index, value in enumerate(_choice_values("priority"))
+        ],
+        "overdue_tasks": row["overdue_tasks"],
+    }
+
+
+def parse_project_ids(value):
+    """
+    Значение ?project=: None/"" -> None, "all" -> [], "1,2" -> [1, 2].
+    ValueError — если это не "all" и не список чисел (в том числе пустой:
+    "?project=," иначе молча превратился бы в статистику по всем проектам).
+    """
+    if not value:
+        return None
+    if value.strip().lower() == "all":
+        return []
+    ids = sorted({int(item) for item in value.split(",") if item.strip()})
+    if not ids:
+        raise ValueError(value)
+    return ids
+
+
+def _stats_query(project_ids, now):
+    qs = Task.objects.filter(deleted_at__isnull=True).order_by()
+    if project_ids:
+        qs = qs.filter(project_id__in=project_ids)
+    return qs, _stats_aggregates(now)
+
+
+def _grouped(qs, aggregates):
+    return qs.values("project").annotate(**aggregates).order_by("project")
+
+
+def _format_projects(rows, aggregates):
+    totals = {key: sum(row[key] for row in rows) for key in aggregates}
+    data = _format_row(totals)
+    data["by_project"] = [
+        {"project": row["project"], **_format_row(row)}
+        for row in rows
+    ]
+    return data
+
+
+def compute_tasks_stats(project_ids=None, now=None):
+    """
+    Считает статистику задач.
+
+    project_ids=None  -> общая статистика (один агрегирующий запрос);
+    project_ids=[]    -> разбивка по всем проектам;
+    project_ids=[...] -> разбивка по указанным проектам.
+    Разбивка по проектам — тоже один запрос (GROUP BY project_id),
+    общие итоги складываются из групп без дополнительного обращения к БД.
+    """
+    qs, aggregates = _stats_query(project_ids, now or timezone.now())
+    if project_ids is None:
+        return _format_row(qs.aggregate(**aggregates))
+    return _format_projects(list(_grouped(qs, aggregates)), aggregates)
+
+
+async def acompute_tasks_stats(project_ids=None, now=None):
+    """Асинхронный вариант compute_tasks_stats (тот же один запрос)."""
+    qs, aggregates = _stats_query(project_ids, now or timezone.now())
+    if project_ids is None:
+        return _format_row(await qs.aaggregate(**aggregates))
+    return _format_projects([row async for row in _grouped(qs, aggregates)], aggregates)
+
+
+def _stats_cache_key(project_ids, generation):
+    bucket = int(time.time() // TASKS_STATS_CACHE_TTL)
+    scope = "all" if project_ids is None else ",".join(map(str, project_ids)) or "projects"
+    return f"tasks_stats:{generation}:{bucket}:{scope}"
+
+
+def get_tasks_stats(project_ids=None):
+    """
+    Статистика из кэша. Ключ состоит из поколения (увеличивается при каждом
+    изменении задач) и номера временной корзины, так что данные живут не
+    дольше TASKS_STATS_CACHE_TTL и сразу устаревают после записи.
+    """
+    key = _stats_cache_key(project_ids, cache.get(TASKS_STATS_GENERATION_KEY, 0))
+    data = cache.get(key)
+    if data is None:
+        data = compute_tasks_stats(project_ids)
+        cache.set(key, data, TASKS_STATS_CACHE_TTL)
+    return data
+
+
+async def aget_tasks_stats(project_ids=None):
+    """Асинхронный вариант get_tasks_stats с тем же ключом кэша."""
+    key = _stats_cache_key(project_ids, await cache.aget(TASKS_STATS_GENERATION_KEY, 0))
+    data = await cache.aget(key)
+    if data is None:
+        data = await acompute_tasks_stats(project_ids)
+        await cache.aset(key, data, TASKS_STATS_CACHE_TTL)
+    return data
+
+
+def invalidate_tasks_stats():
+    """Сдвигает поколение — все ранее закэшированные варианты статистики устаревают."""
+    cache.add(TASKS_STATS_GENERATION_KEY, 0, timeout=None)
+    try:
+        cache.incr(TASKS_STATS_GENERATION_KEY)
+    except ValueError:
+        # ключ успели вытеснить между add и incr
+        cache.set(TASKS_STATS_GENERATION_KEY, 1, timeout=None)
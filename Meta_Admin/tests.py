@@ -1,3 +1,714 @@
+import json
+from unittest import mock
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.testing import QueryPlanMixin, admin_changelist_urls
+
+from .models import Project, ProjectFile, SubTask, Tag, Task
+
+
+class TaskTestDataMixin:
+    """Общие тестовые данные для API задач."""
+
+    @classmethod
+    def create_project(cls, name="Проект"):
+        return Project.objects.create(name=name, description=f"Описание: {name}")
+
+    @classmethod
+    def create_task(cls, project, title, **fields):
+        fields.setdefault("priority", "Low")
+        fields.setdefault("description", "...")
+        return Task.objects.create(project=project, title=title, **fields)
+
+
+class TasksStatsTests(TaskTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.alpha = self.create_project("Alpha")
+        self.beta = self.create_project("Beta")
+        self.create_task(self.alpha, "Первая задача A", status="New", priority="High",
+                         due_date=now - timedelta(days=1))
+        self.create_task(self.alpha, "Вторая задача A", status="Closed", priority="Low")
+        self.create_task(self.beta, "Первая задача B", status="New", priority="Very High",
+                         due_date=now + timedelta(days=1))
+        self.create_task(self.beta, "Удалённая задача", status="New", deleted_at=now)
+
+    def test_stats_in_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("tasks-stats"))
+
+        data = response.json()
+        self.assertEqual(data["total_tasks"], 3)
+        self.assertEqual(data["overdue_tasks"], 1)
+        by_status = {row["status"]: row["count"] for row in data["tasks_by_status"]}
+        self.assertEqual((by_status["New"], by_status["Closed"]), (2, 1))
+        by_priority = {row["priority"]: row["count"] for row in data["tasks_by_priority"]}
+        self.assertEqual(by_priority["Very High"], 1)
+
+    def test_per_project_breakdown_in_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("tasks-stats") + "?project=all")
+
+        data = response.json()
+        self.assertEqual(data["total_tasks"], 3)
+        per_project = {row["project"]: row["total_tasks"] for row in data["by_project"]}
+        self.assertEqual(per_project, {self.alpha.pk: 2, self.beta.pk: 1})
+
+        response = self.client.get(reverse("tasks-stats") + f"?project={self.beta.pk}")
+        self.assertEqual(response.json()["total_tasks"], 1)
+
+    def test_cached_until_tasks_change(self):
+        url = reverse("tasks-stats")
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        self.create_task(self.beta, "Новая задача B", status="New")
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.json()["total_tasks"], 4)
+
+    def test_invalid_project_param(self):
+        for value in ("abc", ",", " , ,"):
+            response = self.client.get(reverse("tasks-stats"), {"project": value})
+            self.assertEqual(response.status_code, 400, value)
+
+
+class WeekdayFilterTests(TaskTestDataMixin, TestCase):
+    def setUp(self):
+        project = self.create_project()
+        # 2030-01-01 — вторник (week_day = 3), 2030-01-06 — воскресенье (week_day = 1)
+        self.tuesday = self.create_task(
+            project, "Задача на вторник", due_date=datetime(2030, 1, 1, 12, tzinfo=dt_timezone.utc)
+        )
+        self.sunday = self.create_task(
+            project, "Задача на воскресенье", due_date=datetime(2030, 1, 6, 12, tzinfo=dt_timezone.utc)
+        )
+        SubTask.objects.create(title="Подзадача вторника", task=self.tuesday)
+
+    def test_weekday_is_stored_on_save(self):
+        self.assertEqual((self.tuesday.due_weekday, self.sunday.due_weekday), (3, 1))
+        self.assertEqual(
+            set(Task.objects.filter(due_date__week_day=3)),
+            set(Task.objects.filter(due_weekday=3)),
+        )
+
+        self.sunday.due_date = None
+        self.sunday.save(update_fields=["due_date"])
+        self.sunday.refresh_from_db()
+        self.assertIsNone(self.sunday.due_weekday)
+
+    def test_endpoints_filter_by_stored_weekday(self):
+        response = self.client.get(reverse("tasks-list") + "?day_of_week=вторник")
+        self.assertEqual([task["id"] for task in response.json()["results"]], [self.tuesday.pk])
+
+        response = self.client.get("/api/subtasks/day/tuesday/")
+        self.assertEqual([row["title"] for row in response.json()["results"]], ["Подзадача вторника"])
+
+        response = self.client.get("/api/subtasks/day/sunday/")
+        self.assertEqual(response.json()["results"], [])
+
+
+class MetaAdminQueryPlanTests(QueryPlanMixin, TaskTestDataMixin, TestCase):
+    """Все запросы API задач и changelist'ов админки должны идти через индексы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = cls.create_project()
+        cls.task = cls.create_task(cls.project, "Задача для планов", status="New",
+                                   due_date=timezone.now() + timedelta(days=2))
+        cls.subtask = SubTask.objects.create(title="Подзадача", task=cls.task)
+        cls.admin_user = User.objects.create_superuser("admin", "admin@example.com", "password")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin_user)
+
+    def test_api_queries_use_indexes(self):
+        for url in (
+            reverse("tasks-list"),
+            reverse("tasks-list") + "?day_of_week=monday",
+            reverse("tasks-list") + "?include=subtasks",
+            reverse("task-detail", args=[self.task.pk]),
+            reverse("tasks-stats"),
+            reverse("tasks-stats") + f"?project={self.project.pk}",
+            reverse("subtask-list-create"),
+            reverse("subtask-list-create") + "?status=new",
+            reverse("subtask-list-create") + "?task_title=планов",
+            reverse("subtask-list-create") + "?search=задача",
+            reverse("subtask-detail", args=[self.subtask.pk]),
+            reverse("subtask-statuses"),
+            "/api/subtasks/day/monday/",
+        ):
+            self.assertIndexedQueries(url)
+
+    def test_admin_changelists_use_indexes(self):
+        for url in admin_changelist_urls("Meta_Admin"):
+            self.assertIndexedQueries(url)
+
+    def test_admin_filtered_changelists_use_indexes(self):
+        for url in (
+            "/admin/Meta_Admin/task/?status__exact=New",
+            "/admin/Meta_Admin/task/?priority__exact=Low",
+            f"/admin/Meta_Admin/task/?project__id__exact={self.project.pk}",
+            "/admin/Meta_Admin/subtask/?status__exact=New",
+            f"/admin/Meta_Admin/subtask/?task__id__exact={self.task.pk}",
+            "/admin/Meta_Admin/task/?q=планов",
+            "/admin/Meta_Admin/subtask/?q=задача",
+        ):
+            self.assertIndexedQueries(url)
+
+
+class SubTaskBulkTests(TaskTestDataMixin, TestCase):
+    def setUp(self):
+        project = self.create_project()
+        self.task = self.create_task(project, "Главная задача")
+        self.existing = SubTask.objects.create(title="Старое название", task=self.task)
+        self.url = reverse("subtask-bulk")
+
+    def test_json_array_creates_updates_and_reports_errors(self):
+        payload = [
+            {"title": f"Подзадача {i}", "task": self.task.pk, "status": "Pending"}
+            for i in range(30)
+        ]
+        payload += [
+            {"title": "Без задачи", "task": 999999},
+            {"id": self.existing.pk, "title": "Новое название", "task": self.task.pk},
+            {"id": 999999, "title": "Нет такой", "task": self.task.pk},
+            "не объект",
+        ]
+
+        # проверка FK и id (2), INSERT, UPDATE, поисковый индекс (2), версия для ETag
+        # и savepoint транзакции (2)
+        with self.assertNumQueries(9):
+            response = self.client.post(self.url, payload, content_type="application/json")
+
+        self.assertEqual(response.status_code, 207)
+        data = response.json()
+        self.assertEqual(len(data["created"]), 30)
+        self.assertEqual(data["updated"], [self.existing.pk])
+        self.assertEqual([error["index"] for error in data["errors"]], [30, 32, 33])
+        self.assertIn("task", data["errors"][0]["errors"])
+
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.title, "Новое название")
+        self.assertEqual(SubTask.objects.filter(status="Pending").count(), 30)
+
+    def test_ndjson_body(self):
+        body = "\n".join(
+            json.dumps({"title": f"NDJSON {i}", "task": self.task.pk}) for i in range(3)
+        )
+        response = self.client.post(self.url, body, content_type="application/x-ndjson")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(SubTask.objects.filter(title__startswith="NDJSON").count(), 3)
+
+    def post_without_returning(self, prefix, count):
+        # как на MySQL: bulk INSERT не возвращает id
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False), \
+                CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                self.url,
+                [{"title": f"{prefix} {i}", "task": self.task.pk} for i in range(count)],
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 201)
+        created = response.json()["created"]
+        self.assertEqual(
+            created,
+            list(SubTask.objects.filter(title__startswith=prefix).order_by("pk").values_list("pk", flat=True)),
+        )
+        self.assertEqual(set(SubTask.objects.search(prefix).values_list("pk", flat=True)), set(created))
+        inserts = [query["sql"] for query in ctx.captured_queries if query["sql"].startswith("INSERT INTO")]
+        return [sql for sql in inserts if sql.startswith(f'INSERT INTO "{SubTask._meta.db_table}" ')], inserts
+
+    def test_backend_without_returning_ids(self):
+        # id не подряд (или не MySQL): INSERT на строку, но без post_save —
+        # индекс и версия обновляются один раз на пачку
+        subtask_inserts, inserts = self.post_without_returning("Без RETURNING", 3)
+        self.assertEqual(len(subtask_inserts), 3)
+        self.assertEqual(len([sql for sql in inserts if "_fts" in sql]), 1)
+
+    def test_backend_with_consecutive_auto_increment(self):
+        # MySQL с innodb_autoinc_lock_mode 0/1: id первой строки из LAST_INSERT_ID() и шаг
+        def first_inserted_id(self, cursor, table_name, pk_name):
+            return cursor.lastrowid - cursor.rowcount + 1  # SQLite отдаёт id последней строки
+
+        with mock.patch("Meta_Admin.api_views._auto_increment_step", return_value=1), \
+                mock.patch.object(type(connection.ops), "last_insert_id", first_inserted_id):
+            subtask_inserts, _ = self.post_without_returning("Пачкой", 5)
+        self.assertEqual(len(subtask_inserts), 1)
+
+    def test_same_id_twice_is_an_item_error(self):
+        response = self.client.post(
+            self.url,
+            [
+                {"id": self.existing.pk, "title": "Первое", "task": self.task.pk},
+                {"id": self.existing.pk, "title": "Второе", "task": self.task.pk},
+            ],
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.json()["updated"], [self.existing.pk])
+        self.assertEqual([error["index"] for error in response.json()["errors"]], [1])
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.title, "Первое")
+
+    def test_all_invalid_returns_400(self):
+        response = self.client.post(self.url, [{"title": "x"}], content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(self.url, {"title": "x"}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class SubTaskPaginationTests(TaskTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        project = self.create_project()
+        task = self.create_task(project, "Главная задача")
+        for i in range(12):
+            SubTask.objects.create(title=f"Подзадача {i}", task=task)
+        self.url = reverse("subtask-list-create")
+
+    def test_pages_without_count_query(self):
+        # версия таблиц для ETag + страница (page_size + 1), без COUNT(*)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        data = response.json()
+        self.assertIsNone(data["count"])
+        self.assertEqual(len(data["results"]), 5)
+        self.assertIsNotNone(data["next"])
+        self.assertIsNone(data["previous"])
+
+        # последняя страница: число известно без COUNT(*) и попадает в кэш
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url + "?page=3")
+        data = response.json()
+        self.assertEqual((data["count"], len(data["results"])), (12, 2))
+        self.assertIsNone(data["next"])
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()["count"], 12)
+
+    def test_exact_count_on_request(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url + "?exact_count=1&status=new")
+        self.assertEqual(response.json()["count"], 12)
+        self.assertNotIn("exact_count", response.json()["next"])
+
+        # у другого фильтра своя запись в кэше
+        response = self.client.get(self.url + "?status=closed")
+        self.assertEqual(response.json()["count"], 0)
+
+    def test_invalid_page(self):
+        self.assertEqual(self.client.get(self.url + "?page=9").status_code, 404)
+        self.assertEqual(self.client.get(self.url + "?page=abc").status_code, 404)
+
+
+class SearchTests(TaskTestDataMixin, TestCase):
+    def setUp(self):
+        project = self.create_project()
+        self.report = self.create_task(project, "Квартальный отчёт", description="Сводка по продажам")
+        self.release = self.create_task(project, "Релиз мобильного приложения")
+        self.draft = SubTask.objects.create(title="Черновик отчёта", task=self.report)
+        self.charts = SubTask.objects.create(
+            title="Графики", description="Графики продаж для отчёта и черновик", task=self.report
+        )
+        self.build = SubTask.objects.create(title="Сборка", task=self.release)
+
+    def test_substring_search_ignores_case(self):
+        self.assertEqual(list(Task.objects.search("КВАРТАЛ")), [self.report])
+        self.assertEqual(list(Task.objects.search("продажам")), [self.report])
+        self.assertEqual(
+            set(SubTask.objects.search("мобильного", fields=["task_title"])),
+            {self.build},
+        )
+        # короче трёх символов — запасной icontains
+        self.assertEqual(set(SubTask.objects.search("Сб")), {self.build})
+
+    def test_index_follows_changes(self):
+        self.release.title = "Релиз веб-версии"
+        self.release.save()
+        self.assertEqual(list(SubTask.objects.search("веб-версии", fields=["task_title"])), [self.build])
+        self.assertFalse(SubTask.objects.search("мобильного").exists())
+
+        self.draft.delete()
+        self.assertEqual(list(SubTask.objects.search("Черновик", fields=["title"])), [])
+
+        response = self.client.post(
+            reverse("subtask-bulk"),
+            [{"title": "Импортированная подзадача", "task": self.release.pk}],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(SubTask.objects.search("Импортированная").exists())
+
+    def test_api_filters_and_ranking(self):
+        url = reverse("subtask-list-create")
+        response = self.client.get(url + "?task_title=квартальный")
+        self.assertEqual(
+            {row["id"] for row in response.json()["results"]},
+            {self.draft.pk, self.charts.pk},
+        )
+
+        response = self.client.get(url + "?search=черновик")
+        # совпадение в названии ранжируется выше, чем в длинном описании
+        self.assertEqual([row["id"] for row in response.json()["results"]], [self.draft.pk, self.charts.pk])
+
+    def test_ranked_search_runs_match_once(self):
+        for i in range(30):
+            SubTask.objects.create(title=f"Черновик {i}", description="черновик " * (i % 5), task=self.report)
+        url = reverse("subtask-list-create")
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url + "?search=черновик&task_title=квартальный")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["task"], self.report.pk)
+        # поиск — один JOIN с MATCH, фильтр по задаче — ещё один MATCH, без подзапроса на строку
+        matches = [query["sql"].count("MATCH") for query in ctx.captured_queries if "MATCH" in query["sql"]]
+        self.assertEqual(matches, [2])
+        self.assertIn("INNER JOIN (SELECT rowid, rank FROM", next(
+            query["sql"] for query in ctx.captured_queries if "MATCH" in query["sql"]
+        ))
+
+        ranked = SubTask.objects.search("черновик", rank=True)
+        self.assertEqual(ranked.count(), 32)
+        self.assertEqual(set(SubTask.objects.filter(pk__in=ranked.values("pk"))), set(ranked))
+
+    def test_ranked_search_cannot_be_combined(self):
+        ranked = SubTask.objects.search("черновик", rank=True)
+        other = SubTask.objects.filter(pk=self.charts.pk)
+
+        for combine in (
+            lambda: ranked | other, lambda: other | ranked, lambda: ranked & other, lambda: ranked ^ other,
+            lambda: ranked.union(other), lambda: other.union(ranked),
+            lambda: ranked.intersection(other), lambda: ranked.difference(other),
+        ):
+            with self.assertRaises(TypeError):
+                combine()
+        # без rank поиск — обычный pk__in, OR работает как ожидается
+        self.assertEqual(
+            set(SubTask.objects.search("черновик") | other),
+            set(SubTask.objects.search("черновик")) | {self.charts},
+        )
+
+    def test_admin_search_uses_index(self):
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(admin_user)
+        response = self.client.get("/admin/Meta_Admin/subtask/?q=графики")
+        self.assertEqual(list(response.context["cl"].result_list), [self.charts])
+
+
+class TaskListTests(TaskTestDataMixin, TestCase):
+    def setUp(self):
+        self.project = self.create_project()
+        self.tags = [Tag.objects.create(name=f"tag-{i}") for i in range(3)]
+        self.counter = 0
+
+    def add_tasks(self, count):
+        for _ in range(count):
+            self.counter += 1
+            task = self.create_task(self.project, f"Задача номер {self.counter:03d}")
+            task.tags.set(self.tags[: self.counter % 3 + 1])
+            SubTask.objects.create(title=f"Подзадача {self.counter}", task=task)
+
+    def test_query_count_is_flat(self):
+        url = reverse("tasks-list")
+        for count in (2, 20):
+            self.add_tasks(count)
+            # версия для ETag + задачи + теги
+            with self.assertNumQueries(3):
+                response = self.client.get(url)
+            self.assertIn("tags", response.json()["results"][0])
+            # версия для ETag + задачи + теги + подзадачи
+            with self.assertNumQueries(4):
+                response = self.client.get(url + "?include=subtasks")
+            self.assertEqual(len(response.json()["results"][0]["subtasks"]), 1)
+
+    def test_cursor_pagination(self):
+        self.add_tasks(7)
+        url = reverse("tasks-list") + "?page_size=3"
+        titles = []
+        while url:
+            data = self.client.get(url).json()
+            titles.extend(task["title"] for task in data["results"])
+            url = data["next"]
+        self.assertEqual(titles, [f"Задача номер {i:03d}" for i in range(7, 0, -1)])
+
+    def test_tags_serialized_in_id_order(self):
+        self.add_tasks(2)
+        task = self.client.get(reverse("tasks-list")).json()["results"][-1]
+        self.assertEqual(task["tags"], [tag.pk for tag in self.tags[:2]])
+
+
+class ConditionalRequestTests(TaskTestDataMixin, TestCase):
+    """ETag / Last-Modified: 304 без сериализации, If-Match против потерянных обновлений."""
+
+    def setUp(self):
+        caches["responses"].clear()
+        self.project = self.create_project()
+        self.task = self.create_task(self.project, "Задача")
+        self.subtask = SubTask.objects.create(title="Подзадача", task=self.task)
+
+    def test_task_detail_served_from_cache(self):
+        url = reverse("task-detail", args=[self.task.pk])
+        first = self.client.get(url).json()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).json(), first)
+
+        self.task.title = "Переименована"
+        self.task.save()
+        self.assertEqual(self.client.get(url).json()["title"], "Переименована")
+        self.assertEqual(self.client.get(reverse("task-detail", args=[0])).status_code, 404)
+
+    def test_task_detail_not_modified_until_changed(self):
+        url = reverse("task-detail", args=[self.task.pk])
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # теги не меняют колонки задачи, но updated_at всё равно обновляется
+        self.task.tags.add(Tag.objects.create(name="срочно"))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_lists_follow_table_version(self):
+        for url in (reverse("tasks-list"), reverse("subtask-list-create")):
+            etag = self.client.get(url)["ETag"]
+            with self.assertNumQueries(1):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            # у другого набора параметров свой ETag
+            self.assertNotEqual(self.client.get(url + "?page_size=1")["ETag"], etag)
+
+        etag = self.client.get(reverse("subtask-list-create"))["ETag"]
+        self.client.post(
+            reverse("subtask-bulk"),
+            data=json.dumps([{"title": "Из пачки", "task": self.task.pk}]),
+            content_type="application/json",
+        )
+        response = self.client.get(reverse("subtask-list-create"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_match_on_subtask_update(self):
+        url = reverse("subtask-detail", args=[self.subtask.pk])
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.patch(
+            url, data={"status": "Closed"}, content_type="application/json", HTTP_IF_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # второй клиент с тем же (уже устаревшим) ETag не затирает изменение
+        response = self.client.patch(
+            url, data={"status": "New"}, content_type="application/json", HTTP_IF_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 412)
+        self.subtask.refresh_from_db()
+        self.assertEqual(self.subtask.status, "Closed")
+
+
+class FastPathTests(TaskTestDataMixin, TestCase):
+    """?fast=1 отдаёт тот же JSON, что и DRF-сериализаторы."""
+
+    def setUp(self):
+        project = self.create_project()
+        tags = [Tag.objects.create(name=f"tag-{i}") for i in range(3)]
+        due = datetime(2025, 3, 4, 10, 30, 15, 123456, tzinfo=dt_timezone.utc)
+        for i in range(7):
+            task = self.create_task(
+                project, f"Задача {i}", status="In Progress", priority="High",
+                due_date=due if i % 2 else None,
+            )
+            task.tags.set(tags[i % 3:])
+            SubTask.objects.create(title=f"Подзадача отчёта {i}", task=task, deadline=due)
+
+    def test_lists_are_byte_identical(self):
+        renderer = JSONRenderer()
+        for url in (
+            reverse("tasks-list"),
+            reverse("tasks-list") + "?page_size=3",
+            reverse("tasks-list") + "?day_of_week=tuesday",
+            reverse("subtask-list-create"),
+            reverse("subtask-list-create") + "?page=2",
+            reverse("subtask-list-create") + "?search=отчёта",
+            "/api/subtasks/day/tuesday/",
+        ):
+            slow = self.client.get(url).data["results"]
+            fast = self.client.get(url + ("&" if "?" in url else "?") + "fast=1").data["results"]
+            self.assertTrue(slow, url)
+            self.assertEqual(renderer.render(fast), renderer.render(slow), url)
+
+    def test_query_count_does_not_grow(self):
+        url = reverse("tasks-list") + "?fast=1"
+        # версия для ETag + задачи + связи с тегами
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+
+class AsyncTaskApiTests(TaskTestDataMixin, TestCase):
+    """Async-эндпоинты задач: тот же JSON и ETag, что у синхронных."""
+
+    @classmethod
+    def setUpTestData(cls):
+        project = cls.create_project()
+        tags = [Tag.objects.create(name=f"tag-{i}") for i in range(2)]
+        cls.tasks = []
+        for i in range(4):
+            task = cls.create_task(project, f"Задача {i}", status="New", priority="High")
+            task.tags.set(tags[: i % 3])
+            SubTask.objects.create(title=f"Подзадача {i}", task=task, status="Pending")
+            cls.tasks.append(task)
+
+    def setUp(self):
+        cache.clear()
+        caches["responses"].clear()
+
+    async def test_lists_match_sync(self):
+        for sync_name, async_name in (("tasks-list", "async-tasks-list"),
+                                      ("subtask-list-create", "async-subtask-list")):
+            sync = (await self.async_client.get(reverse(sync_name))).json()["results"]
+            response = await self.async_client.get(reverse(async_name) + "?page_size=3")
+            page = response.json()
+            self.assertEqual(page["results"], sync[:3])
+            rest = (await self.async_client.get(page["next"])).json()
+            self.assertEqual(rest["results"], sync[3:])
+            self.assertIsNone(rest["next"])
+
+    async def test_detail_and_stats(self):
+        task = self.tasks[1]
+        sync = await self.async_client.get(reverse("task-detail", args=[task.pk]))
+        response = await self.async_client.get(reverse("async-task-detail", args=[task.pk]))
+        self.assertEqual(response.content, sync.content)
+        self.assertEqual(response["Last-Modified"], sync["Last-Modified"])
+
+        response = await self.async_client.get(
+            reverse("async-task-detail", args=[task.pk]), headers={"If-None-Match": sync["ETag"]},
+        )
+        self.assertEqual(response.status_code, 304)
+
+        for query in ("", "?project=all"):
+            sync = await self.async_client.get(reverse("tasks-stats") + query)
+            response = await self.async_client.get(reverse("async-tasks-stats") + query)
+            self.assertEqual(response.json(), sync.json())
+        response = await self.async_client.get(reverse("async-tasks-stats") + "?project=x")
+        self.assertEqual(response.status_code, 400)
+
+
+class ReplaceCharactersActionTests(TaskTestDataMixin, TestCase):
+    """Действие админки «Заменить символы в названии» — один UPDATE по всем выбранным."""
+
+    def setUp(self):
+        self.url = reverse("admin:Meta_Admin_project_changelist")
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+        self.projects = [self.create_project(f"alpha-{i}") for i in range(5)]
+        self.other = self.create_project("beta")
+
+    def post(self, projects, **data):
+        return self.client.post(self.url, {
+            "action": "replace_characters",
+            "_selected_action": [project.pk for project in projects],
+            "old_char": "-",
+            "new_char": "_",
+            **data,
+        })
+
+    def test_apply_replaces_in_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(self.projects, apply="1")
+
+        self.assertEqual(response.status_code, 302)
+        updates = [query["sql"] for query in queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertIn("REPLACE", updates[0])
+        self.assertEqual(
+            sorted(Project.objects.values_list("name", flat=True)),
+            ["alpha_0", "alpha_1", "alpha_2", "alpha_3", "alpha_4", "beta"],
+        )
+
+    def test_preview_does_not_change_names(self):
+        response = self.post(self.projects[:2] + [self.other], preview="1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["preview"]["selected"], 3)
+        self.assertEqual(response.context["preview"]["affected"], 2)
+        self.assertEqual(response.context["preview"]["examples"], [("alpha-0", "alpha_0"), ("alpha-1", "alpha_1")])
+        self.assertContains(response, 'name="_selected_action"', count=3)
+        self.assertEqual(Project.objects.filter(name__startswith="alpha-").count(), 5)
+
+    def test_conflicting_names_are_rejected(self):
+        self.create_project("alpha_0")
+
+        response = self.post(self.projects, apply="1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Project.objects.filter(name__startswith="alpha-").count(), 5)
+        self.assertContains(response, "alpha_0")
+
+    def test_conflict_between_selected_projects(self):
+        twin = self.create_project("alpha_0")
+
+        response = self.post([self.projects[0], twin], preview="1")
+
+        self.assertEqual(response.context["preview"]["conflicts"], ["alpha_0"])
+
+
+class ProjectFilesCountTests(TaskTestDataMixin, TestCase):
+    """Число файлов в changelist проектов считается в SQL, а не запросом на строку."""
+
+    def setUp(self):
+        self.url = reverse("admin:Meta_Admin_project_changelist")
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+
+    def create_projects(self, count):
+        for i in range(count):
+            project = self.create_project(f"Проект {Project.objects.count()}")
+            project.files.set(
+                ProjectFile.objects.create(name=f"file-{project.pk}-{n}", file="projects/x.txt") for n in range(i)
+            )
+
+    def test_changelist_query_count_does_not_grow(self):
+        self.create_projects(2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.url)
+        self.create_projects(5)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(few), len(many))
+
+    def test_sort_by_files_count(self):
+        self.create_projects(3)
+
+        response = self.client.get(self.url + "?o=-3")
+
+        counts = [project.count_of_files for project in response.context["cl"].result_list]
+        self.assertEqual(counts, [2, 1, 0])
+
+    def test_property_falls_back_to_query(self):
+        self.create_projects(3)
+        project = Project.objects.get(name="Проект 2")
+        annotated = Project.objects.annotate_files_count().get(pk=project.pk)
 
-# Create your tests here.
+        with self.assertNumQueries(0):
+            self.assertEqual(annotated.count_of_files, 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(project.count_of_files, 2)
@@ -1,7 +1,8 @@
 from django.urls import path
-from . import api_views
+from . import api_views, async_views
 from .api_views import (
     SubTaskListCreateView,
+    SubTaskBulkView,
     SubTaskDetailUpdateDeleteView,
     subtask_statuses,   # ← ДОБАВЛЕНО!
 )
@@ -15,6 +16,7 @@ urlpatterns = [
 
     # Задание 13 — SubTask
     path("api/subtasks/", SubTaskListCreateView.as_view(), name="subtask-list-create"),
+    path("api/subtasks/bulk/", SubTaskBulkView.as_view(), name="subtask-bulk"),
     path("api/subtasks/<int:pk>/", SubTaskDetailUpdateDeleteView.as_view(), name="subtask-detail"),
 
     # СТАТУСЫ ПОДЗАДАЧ
@@ -22,4 +24,10 @@ urlpatterns = [
 
     # weekda
     path("api/subtasks/day/<str:weekday>/", api_views.subtasks_by_weekday),
+
+    # async-версии (ASGI)
+    path("api/async/tasks/", async_views.tasks_list, name="async-tasks-list"),
+    path("api/async/tasks/<int:pk>/", async_views.task_detail, name="async-task-detail"),
+    path("api/async/tasks/stats/", async_views.tasks_stats, name="async-tasks-stats"),
+    path("api/async/subtasks/", async_views.subtasks_list, name="async-subtask-list"),
 ]
@@ -0,0 +1,59 @@
+"""
+Общие части async-версий API (ASGI).
+
+DRF-представления синхронные, поэтому async-эндпоинты — обычные Django
+async-view: данные читаются асинхронным ORM (aget/afirst/async for),
+сериализуются теми же DRF-сериализаторами (связи подгружены заранее,
+запросов при сериализации нет) и рендерятся JSONRenderer'ом DRF, так что
+JSON совпадает с синхронными эндпоинтами.
+"""
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+KEYSET_PARAM = "after_id"
+PAGE_SIZE_PARAM = "page_size"
+
+_renderer = JSONRenderer()
+
+
+def render_json(data, status=200):
+    return HttpResponse(_renderer.render(data), status=status, content_type="application/json")
+
+
+def _positive_int(value, default):
+    if value in (None, ""):
+        return default
+    number = int(value)
+    if number < 1:
+        raise ValueError(value)
+    return number
+
+
+async def keyset_page(request, queryset, serialize, page_size=50, max_page_size=500):
+    """
+    Страница по ключу id (новые первыми): ?after_id=<id последней строки>
+    и ?page_size=. Без OFFSET и COUNT(*); "next" — ссылка на следующую
+    страницу или null. serialize(list) -> данные для "results".
+    """
+    try:
+        size = min(_positive_int(request.GET.get(PAGE_SIZE_PARAM), page_size), max_page_size)
+        after_id = _positive_int(request.GET.get(KEYSET_PARAM), None)
+    except ValueError:
+        return render_json(
+            {"detail": f"{PAGE_SIZE_PARAM} и {KEYSET_PARAM} должны быть положительными числами."},
+            status=400,
+        )
+
+    queryset = queryset.order_by("-id")
+    if after_id is not None:
+        queryset = queryset.filter(id__lt=after_id)
+    rows = [row async for row in queryset[: size + 1]]
+
+    next_url = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_url = replace_query_param(request.build_absolute_uri(), KEYSET_PARAM, rows[-1].pk)
+    previous_url = remove_query_param(request.build_absolute_uri(), KEYSET_PARAM) if after_id else None
+
+    return render_json({"next": next_url, "previous": previous_url, "results": serialize(rows)})
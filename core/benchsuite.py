@@ -0,0 +1,182 @@
+"""
+Бенчмарк всех эндпоинтов и changelist'ов админки.
+
+Для каждого URL из core.urls (плюс changelist каждой зарегистрированной
+в админке модели) замеряется:
+- количество SQL-запросов;
+- задержка p50/p95 по нескольким повторам;
+- пик памяти Python (tracemalloc) за один запрос.
+
+Перед каждым запросом кэши очищаются, поэтому замер — «холодный» путь,
+а число запросов не зависит от порядка. Результаты сравниваются с
+сохранённым JSON-базисом: рост числа запросов — всегда регрессия,
+медианная задержка и память — если выросли больше допустимой доли.
+Команда: manage.py benchmark_suite.
+"""
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.contrib import admin
+from django.core.cache import caches
+from django.db import connection
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from core import datagen
+from core.sqltrace import QueryStats, QueryTracer
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+# пути, которые не участвуют в замере (админка меряется по changelist'ам)
+SKIP_PREFIXES = ("admin/",)
+
+
+def parse_scale(value):
+    """'1k' / '100k' / '1m' или просто число строк."""
+    value = str(value).lower()
+    if value in SCALES:
+        return SCALES[value]
+    rows = int(value)
+    if rows < 1:
+        raise ValueError(value)
+    return rows
+
+
+def seed(rows, batch_size=5000, random_seed=0):
+    """Синтетические данные на rows книг (core/datagen.py, в этом же процессе)."""
+    datagen.generate(datagen.make_plan(rows), seed=random_seed, batch_size=batch_size)
+
+
+def sample_kwargs():
+    """Значения параметров URL: первая строка соответствующей модели."""
+    from library.models import Book
+    from Meta_Admin.models import SubTask, Task
+
+    def first(model):
+        return model.objects.order_by("pk").values_list("pk", flat=True).first()
+
+    book, task, subtask = first(Book), first(Task), first(SubTask)
+    return {
+        "book-detail-update-delete": {"pk": book},
+        "async-book-detail": {"pk": book},
+        "task-detail": {"pk": task},
+        "async-task-detail": {"pk": task},
+        "subtask-detail": {"pk": subtask},
+    }
+
+
+# значения параметров, не привязанные к строкам БД
+DEFAULT_KWARGS = {"weekday": "monday", "dataset": "borrows"}
+
+
+def _walk(resolver, prefix=""):
+    for pattern in resolver.url_patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from _walk(pattern, route)
+        elif isinstance(pattern, URLPattern):
+            yield route, pattern
+
+
+def endpoint_urls(kwargs_by_name):
+    """
+    Все адреса из core.urls. Параметры пути берутся из kwargs_by_name
+    (по имени URL) и DEFAULT_KWARGS; адреса, для которых значений нет,
+    возвращаются вторым списком.
+    """
+    urls, skipped = [], []
+    for route, pattern in _walk(get_resolver("core.urls")):
+        if route.startswith(SKIP_PREFIXES):
+            continue
+        values = {**DEFAULT_KWARGS, **kwargs_by_name.get(pattern.name, {})}
+        kwargs = {name: values.get(name) for name in pattern.pattern.converters}
+        if None in kwargs.values():
+            skipped.append("/" + route)
+            continue
+        urls.append(reverse(pattern.name or pattern.callback, kwargs=kwargs))
+    return urls, skipped
+
+
+def admin_urls():
+    return sorted(
+        reverse(f"admin:{model._meta.app_label}_{model._meta.model_name}_changelist")
+        for model in admin.site._registry
+    )
+
+
+def _clear_caches():
+    for alias in caches:
+        caches[alias].clear()
+
+
+def _consume(response):
+    """Потоковый ответ выполняет запросы, только пока его читают."""
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+
+
+def measure(client, url, repeat=5):
+    """Один URL: статус, число запросов, p50/p95 в мс и пик памяти в КБ."""
+    _clear_caches()
+    _consume(client.get(url))  # прогрев: импорты, шаблоны, подготовленные запросы
+
+    timings = []
+    for _ in range(repeat):
+        _clear_caches()
+        stats = QueryStats()
+        with connection.execute_wrapper(QueryTracer(stats)):
+            started = time.perf_counter()
+            response = client.get(url)
+            _consume(response)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    _clear_caches()
+    tracemalloc.start()
+    try:
+        _consume(client.get(url))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "status": response.status_code,
+        "queries": stats.count,
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def compare(baseline, results, threshold=0.25, min_delta_ms=2.0, min_delta_kb=64.0):
+    """
+    Список регрессий относительно базиса. Число запросов не должно расти
+    вовсе; медианная задержка и память — не больше чем на threshold (и не
+    меньше чем на абсолютный порог, чтобы не ловить шум на быстрых URL).
+    p95 сохраняется для отчёта, но слишком шумный для автоматической проверки.
+    """
+    regressions = []
+    for url, current in results.items():
+        previous = baseline.get(url)
+        if previous is None:
+            continue
+        if current["queries"] > previous["queries"]:
+            regressions.append(f"{url}: запросов {previous['queries']} -> {current['queries']}")
+        for key, min_delta, unit in (("p50_ms", min_delta_ms, "ms"), ("peak_kb", min_delta_kb, "KB")):
+            limit = max(previous[key] * (1 + threshold), previous[key] + min_delta)
+            if current[key] > limit:
+                regressions.append(f"{url}: {key} {previous[key]} -> {current[key]} {unit}")
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding="utf-8") as fp:
+        return json.load(fp)
+
+
+def save_baseline(path, rows, results):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fp:
+        json.dump({"rows": rows, "results": results}, fp, ensure_ascii=False, indent=2, sort_keys=True)
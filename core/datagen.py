@@ -0,0 +1,434 @@
+"""
+Генератор больших согласованных наборов данных для профилирования.
+
+Каждая таблица описана в TABLES: сколько строк нужно на N книг, в какой
+фазе её заполнять и как построить строки для «номера» i. Идентификаторы
+сущностей, на которые ссылаются другие таблицы, назначаются явно
+диапазонами (base + i), поэтому внешние ключи вычисляются арифметически,
+без поиска уже созданных объектов, а куски таблицы можно заполнять
+в разных процессах независимо. Фазы идут по порядку зависимостей:
+сначала справочники, потом книги/задачи, затем отзывы, выдачи и связи M2M.
+
+Строки вставляются многострочными INSERT, собранными тем же компилятором,
+что и в bulk_create, но значения готовятся до начала транзакции.
+
+Данные детерминированы: генератор случайных чисел каждого куска
+инициализируется от (seed, таблица, начало куска), так что результат не
+зависит ни от числа процессов, ни от порядка их выполнения.
+
+Производные данные (рейтинг книг, поисковый индекс, версии для ETag)
+пересчитываются одним проходом в finalize() после вставки.
+"""
+import math
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from typing import Callable
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max, sql
+
+from core.versioning import bump_version
+
+# точка отсчёта дат: от неё, а не от текущего времени, чтобы данные не зависели от дня запуска
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+EPOCH_DATE = EPOCH.date()
+
+SQLITE_BUSY_TIMEOUT_MS = 10 * 60 * 1000
+
+
+@dataclass(frozen=True)
+class Table:
+    name: str
+    model: str  # "app_label.Model" или "app_label.Model.m2m_field" для through-таблицы
+    phase: int
+    per_book: float  # строк (для M2M — владельцев) на одну книгу
+    build: Callable  # (plan, rng, i) -> список экземпляров модели
+    explicit_ids: bool = False  # id из диапазона: на таблицу ссылаются FK или id входит в уникальные поля
+    minimum: int = 1
+    # для строителей, возвращающих несколько строк на владельца: (от, до, таблица) —
+    # случайное число связей из [от, до], но не больше строк в таблице
+    links: tuple = ()
+
+    def get_model(self):
+        app_label, model_name, *field = self.model.split(".")
+        model = apps.get_model(app_label, model_name)
+        if field:
+            return model._meta.get_field(field[0]).remote_field.through
+        return model
+
+
+class Plan:
+    """Количество строк и начальные id по таблицам (словари — чтобы передавать в процессы)."""
+
+    def __init__(self, counts, bases):
+        self.counts = counts
+        self.bases = bases
+
+    def id(self, table, index):
+        return self.bases[table] + index
+
+    def pick(self, rng, table):
+        """Случайный id существующей (или создаваемой в более ранней фазе) строки."""
+        return self.bases[table] + rng.randrange(self.counts[table])
+
+    def sample(self, rng, table, k):
+        """k различных id таблицы."""
+        return [self.bases[table] + index for index in rng.sample(range(self.counts[table]), k)]
+
+    def link_count(self, rng, table):
+        """Сколько связей построить одному владельцу таблицы table (см. Table.links)."""
+        low, high, target = TABLES_BY_NAME[table].links
+        return min(self.counts[target], rng.randint(low, high))
+
+    def rows(self, table):
+        """
+        Ожидаемое число строк таблицы. counts для таблиц со связями — число
+        владельцев, а строк в них в среднем столько, сколько связей у владельца;
+        точное число зависит от seed и есть только в отчёте generate().
+        """
+        links = TABLES_BY_NAME[table].links
+        if not links:
+            return self.counts[table]
+        low, high, target = links
+        per_owner = sum(min(self.counts[target], k) for k in range(low, high + 1)) / (high - low + 1)
+        return round(self.counts[table] * per_owner)
+
+    def total(self):
+        """Ожидаемое число строк всех таблиц — оценка, см. rows()."""
+        return sum(self.rows(table) for table in self.counts)
+
+
+# --- строители строк -------------------------------------------------------------
+
+GENRES = ["Fiction", "Non-Fiction", "Science Fiction", "Fantasy", "Mystery", "Biography"]
+TASK_STATUSES = ["New", "In_progress", "Completed", "Closed", "Pending", "Blocked"]
+SUBTASK_STATUSES = ["New", "Pending", "In Progress", "Closed"]
+PRIORITIES = ["Low", "Medium", "High", "Very High"]
+WORDS = ["алгоритм", "библиотека", "город", "море", "ночь", "путь", "сад", "свет", "тайна", "время"]
+
+
+def _text(rng, words=8):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _author(plan, rng, i):
+    model = apps.get_model("library", "Author")
+    return [model(
+        id=plan.id("authors", i), first_name=f"Имя{i}", last_name=f"Фамилия{i}",
+        birth_date=EPOCH_DATE - timedelta(days=rng.randint(20 * 365, 90 * 365)),
+        rating=rng.randint(1, 10),
+    )]
+
+
+def _publisher(plan, rng, i):
+    model = apps.get_model("library", "Publisher")
+    return [model(id=plan.id("publishers", i), name=f"Издатель {i}",
+                  established_date=EPOCH_DATE - timedelta(days=rng.randint(0, 36500)))]
+
+
+def _category(plan, rng, i):
+    model = apps.get_model("library", "Category")
+    return [model(id=plan.id("categories", i), name=f"Категория {plan.id('categories', i)}")]
+
+
+def _library(plan, rng, i):
+    model = apps.get_model("library", "Library")
+    return [model(id=plan.id("libraries", i), name=f"Библиотека {i}", location=f"Улица {rng.randint(1, 500)}")]
+
+
+def _member(plan, rng, i):
+    model = apps.get_model("library", "Member")
+    member_id = plan.id("members", i)
+    age = rng.randint(6, 90)
+    return [model(
+        id=member_id, first_name=f"Читатель{i}", last_name=f"Фамилия{i % 1000}",
+        email=f"member{member_id}@example.com", gender=rng.choice(["male", "female"]),
+        birth_date=EPOCH_DATE - timedelta(days=age * 365), age=age,
+        role=rng.choices(["reader", "staff", "admin"], weights=[95, 4, 1])[0],
+        active=rng.random() < 0.9,
+    )]
+
+
+def _member_libraries(plan, rng, i):
+    through = apps.get_model("library", "Member").libraries.through
+    k = plan.link_count(rng, "member_libraries")
+    member_id = plan.id("members", i)
+    return [through(member_id=member_id, library_id=library_id)
+            for library_id in plan.sample(rng, "libraries", k)]
+
+
+def _book(plan, rng, i):
+    model = apps.get_model("library", "Book")
+    price = Decimal(rng.randint(300, 6000)) / 100
+    return [model(
+        id=plan.id("books", i), name=f"Книга {i}",
+        author_id=plan.pick(rng, "authors"), publisher_id=plan.pick(rng, "publishers"),
+        category_id=plan.pick(rng, "categories"), library_id=plan.pick(rng, "libraries"),
+        published_date=EPOCH_DATE - timedelta(days=rng.randint(0, 20000)),
+        description=_text(rng), genre=rng.choice(GENRES), pages=rng.randint(40, 1500),
+        price=price,
+        discounted_price=(price * Decimal("0.8")).quantize(Decimal("0.01")) if rng.random() < 0.3 else None,
+        is_bestseller=rng.random() < 0.02,
+        created_at=EPOCH - timedelta(minutes=rng.randint(0, 5 * 365 * 24 * 60)),
+    )]
+
+
+def _review(plan, rng, i):
+    model = apps.get_model("library", "Review")
+    return [model(book_id=plan.pick(rng, "books"), reviewer_id=plan.pick(rng, "members"),
+                  rating=Decimal(rng.randint(10, 50)) / 10, text=_text(rng, 12))]
+
+
+def _borrow(plan, rng, i):
+    model = apps.get_model("library", "Borrow")
+    borrowed = EPOCH_DATE - timedelta(days=rng.randint(0, 3 * 365))
+    return [model(
+        member_id=plan.pick(rng, "members"), book_id=plan.pick(rng, "books"),
+        library_id=plan.pick(rng, "libraries"), borrow_date=borrowed,
+        return_date=borrowed + timedelta(days=rng.choice([14, 21, 30])), is_returned=rng.random() < 0.85,
+    )]
+
+
+def _event(plan, rng, i):
+    model = apps.get_model("library", "Event")
+    return [model(id=plan.id("events", i), title=f"Событие {i}", description=_text(rng),
+                  event_date=EPOCH + timedelta(hours=rng.randint(-24 * 365, 24 * 365)),
+                  library_id=plan.pick(rng, "libraries"))]
+
+
+def _event_books(plan, rng, i):
+    through = apps.get_model("library", "Event").books.through
+    event_id = plan.id("events", i)
+    k = plan.link_count(rng, "event_books")
+    return [through(event_id=event_id, book_id=book_id) for book_id in plan.sample(rng, "books", k)]
+
+
+def _event_participants(plan, rng, i):
+    model = apps.get_model("library", "EventParticipant")
+    event_id = plan.id("events", i)
+    k = plan.link_count(rng, "event_participants")
+    return [model(event_id=event_id, member_id=member_id) for member_id in plan.sample(rng, "members", k)]
+
+
+def _post(plan, rng, i):
+    model = apps.get_model("library", "Posts")
+    post_id = plan.id("posts", i)
+    return [model(id=post_id, title=f"Пост {post_id}", text=_text(rng, 30), author_id=plan.pick(rng, "members"),
+                  library_id=plan.pick(rng, "libraries"), is_moderated=rng.random() < 0.6,
+                  created_at=EPOCH_DATE - timedelta(days=rng.randint(0, 3 * 365)))]
+
+
+def _project(plan, rng, i):
+    model = apps.get_model("Meta_Admin", "Project")
+    project_id = plan.id("projects", i)
+    return [model(id=project_id, name=f"Проект {project_id}", description=_text(rng))]
+
+
+def _tag(plan, rng, i):
+    model = apps.get_model("Meta_Admin", "Tag")
+    tag_id = plan.id("tags", i)
+    return [model(id=tag_id, name=f"tag-{tag_id}")]
+
+
+def _task(plan, rng, i):
+    model = apps.get_model("Meta_Admin", "Task")
+    task_id = plan.id("tasks", i)
+    due_date = EPOCH + timedelta(hours=rng.randint(-24 * 180, 24 * 180)) if rng.random() < 0.8 else None
+    return [model(
+        id=task_id, title=f"Задача номер {task_id}", description=_text(rng),
+        status=rng.choice(TASK_STATUSES), priority=rng.choice(PRIORITIES),
+        project_id=plan.pick(rng, "projects"), due_date=due_date, due_weekday=model.weekday_of(due_date),
+        deleted_at=EPOCH if rng.random() < 0.02 else None,
+    )]
+
+
+def _task_tags(plan, rng, i):
+    through = apps.get_model("Meta_Admin", "Task").tags.through
+    task_id = plan.id("tasks", i)
+    k = plan.link_count(rng, "task_tags")
+    return [through(task_id=task_id, tag_id=tag_id) for tag_id in plan.sample(rng, "tags", k)]
+
+
+def _subtask(plan, rng, i):
+    model = apps.get_model("Meta_Admin", "SubTask")
+    return [model(title=f"Подзадача {i}", description=_text(rng, 5), task_id=plan.pick(rng, "tasks"),
+                  status=rng.choice(SUBTASK_STATUSES),
+                  deadline=EPOCH + timedelta(days=rng.randint(-90, 90)))]
+
+
+TABLES = [
+    Table("authors", "library.Author", 0, 1 / 20, _author, explicit_ids=True),
+    Table("publishers", "library.Publisher", 0, 1 / 200, _publisher, explicit_ids=True),
+    Table("categories", "library.Category", 0, 1 / 1000, _category, explicit_ids=True, minimum=10),
+    Table("libraries", "library.Library", 0, 1 / 2000, _library, explicit_ids=True, minimum=5),
+    Table("members", "library.Member", 0, 1 / 5, _member, explicit_ids=True),
+    Table("projects", "Meta_Admin.Project", 0, 1 / 100, _project, explicit_ids=True),
+    Table("tags", "Meta_Admin.Tag", 0, 1 / 5000, _tag, explicit_ids=True, minimum=20),
+    Table("books", "library.Book", 1, 1, _book, explicit_ids=True),
+    Table("events", "library.Event", 1, 1 / 100, _event, explicit_ids=True),
+    Table("tasks", "Meta_Admin.Task", 1, 1, _task, explicit_ids=True),
+    Table("member_libraries", "library.Member.libraries", 1, 1 / 5, _member_libraries,
+          links=(1, 3, "libraries")),
+    Table("posts", "library.Posts", 1, 1 / 10, _post, explicit_ids=True),
+    Table("reviews", "library.Review", 2, 2, _review),
+    Table("borrows", "library.Borrow", 2, 2, _borrow),
+    Table("event_books", "library.Event.books", 2, 1 / 100, _event_books, links=(1, 5, "books")),
+    Table("event_participants", "library.EventParticipant", 2, 1 / 100, _event_participants,
+          links=(1, 20, "members")),
+    Table("task_tags", "Meta_Admin.Task.tags", 2, 1, _task_tags, links=(0, 3, "tags")),
+    Table("subtasks", "Meta_Admin.SubTask", 2, 3, _subtask),
+]
+TABLES_BY_NAME = {table.name: table for table in TABLES}
+
+# строители со связями (Table.links) вызываются по разу на владельца: counts таких
+# таблиц — число владельцев, а не строк (ожидаемое число строк — Plan.rows())
+OWNER_TABLES = {"member_libraries": "members", "event_books": "events",
+                "event_participants": "events", "task_tags": "tasks"}
+
+
+def make_plan(books, using="default"):
+    """Сколько строк создать на books книг; id начинаются после текущего максимума."""
+    counts = {}
+    for table in TABLES:
+        owner = OWNER_TABLES.get(table.name)
+        counts[table.name] = counts[owner] if owner else max(table.minimum, math.ceil(books * table.per_book))
+    bases = {}
+    for table in TABLES:
+        if table.explicit_ids:
+            current = table.get_model().objects.using(using).aggregate(top=Max("pk"))["top"]
+            bases[table.name] = (current or 0) + 1
+    return Plan(counts, bases)
+
+
+def build_rows(table_name, start, stop, plan, seed):
+    """Экземпляры моделей для номеров [start, stop) таблицы — детерминированно по seed."""
+    table = TABLES_BY_NAME[table_name]
+    rng = random.Random(f"{seed}:{table_name}:{start}")
+    rows = []
+    for index in range(start, stop):
+        rows.extend(table.build(plan, rng, index))
+    return rows
+
+
+def insert_statements(model, objs, batch_size, using="default"):
+    """
+    Готовые (sql, params) многострочных INSERT — то же, что делает
+    bulk_create, но подготовка значений идёт вне транзакции: в SQLite
+    процессы параллельно считают, а блокировку записи держат только на
+    время самих INSERT.
+    """
+    connection = connections[using]
+    opts = model._meta
+    fields = [field for field in opts.concrete_fields if not field.generated]
+    if objs and objs[0].pk is None:
+        fields.remove(opts.pk)
+    batch_size = min(batch_size, connection.ops.bulk_batch_size(fields, objs) or batch_size)
+    statements = []
+    for start in range(0, len(objs), batch_size):
+        query = sql.InsertQuery(model)
+        query.insert_values(fields, objs[start:start + batch_size])
+        statements.extend(query.get_compiler(using=using).as_sql())
+    return statements
+
+
+def generate_chunk(table_name, start, stop, plan, seed, batch_size, using="default"):
+    """Строит и вставляет один кусок таблицы одной транзакцией."""
+    model = TABLES_BY_NAME[table_name].get_model()
+    rows = build_rows(table_name, start, stop, plan, seed)
+    statements = insert_statements(model, rows, batch_size, using)
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        # писатели SQLite идут по очереди: ждём своей, а не падаем с "database is locked"
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for statement, params in statements:
+            cursor.execute(statement, params)
+    return table_name, len(rows)
+
+
+def _chunks(plan, phase, chunk_size):
+    for table in TABLES:
+        if table.phase != phase:
+            continue
+        for start in range(0, plan.counts[table.name], chunk_size):
+            yield table.name, start, min(start + chunk_size, plan.counts[table.name])
+
+
+def can_use_processes(using="default"):
+    conn = connections[using]
+    return not (conn.vendor == "sqlite" and conn.is_in_memory_db())
+
+
+def generate(plan, seed=0, workers=1, chunk_size=50_000, batch_size=5_000, using="default", progress=None):
+    """
+    Заполняет все таблицы по плану. workers > 1 — куски каждой фазы
+    параллельно в отдельных процессах (не для SQLite в памяти).
+    progress(table, rows, seconds) вызывается после каждого куска.
+    Возвращает {таблица: создано строк}.
+    """
+    created = dict.fromkeys(plan.counts, 0)
+    parallel = workers > 1 and can_use_processes(using) and "fork" in multiprocessing.get_all_start_methods()
+    started = time.perf_counter()
+
+    def done(table_name, rows):
+        created[table_name] += rows
+        if progress:
+            progress(table_name, rows, time.perf_counter() - started)
+
+    for phase in sorted({table.phase for table in TABLES}):
+        chunks = list(_chunks(plan, phase, chunk_size))
+        if not parallel:
+            for table_name, start, stop in chunks:
+                done(*generate_chunk(table_name, start, stop, plan, seed, batch_size, using))
+            continue
+        # соединение родителя не должно достаться дочерним процессам: каждый откроет своё
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as pool:
+            futures = [
+                pool.submit(generate_chunk, table_name, start, stop, plan, seed, batch_size, using)
+                for table_name, start, stop in chunks
+            ]
+            for future in futures:
+                done(*future.result())
+
+    finalize(plan, using)
+    return created
+
+
+def finalize(plan, using="default"):
+    """Производные данные после массовой вставки (сигналы при bulk_create не срабатывают)."""
+    from library.models import Book, LibraryStats
+    from library.signals import BOOKS_TABLES
+    from Meta_Admin.search import get_search_backend
+    from Meta_Admin.signals import TASKS_TABLES
+
+    conn = connections[using]
+    with transaction.atomic(using=using):
+        # отзывы ссылаются только на новые книги
+        first_book = plan.bases["books"]
+        Book.objects.using(using).filter(
+            pk__gte=first_book, pk__lt=first_book + plan.counts["books"]
+        ).rebuild_ratings()
+        # книги, выдачи, события и посты добавлялись и в старые библиотеки
+        LibraryStats.objects.using(using).rebuild()
+        # поисковый индекс работает с соединением по умолчанию
+        if using == DEFAULT_DB_ALIAS:
+            get_search_backend().rebuild()
+
+        # явные id не двигают последовательности PostgreSQL/Oracle
+        models = [TABLES_BY_NAME[name].get_model() for name in plan.bases]
+        statements = conn.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with conn.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+    bump_version(BOOKS_TABLES, TASKS_TABLES)
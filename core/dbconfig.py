@@ -0,0 +1,48 @@
+"""
+Настройки подключения к БД из DATABASE_URL (используется в core/settings.py).
+
+Вынесено из settings в функцию, чтобы разбор URL и OPTIONS для каждого
+бэкенда можно было проверить тестом без перезагрузки настроек.
+"""
+from environ import Env
+
+
+def database_config(url, env):
+    """Словарь для DATABASES['default'] по URL; числовые параметры читаются из env."""
+    config = Env.db_url_config(url)
+
+    # Постоянные соединения: воркер переиспользует соединение между запросами
+    # (секунды; 0 — закрывать после каждого запроса, None — без ограничения),
+    # перед повторным использованием соединение проверяется.
+    config['CONN_MAX_AGE'] = env.int('DB_CONN_MAX_AGE', default=60)
+    config['CONN_HEALTH_CHECKS'] = True
+
+    if config['ENGINE'] == 'django.db.backends.sqlite3':
+        # WAL: читатели не блокируют писателя и наоборот; synchronous=NORMAL
+        # безопасен в режиме WAL и не делает fsync на каждый коммит.
+        # busy_timeout — ждать освобождения блокировки вместо "database is locked",
+        # IMMEDIATE — брать блокировку записи в начале транзакции, а не при первом
+        # INSERT/UPDATE (иначе конкурирующие транзакции падают без ожидания).
+        config['OPTIONS'] = {
+            'init_command': ';'.join([
+                'PRAGMA journal_mode=WAL',
+                'PRAGMA synchronous=NORMAL',
+                f"PRAGMA busy_timeout={env.int('SQLITE_BUSY_TIMEOUT_MS', default=5000)}",
+                f"PRAGMA mmap_size={env.int('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024)}",
+                f"PRAGMA cache_size=-{env.int('SQLITE_CACHE_SIZE_KB', default=64 * 1024)}",
+                'PRAGMA temp_store=MEMORY',
+            ]),
+            'transaction_mode': 'IMMEDIATE',
+            **config.get('OPTIONS', {}),
+        }
+    elif config['ENGINE'] == 'django.db.backends.mysql':
+        # mysqlclient. Встроенного пула для MySQL в Django нет, поэтому
+        # соединения переиспользуются через CONN_MAX_AGE (по одному на поток
+        # воркера); общий пул при необходимости — на стороне ProxySQL/MySQL Router.
+        config['OPTIONS'] = {
+            'charset': 'utf8mb4',
+            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+            'isolation_level': 'read committed',
+            **config.get('OPTIONS', {}),
+        }
+    return config
@@ -0,0 +1,153 @@
+"""
+Быстрый путь сериализации списков только для чтения.
+
+ModelSerializer на каждую строку создаёт объект модели и вызывает
+get_attribute/to_representation каждого поля. Для больших списков это
+основная нагрузка на CPU. FastListSerializer один раз разбирает поля
+обычного DRF-сериализатора и заранее выбирает для каждого конвертер:
+- строки, целые, bool и PK внешних ключей отдаются как есть;
+- даты, Decimal и choices — через to_representation того же поля DRF
+  (формат, округление и COERCE_TO_STRING совпадают);
+- StringRelatedField — настоящий __str__ связанных объектов, загруженных
+  через in_bulk по уникальным id страницы;
+- M2M-список PK — один запрос к through-таблице, PK по возрастанию
+  (так же, как в Prefetch списков).
+Строки берутся из .values(), поэтому JSON совпадает с обычным путём
+байт в байт. Поля других типов (вложенные сериализаторы,
+SerializerMethodField) не поддерживаются — для них остаётся обычный путь.
+"""
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.utils.functional import cached_property
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField, StringRelatedField
+
+FAST_QUERY_PARAM = "fast"
+M2M_BATCH_SIZE = 900
+
+# Поля, чей to_representation для значений из БД ничего не меняет
+_IDENTITY_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+
+def wants_fast_path(request):
+    """?fast=1 — клиент просит список через быстрый путь."""
+    return request.query_params.get(FAST_QUERY_PARAM) in ("1", "true")
+
+
+class FastListSerializer:
+    """Построение списка по .values() с конвертерами, взятыми из serializer_class."""
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def plan(self):
+        serializer = self.serializer_class()
+        model = serializer.Meta.model
+        pk_name = model._meta.pk.attname
+
+        columns = []
+        scalars, related, many = [], [], []
+        for field in serializer._readable_fields:
+            name, source = field.field_name, field.source
+            if isinstance(field, ManyRelatedField) and isinstance(field.child_relation, PrimaryKeyRelatedField):
+                many.append((name, model._meta.get_field(source)))
+                continue
+            if "." in source or source == "*" or not self._is_column(model, source):
+                raise ImproperlyConfigured(
+                    f"{self.serializer_class.__name__}.{name}: быстрый путь поддерживает только колонки модели."
+                )
+            columns.append(source)
+            if isinstance(field, StringRelatedField):
+                related.append((name, source, model._meta.get_field(source).related_model))
+            elif isinstance(field, PrimaryKeyRelatedField) or self._is_identity(field):
+                scalars.append((name, source, None))
+            elif isinstance(field, (serializers.Serializer, serializers.SerializerMethodField)):
+                raise ImproperlyConfigured(
+                    f"{self.serializer_class.__name__}.{name}: вложенные и вычисляемые поля не поддерживаются."
+                )
+            else:
+                scalars.append((name, source, field.to_representation))
+
+        if many and pk_name not in columns:
+            columns.append(pk_name)
+        return {
+            "columns": columns,
+            "pk": pk_name,
+            "scalars": scalars,
+            "related": related,
+            "many": many,
+            "order": [field.field_name for field in serializer._readable_fields],
+        }
+
+    @staticmethod
+    def _is_column(model, name):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        return field.concrete and not field.many_to_many
+
+    @staticmethod
+    def _is_identity(field):
+        return isinstance(field, _IDENTITY_FIELDS) and not isinstance(field, serializers.ChoiceField)
+
+    def values(self, queryset, *extra):
+        """queryset -> .values() только с нужными колонками (плюс extra, например ключ сортировки)."""
+        columns = list(dict.fromkeys(self.plan["columns"] + list(extra)))
+        return queryset.prefetch_related(None).values(*columns)
+
+    def serialize(self, rows):
+        """Список словарей в том же виде, что serializer_class(..., many=True).data."""
+        rows = list(rows)
+        plan = self.plan
+        converters = {name: (source, convert) for name, source, convert in plan["scalars"]}
+
+        for name, source, related_model in plan["related"]:
+            ids = {row[source] for row in rows} - {None}
+            labels = {pk: str(obj) for pk, obj in related_model.objects.in_bulk(ids).items()}
+            converters[name] = (source, labels.__getitem__)
+
+        many_values = {}
+        if plan["many"]:
+            pks = [row[plan["pk"]] for row in rows]
+            for name, m2m_field in plan["many"]:
+                many_values[name] = self._many_to_many(m2m_field, pks)
+
+        steps = []
+        for name in plan["order"]:
+            if name in converters:
+                source, convert = converters[name]
+                steps.append((name, source, convert, None))
+            else:
+                steps.append((name, plan["pk"], None, many_values[name]))
+
+        result = []
+        for row in rows:
+            item = {}
+            for name, source, convert, many in steps:
+                value = row[source]
+                if many is not None:
+                    item[name] = many.get(value, [])
+                elif value is None or convert is None:
+                    item[name] = value
+                else:
+                    item[name] = convert(value)
+            result.append(item)
+        return result
+
+    @staticmethod
+    def _many_to_many(m2m_field, pks):
+        through = m2m_field.remote_field.through
+        source = through._meta.get_field(m2m_field.m2m_field_name()).attname
+        target = through._meta.get_field(m2m_field.m2m_reverse_field_name()).attname
+        grouped = {}
+        # кусками, чтобы не упереться в лимит параметров SQL на больших выгрузках
+        for start in range(0, len(pks), M2M_BATCH_SIZE):
+            links = (
+                through.objects.filter(**{f"{source}__in": pks[start:start + M2M_BATCH_SIZE]})
+                .order_by(target)
+                .values_list(source, target)
+            )
+            for owner, related in links:
+                grouped.setdefault(owner, []).append(related)
+        return grouped
@@ -0,0 +1,256 @@
+"""
+Неблокирующее логирование.
+
+Поток запроса только кладёт запись в очередь (QueuedHandler), а в файл/консоль
+её пишет фоновый QueueListener, поэтому задержки диска не тормозят ответы.
+Обвязка строится поверх обычного settings.LOGGING: configure_logging
+(settings.LOGGING_CONFIG) применяет dictConfig, а затем заменяет обработчики
+каждого логгера одним QueuedHandler с исходными обработчиками в слушателе.
+
+Дополнительно:
+- JSONFormatter — одна JSON-строка на запись, включая поля из extra=...;
+- request_id текущего запроса (RequestIdMiddleware) добавляется к каждой записи;
+  присланный клиентом X-Request-ID принимается, только если это до 64
+  символов [A-Za-z0-9._-], иначе генерируется новый;
+- AccessLogMiddleware пишет на каждый запрос запись "project.access" с
+  методом, путём, статусом, duration_ms и request_id;
+- INFO-записи шумных логгеров можно сэмплировать (ключ "info_sampling"
+  в LOGGING: {"имя логгера": доля}); WARNING и выше пишутся всегда.
+  Логгер "project.access" в info_sampling не добавляют — это единственная
+  запись с задержкой каждого запроса;
+- файловые обработчики с ротацией по размеру/времени сами создают каталог
+  при первой записи — при импорте настроек на диск ничего не пишется.
+"""
+import contextvars
+import copy
+import json
+import logging
+import logging.config
+import logging.handlers
+import queue
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+# X-Request-ID клиента попадает в каждую запись лога — только короткие безопасные id
+_REQUEST_ID_RE = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+access_logger = logging.getLogger("project.access")
+
+# атрибуты, которые есть у любой LogRecord; всё остальное пришло через extra=...
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+class RequestIdMiddleware:
+    """Присваивает запросу id (или берёт из X-Request-ID) и возвращает его в ответе."""
+
+    header = "X-Request-ID"
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_id.reset(token)
+        response[self.header] = request.request_id
+        return response
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_id.reset(token)
+        response[self.header] = request.request_id
+        return response
+
+    def start(self, request):
+        request_id = request.headers.get(self.header)
+        if not request_id or not _REQUEST_ID_RE.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        return _request_id.set(request.request_id)
+
+
+class AccessLogMiddleware:
+    """
+    Запись "project.access" на каждый запрос: method, path, status,
+    duration_ms, request_id. Для потокового ответа время считается до конца
+    отдачи тела. Ставится сразу после RequestIdMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        return self.process(request, self.get_response(request), started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        return self.process(request, await self.get_response(request), started)
+
+    def process(self, request, response, started):
+        if response.streaming:
+            stream = self.alogged_stream if response.is_async else self.logged_stream
+            response.streaming_content = stream(response.streaming_content, request, response, started)
+        else:
+            self.log(request, response, started)
+        return response
+
+    def logged_stream(self, content, request, response, started):
+        try:
+            yield from content
+        finally:
+            self.log(request, response, started)
+
+    async def alogged_stream(self, content, request, response, started):
+        try:
+            async for chunk in content:
+                yield chunk
+        finally:
+            self.log(request, response, started)
+
+    @staticmethod
+    def log(request, response, started):
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        access_logger.info(
+            "%s %s %s %.2f ms", request.method, request.path, response.status_code, duration_ms,
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "duration_ms": duration_ms,
+                # тело потокового ответа отдаётся после выхода из RequestIdMiddleware
+                "request_id": getattr(request, "request_id", None),
+            },
+        )
+
+
+class JSONFormatter(logging.Formatter):
+    """Запись -> одна строка JSON."""
+
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _CreateDirMixin:
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+class RotatingFileHandler(_CreateDirMixin, logging.handlers.RotatingFileHandler):
+    """Ротация по размеру; каталог создаётся при первой записи."""
+
+
+class TimedRotatingFileHandler(_CreateDirMixin, logging.handlers.TimedRotatingFileHandler):
+    """Ротация по времени; каталог создаётся при первой записи."""
+
+
+class QueuedHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler с ограниченной очередью: при переполнении запись
+    отбрасывается (счётчик dropped), а не блокирует поток запроса.
+    """
+
+    def __init__(self, handlers, maxsize=10000, info_sampling=None):
+        super().__init__(queue.Queue(maxsize))
+        self.info_sampling = info_sampling or {}
+        self.dropped = 0
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def emit(self, record):
+        if record.levelno == logging.INFO:
+            rate = self.info_sampling.get(record.name)
+            if rate is not None and random.random() >= rate:
+                return
+        super().emit(record)
+
+    def prepare(self, record):
+        # как в QueueHandler.prepare, но трейсбек остаётся отдельным полем,
+        # а extra и request_id не теряются
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if getattr(record, "request_id", None) is None:
+            record.request_id = current_request_id()
+        return record
+
+    def close(self):
+        # logging.shutdown() закрывает обработчики при выходе: дописываем очередь
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(config):
+    """settings.LOGGING_CONFIG: dictConfig + перевод обработчиков логгеров на очередь."""
+    config = dict(config)
+    info_sampling = config.pop("info_sampling", {})
+    queue_size = config.pop("queue_size", 10000)
+    logging.config.dictConfig(config)
+
+    # одна очередь на каждый набор обработчиков (django и project пишут в одни файлы)
+    queued = {}
+    for name in config.get("loggers", {}):
+        logger = logging.getLogger(name)
+        handlers = tuple(logger.handlers)
+        if not handlers:
+            continue
+        if handlers not in queued:
+            queued[handlers] = QueuedHandler(handlers, maxsize=queue_size, info_sampling=info_sampling)
+        for handler in handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(queued[handlers])
@@ -0,0 +1,111 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Конкурентная нагрузка на SQLite: писатели (чтение + запись в одной "
+        "транзакции) и читатели в отдельных потоках. Сравнивает настройки по "
+        "умолчанию (журнал DELETE, отложенные транзакции) с настройками из "
+        "settings.DATABASES (WAL, busy_timeout, BEGIN IMMEDIATE). Работает "
+        "на временном файле, рабочая база не затрагивается."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--transactions", type=int, default=200, help="Транзакций на одного писателя.")
+
+    def handle(self, *args, **options):
+        default = connections.settings["default"]
+        if default["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("Бенчмарк рассчитан на SQLite (DATABASE_URL=sqlite:///...).")
+
+        variants = {
+            "sqlite defaults": {},
+            "settings.DATABASES": default.get("OPTIONS", {}),
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            for number, (label, db_options) in enumerate(variants.items()):
+                alias = f"benchmark_{number}"
+                path = Path(directory) / f"{alias}.sqlite3"
+                connections.settings[alias] = {**default, "NAME": str(path), "OPTIONS": dict(db_options)}
+                try:
+                    self.stdout.write(self.style.MIGRATE_HEADING(label))
+                    self.run(alias, options)
+                finally:
+                    connections[alias].close()
+                    del connections[alias]
+                    del connections.settings[alias]
+
+    def run(self, alias, options):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE bench (id INTEGER PRIMARY KEY, worker INTEGER, payload TEXT)"
+            )
+            cursor.execute("CREATE INDEX bench_worker ON bench (worker)")
+        connections[alias].close()
+
+        results = {"committed": 0, "locked": 0, "reads": 0}
+        lock = threading.Lock()
+        writers_done = threading.Event()
+
+        def writer(worker):
+            committed = locked = 0
+            try:
+                for _ in range(options["transactions"]):
+                    try:
+                        with transaction.atomic(using=alias):
+                            with connections[alias].cursor() as cursor:
+                                cursor.execute("SELECT COUNT(*) FROM bench WHERE worker = %s", [worker])
+                                cursor.execute(
+                                    "INSERT INTO bench (worker, payload) VALUES (%s, %s)", [worker, "x" * 200]
+                                )
+                        committed += 1
+                    except OperationalError:
+                        locked += 1
+            finally:
+                connections[alias].close()
+            with lock:
+                results["committed"] += committed
+                results["locked"] += locked
+
+        def reader():
+            reads = 0
+            try:
+                while not writers_done.is_set():
+                    try:
+                        with connections[alias].cursor() as cursor:
+                            cursor.execute("SELECT worker, COUNT(*) FROM bench GROUP BY worker")
+                            cursor.fetchall()
+                        reads += 1
+                    except OperationalError:
+                        pass
+            finally:
+                connections[alias].close()
+            with lock:
+                results["reads"] += reads
+
+        writers = [threading.Thread(target=writer, args=(i,)) for i in range(options["writers"])]
+        readers = [threading.Thread(target=reader) for _ in range(options["readers"])]
+
+        started = time.perf_counter()
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        writers_done.set()
+        for thread in readers:
+            thread.join()
+
+        self.stdout.write(
+            f"  записано: {results['committed']}, ошибок блокировки: {results['locked']}, "
+            f"{results['committed'] / elapsed:,.0f} транзакций/с, "
+            f"{results['reads'] / elapsed:,.0f} чтений/с, {elapsed:.2f} с"
+        )
@@ -0,0 +1,113 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.fastpath import FastListSerializer
+from library.models import Author, Book, Category, Library, Publisher
+from library.serializers import BookListSerializer
+from Meta_Admin.api_views import tasks_for_list
+from Meta_Admin.models import Project, SubTask, Tag, Task
+from Meta_Admin.serializers import SubTaskSerializer, TaskSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает скорость (строк в секунду) обычных DRF-сериализаторов "
+        "списков и быстрого пути через .values() (core/fastpath.py) и "
+        "проверяет, что JSON совпадает байт в байт. Данные создаются во "
+        "временной транзакции и откатываются после замера."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000, help="Сколько книг, задач и подзадач создать.")
+        parser.add_argument("--repeat", type=int, default=3, help="Сколько раз повторять каждый замер.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        with transaction.atomic():
+            self.seed(rows, options["batch_size"])
+
+            variants = [
+                ("books", BookListSerializer, BookListSerializer.setup_eager_loading(Book.objects.order_by("id"))),
+                ("tasks", TaskSerializer, tasks_for_list().order_by("-created_at")),
+                ("subtasks", SubTaskSerializer, SubTask.objects.order_by("-created_at")),
+            ]
+            renderer = JSONRenderer()
+            for name, serializer_class, queryset in variants:
+                fast = FastListSerializer(serializer_class)
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+
+                slow_json = renderer.render(serializer_class(queryset, many=True).data)
+                fast_json = renderer.render(fast.serialize(fast.values(queryset)))
+                if slow_json != fast_json:
+                    raise CommandError(f"{name}: JSON быстрого пути отличается от DRF.")
+
+                self.measure("DRF serializer", rows, options["repeat"],
+                             lambda: renderer.render(serializer_class(queryset.all(), many=True).data))
+                self.measure("fast path", rows, options["repeat"],
+                             lambda: renderer.render(fast.serialize(fast.values(queryset.all()))))
+
+            transaction.set_rollback(True)
+
+    def seed(self, rows, batch_size):
+        self.stdout.write(f"Создаём по {rows} книг, задач и подзадач...")
+        today = date.today()
+        authors = [Author.objects.create(first_name=f"Имя{i}", last_name=f"Фамилия{i}", birth_date=today)
+                   for i in range(50)]
+        publishers = [Publisher.objects.create(name=f"Издатель {i}", established_date=today) for i in range(20)]
+        categories = [Category.objects.create(name=f"Категория {i}") for i in range(20)]
+        libraries = [Library.objects.create(name=f"Библиотека {i}", location="Berlin") for i in range(10)]
+        Book.objects.bulk_create(
+            (
+                Book(
+                    name=f"benchmark book {i:07d}",
+                    author=authors[i % len(authors)],
+                    publisher=publishers[i % len(publishers)],
+                    category=categories[i % len(categories)],
+                    library=libraries[i % len(libraries)],
+                    price="19.90",
+                    discounted_price="15.50" if i % 3 else None,
+                )
+                for i in range(rows)
+            ),
+            batch_size=batch_size,
+        )
+
+        project = Project.objects.create(name="benchmark-serializers", description="benchmark")
+        tags = [Tag.objects.create(name=f"benchmark-{i}") for i in range(5)]
+        now = timezone.now()
+        tasks = Task.objects.bulk_create(
+            (
+                Task(
+                    title=f"benchmark task {i:07d}",
+                    priority="Low",
+                    project=project,
+                    due_date=now + timedelta(hours=i),
+                    due_weekday=Task.weekday_of(now + timedelta(hours=i)),
+                )
+                for i in range(rows)
+            ),
+            batch_size=batch_size,
+        )
+        Task.tags.through.objects.bulk_create(
+            (Task.tags.through(task_id=task.pk, tag_id=tags[task.pk % len(tags)].pk) for task in tasks),
+            batch_size=batch_size,
+        )
+        SubTask.objects.bulk_create(
+            (SubTask(title=f"benchmark subtask {i:07d}", task=tasks[i], deadline=now) for i in range(rows)),
+            batch_size=batch_size,
+        )
+
+    def measure(self, label, rows, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        self.stdout.write(f"  {label}: {best * 1000:.1f} ms, {rows / best:,.0f} строк/с")
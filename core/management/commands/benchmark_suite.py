@@ -0,0 +1,82 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from core import benchsuite
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк всех URL из core.urls и changelist'ов админки на синтетических "
+        "данных: число SQL-запросов, задержка p50/p95 и пик памяти. Сравнивает "
+        "с JSON-базисом и завершается ошибкой при регрессии. Работает на "
+        "временной тестовой базе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", default="1k", help="1k, 100k, 1m или число книг.")
+        parser.add_argument("--repeat", type=int, default=5, help="Замеров на каждый URL.")
+        parser.add_argument("--baseline", help="JSON-базис (по умолчанию benchmarks/<scale>.json).")
+        parser.add_argument("--save-baseline", action="store_true", help="Записать результаты как новый базис.")
+        parser.add_argument(
+            "--threshold", type=float, default=0.25, help="Допустимый рост задержки p50 и памяти (доля)."
+        )
+        parser.add_argument("--output", help="Куда дополнительно записать результаты (JSON).")
+
+    def handle(self, *args, **options):
+        try:
+            rows = benchsuite.parse_scale(options["scale"])
+        except ValueError:
+            raise CommandError(f"Некорректный --scale: {options['scale']}")
+        baseline_path = Path(options["baseline"] or settings.BASE_DIR / "benchmarks" / f"{options['scale']}.json")
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.stdout.write(f"Создаём данные на {rows} книг...")
+            benchsuite.seed(rows)
+            results = self.run(options["repeat"])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        if options["save_baseline"]:
+            benchsuite.save_baseline(baseline_path, rows, results)
+            self.stdout.write(self.style.SUCCESS(f"Базис записан: {baseline_path}"))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(f"Базиса {baseline_path} нет — сравнение пропущено (--save-baseline).")
+            return
+
+        baseline = benchsuite.load_baseline(baseline_path)
+        if baseline["rows"] != rows:
+            raise CommandError(f"Базис снят на {baseline['rows']} строках, а сейчас {rows}.")
+        regressions = benchsuite.compare(baseline["results"], results, threshold=options["threshold"])
+        if regressions:
+            raise CommandError("Регрессии производительности:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("Регрессий нет."))
+
+    def run(self, repeat):
+        client = Client()
+        client.force_login(User.objects.create_superuser("benchmark", "benchmark@example.com", "benchmark"))
+
+        urls, skipped = benchsuite.endpoint_urls(benchsuite.sample_kwargs())
+        for route in skipped:
+            self.stdout.write(self.style.WARNING(f"пропущен (нет значений параметров): {route}"))
+
+        results = {}
+        for url in urls + benchsuite.admin_urls():
+            result = results[url] = benchsuite.measure(client, url, repeat)
+            line = (
+                f"{url}: {result['status']}, запросов {result['queries']}, "
+                f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, память {result['peak_kb']} KB"
+            )
+            self.stdout.write(line if result["status"] < 400 else self.style.WARNING(line))
+        return results
@@ -0,0 +1,151 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from core.management.commands.benchmark_serializers import Command as SerializerBenchmark
+from library.models import Book
+from Meta_Admin.models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест: одни и те же данные через синхронный стек "
+        "(WSGIHandler, не больше --threads запросов одновременно, как у "
+        "воркера gunicorn) и через async-эндпоинты под ASGIHandler (все "
+        "клиенты в одном event loop). Печатает запросов в секунду и p50/p95 задержки по парам "
+        "эндпоинтов. Работает на временной тестовой базе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Сколько книг, задач и подзадач создать.")
+        parser.add_argument("--clients", type=int, default=50, help="Одновременных клиентов.")
+        parser.add_argument("--requests", type=int, default=20, help="Запросов на одного клиента.")
+        parser.add_argument("--threads", type=int, default=8, help="Потоков синхронного воркера.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            SerializerBenchmark(stdout=self.stdout).seed(options["rows"], batch_size=2000)
+            book_id = Book.objects.order_by("id").values_list("id", flat=True).first()
+            task_id = Task.objects.order_by("id").values_list("id", flat=True).first()
+            pairs = [
+                ("books list", "/books/", "/async/books/"),
+                ("book detail", f"/books/{book_id}/", f"/async/books/{book_id}/"),
+                ("tasks list", "/api/tasks/", "/api/async/tasks/"),
+                ("task detail", f"/api/tasks/{task_id}/", f"/api/async/tasks/{task_id}/"),
+                ("tasks stats", "/api/tasks/stats/", "/api/async/tasks/stats/"),
+                ("subtasks list", "/api/subtasks/", "/api/async/subtasks/"),
+            ]
+            wsgi, asgi = WSGIHandler(), ASGIHandler()
+            for label, sync_path, async_path in pairs:
+                self.stdout.write(self.style.MIGRATE_HEADING(label))
+                caches["default"].clear()
+                caches["responses"].clear()
+                self.report("WSGI", *self.run_wsgi(wsgi, sync_path, options))
+                caches["default"].clear()
+                caches["responses"].clear()
+                self.report("ASGI", *asyncio.run(self.run_asgi(asgi, async_path, options)))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def run_wsgi(self, handler, path, options):
+        # клиенты — отдельные потоки, но обрабатывать одновременно воркер
+        # может только --threads запросов; ожидание свободного потока входит в задержку
+        workers = threading.BoundedSemaphore(options["threads"])
+
+        def request():
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": path,
+                "QUERY_STRING": "",
+                "SCRIPT_NAME": "",
+                "SERVER_NAME": "testserver",
+                "SERVER_PORT": "80",
+                "SERVER_PROTOCOL": "HTTP/1.1",
+                "wsgi.url_scheme": "http",
+                "wsgi.input": BytesIO(),
+                "wsgi.errors": BytesIO(),
+            }
+            status = []
+            started = time.perf_counter()
+            with workers:
+                response = handler(environ, lambda code, headers: status.append(code))
+                try:
+                    b"".join(response)
+                finally:
+                    response.close()
+            return time.perf_counter() - started, status[0].startswith("200")
+
+        def client(_):
+            return [request() for _ in range(options["requests"])]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["clients"]) as pool:
+            per_client = list(pool.map(client, range(options["clients"])))
+        elapsed = time.perf_counter() - started
+        return [result for results in per_client for result in results], elapsed
+
+    async def run_asgi(self, handler, path, options):
+        async def request():
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "root_path": "",
+                "query_string": b"",
+                "headers": [(b"host", b"testserver")],
+                "client": ("127.0.0.1", 0),
+                "server": ("testserver", 80),
+            }
+            messages = [{"type": "http.request", "body": b"", "more_body": False}]
+            status = []
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                # клиент не отключается: ASGIHandler сам отменит ожидание после ответа
+                await asyncio.Future()
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+
+            started = time.perf_counter()
+            await handler(scope, receive, send)
+            return time.perf_counter() - started, status[0] == 200
+
+        async def client():
+            return [await request() for _ in range(options["requests"])]
+
+        started = time.perf_counter()
+        per_client = await asyncio.gather(*(client() for _ in range(options["clients"])))
+        elapsed = time.perf_counter() - started
+        return [result for results in per_client for result in results], elapsed
+
+    def report(self, label, results, elapsed):
+        timings = sorted(duration for duration, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        p50 = statistics.median(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        line = (
+            f"  {label}: {len(results) / elapsed:,.0f} запросов/с, "
+            f"p50 {p50 * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms"
+        )
+        if errors:
+            line += f", не 200: {errors}"
+        self.stdout.write(line)
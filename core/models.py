@@ -0,0 +1,22 @@
+from django.db import models
+from django.utils import timezone
+
+
+class TableVersion(models.Model):
+    """
+    Счётчик изменений группы таблиц.
+
+    Увеличивается сигналами при каждом сохранении/удалении отслеживаемых
+    моделей (см. core/versioning.py). Служит дешёвым ETag/Last-Modified
+    для списков: проверить «изменилось ли что-нибудь» — один запрос по PK.
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Версия таблиц"
+        verbose_name_plural = "Версии таблиц"
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
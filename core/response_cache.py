@@ -0,0 +1,88 @@
+"""
+Кэш сериализованных ответов для отдельных объектов.
+
+Ключ — модель, pk и версия объекта. Версия — тот же отпечаток строки, что
+и ETag (core/versioning.py): он меняется при любом сохранении самого
+объекта и связей, выводимых через __str__ (Author, Publisher, Category,
+Library у книги), а также при обновлениях через update(), которые
+сигналов не вызывают (например, рейтинг книги). Поэтому отдельная
+инвалидация не нужна: после изменения запрос просто попадает в новый
+ключ, а старые записи вытесняются по LRU (MAX_ENTRIES кэша "responses").
+
+Бэкенд задаётся в settings.CACHES["responses"]; в тестах можно подменить
+на файловый через override_settings.
+"""
+import threading
+
+from django.core.cache import caches
+
+RESPONSE_CACHE_ALIAS = "responses"
+RESPONSE_CACHE_TTL = 60 * 60  # секунд; актуальность обеспечивает версия в ключе
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def response_cache_key(model, pk, version):
+    return f"response:{model._meta.label_lower}:{pk}:{version}"
+
+
+def get_cached_payload(model, pk, version, build):
+    """
+    Данные ответа из кэша или build() (с сохранением в кэш).
+    build() возвращает None, если объекта нет, — такой результат не кэшируется.
+    Без версии (объект не найден при вычислении ETag) кэш не используется.
+    """
+    if version is None:
+        return build()
+
+    cache = caches[RESPONSE_CACHE_ALIAS]
+    key = response_cache_key(model, pk, version)
+    data = cache.get(key)
+    if data is not None:
+        _count("hits")
+        return data
+
+    _count("misses")
+    data = build()
+    if data is not None:
+        cache.set(key, data, RESPONSE_CACHE_TTL)
+    return data
+
+
+async def aget_cached_payload(model, pk, version, abuild):
+    """get_cached_payload для async-view: abuild — корутинная функция."""
+    if version is None:
+        return await abuild()
+
+    cache = caches[RESPONSE_CACHE_ALIAS]
+    key = response_cache_key(model, pk, version)
+    data = await cache.aget(key)
+    if data is not None:
+        _count("hits")
+        return data
+
+    _count("misses")
+    data = await abuild()
+    if data is not None:
+        await cache.aset(key, data, RESPONSE_CACHE_TTL)
+    return data
+
+
+def response_cache_stats():
+    """Счётчики попаданий/промахов этого процесса."""
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / total if total else 0.0
+    return stats
+
+
+def reset_response_cache_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
@@ -0,0 +1,310 @@
+"""
+Инструментирование SQL-запросов.
+
+SQLTraceMiddleware вешает на соединения БД execute_wrapper и для каждого
+запроса к сайту считает:
+- количество SQL-запросов и суммарное время в БД;
+- повторы одного и того же запроса (N+1) — по «отпечатку» SQL, в котором
+  параметры и списки IN (...) нормализованы;
+- самые медленные запросы.
+
+Итог пишется одной структурированной строкой в лог "project.sql",
+в DEBUG дублируется в заголовках ответа X-SQL-*, а счётчики процесса
+копятся в METRICS и отдаются view sql_metrics в текстовом формате
+Prometheus. На запрос к БД — два вызова perf_counter и обновление
+словаря, отпечаток SQL кэшируется, поэтому трассировку можно держать
+включённой в production.
+
+Модуль не обращается к настройкам Django при импорте: fingerprint и
+QueryStats используются и в sqlite_log_fact.TracedConnection.
+"""
+import heapq
+import logging
+import re
+import threading
+import time
+from contextlib import ExitStack
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+logger = logging.getLogger("project.sql")
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN \((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """Нормализованный SQL: литералы и списки IN (...) заменены на "?"."""
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+class QueryStats:
+    """Статистика SQL одного запроса к сайту (или одного соединения)."""
+
+    def __init__(self, top_n=5):
+        self.top_n = top_n
+        self.count = 0
+        self.duration = 0.0
+        self.by_fingerprint = {}  # отпечаток -> [выполнений, секунд]
+        self.slowest = []  # min-куча (duration, порядковый номер, sql)
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        key = fingerprint(sql)
+        entry = self.by_fingerprint.get(key)
+        if entry is None:
+            entry = self.by_fingerprint[key] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += duration
+        item = (duration, self.count, sql)
+        if len(self.slowest) < self.top_n:
+            heapq.heappush(self.slowest, item)
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, item)
+
+    @property
+    def duplicates(self):
+        """{отпечаток: сколько раз} для запросов, выполненных больше одного раза."""
+        return {key: count for key, (count, _) in self.by_fingerprint.items() if count > 1}
+
+    def slowest_queries(self):
+        return [(sql, duration) for duration, _, sql in sorted(self.slowest, reverse=True)]
+
+    def as_dict(self):
+        duplicates = self.duplicates
+        return {
+            "queries": self.count,
+            "sql_ms": round(self.duration * 1000, 2),
+            "duplicate_queries": sum(duplicates.values()) - len(duplicates),
+            "duplicates": sorted(duplicates.items(), key=lambda item: -item[1])[: self.top_n],
+            "slowest": [
+                {"sql": sql[:500], "ms": round(duration * 1000, 2)}
+                for sql, duration in self.slowest_queries()
+            ],
+        }
+
+
+class QueryTracer:
+    """execute_wrapper: замеряет каждый запрос и складывает в QueryStats."""
+
+    def __init__(self, stats, slow_threshold=None):
+        self.stats = stats
+        self.slow_threshold = slow_threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.stats.record(sql, duration)
+            if self.slow_threshold is not None and duration >= self.slow_threshold:
+                logger.warning(
+                    "slow sql %.1f ms: %s", duration * 1000, sql[:500],
+                    extra={"sql_ms": round(duration * 1000, 2), "sql": sql[:500]},
+                )
+
+
+class SQLMetrics:
+    """Агрегированные счётчики процесса для /metrics."""
+
+    # границы гистограммы «запросов на один запрос к сайту»
+    QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+    MAX_FINGERPRINTS = 200
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.queries = 0
+        self.duration = 0.0
+        self.requests_with_duplicates = 0
+        self.buckets = [0] * (len(self.QUERY_BUCKETS) + 1)
+        self.fingerprints = {}  # отпечаток -> [выполнений, секунд]
+
+    def observe(self, stats):
+        with self.lock:
+            self.requests += 1
+            self.queries += stats.count
+            self.duration += stats.duration
+            if stats.duplicates:
+                self.requests_with_duplicates += 1
+            for index, bound in enumerate(self.QUERY_BUCKETS):
+                if stats.count <= bound:
+                    self.buckets[index] += 1
+                    break
+            else:
+                self.buckets[-1] += 1
+
+            for key, (count, duration) in stats.by_fingerprint.items():
+                entry = self.fingerprints.get(key)
+                if entry is None:
+                    # ограничиваем память: новые отпечатки сверх лимита не учитываем
+                    if len(self.fingerprints) >= self.MAX_FINGERPRINTS:
+                        continue
+                    entry = self.fingerprints[key] = [0, 0.0]
+                entry[0] += count
+                entry[1] += duration
+
+    def render(self):
+        """Текстовый формат Prometheus."""
+        with self.lock:
+            lines = [
+                "# TYPE sql_requests_total counter",
+                f"sql_requests_total {self.requests}",
+                "# TYPE sql_queries_total counter",
+                f"sql_queries_total {self.queries}",
+                "# TYPE sql_duration_seconds_total counter",
+                f"sql_duration_seconds_total {self.duration:.6f}",
+                "# TYPE sql_requests_with_duplicates_total counter",
+                f"sql_requests_with_duplicates_total {self.requests_with_duplicates}",
+                "# TYPE sql_queries_per_request histogram",
+            ]
+            cumulative = 0
+            for bound, count in zip(self.QUERY_BUCKETS + ("+Inf",), self.buckets):
+                cumulative += count
+                lines.append(f'sql_queries_per_request_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"sql_queries_per_request_count {self.requests}")
+            lines.append(f"sql_queries_per_request_sum {self.queries}")
+
+            top = sorted(self.fingerprints.items(), key=lambda item: -item[1][0])[:20]
+            executions = ["# TYPE sql_fingerprint_executions_total counter"]
+            seconds = ["# TYPE sql_fingerprint_duration_seconds_total counter"]
+            for key, (count, duration) in top:
+                label = key[:200].replace("\\", "\\\\").replace('"', '\\"')
+                executions.append(f'sql_fingerprint_executions_total{{sql="{label}"}} {count}')
+                seconds.append(f'sql_fingerprint_duration_seconds_total{{sql="{label}"}} {duration:.6f}')
+            lines.extend(executions + seconds)
+        return "\n".join(lines) + "\n"
+
+
+METRICS = SQLMetrics()
+
+
+class SQLTraceMiddleware:
+    """
+    Трассировка SQL на каждый запрос. Настройки:
+    SQL_TRACE_ENABLED   — включить (по умолчанию True);
+    SQL_TRACE_HEADERS   — заголовки X-SQL-* в ответе (по умолчанию DEBUG);
+    SQL_TRACE_SLOW_MS   — порог предупреждения о медленном запросе, мс;
+    SQL_TRACE_TOP_N     — сколько самых медленных запросов запоминать.
+    Работает и в синхронном, и в асинхронном (ASGI) стеке middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        from django.conf import settings
+        from django.core.exceptions import MiddlewareNotUsed
+
+        if not getattr(settings, "SQL_TRACE_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.headers = getattr(settings, "SQL_TRACE_HEADERS", settings.DEBUG)
+        slow_ms = getattr(settings, "SQL_TRACE_SLOW_MS", None)
+        self.slow_threshold = slow_ms / 1000 if slow_ms is not None else None
+        self.top_n = getattr(settings, "SQL_TRACE_TOP_N", 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tracer = QueryTracer(QueryStats(self.top_n), self.slow_threshold)
+        started = time.perf_counter()
+        with self.tracing(tracer):
+            response = self.get_response(request)
+        return self.process(tracer, request, response, started)
+
+    async def __acall__(self, request):
+        # ORM из async-кода работает через sync_to_async в отдельном потоке
+        # со своими объектами соединений — обёртку ставим там же
+        tracer = QueryTracer(QueryStats(self.top_n), self.slow_threshold)
+        started = time.perf_counter()
+        stack = await sync_to_async(self.tracing)(tracer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.process(tracer, request, response, started)
+
+    def process(self, tracer, request, response, started):
+        if response.streaming:
+            # запросы потокового ответа выполняются уже после выхода из view
+            stream = self.atraced_stream if response.is_async else self.traced_stream
+            response.streaming_content = stream(
+                response.streaming_content, tracer, request, response, started
+            )
+        else:
+            self.finish(tracer.stats, request, response, started)
+        return response
+
+    @staticmethod
+    def tracing(tracer):
+        from django.db import connections
+
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(tracer))
+        return stack
+
+    def traced_stream(self, content, tracer, request, response, started):
+        try:
+            with self.tracing(tracer):
+                yield from content
+        finally:
+            self.finish(tracer.stats, request, response, started)
+
+    async def atraced_stream(self, content, tracer, request, response, started):
+        try:
+            stack = await sync_to_async(self.tracing)(tracer)
+            try:
+                async for chunk in content:
+                    yield chunk
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            self.finish(tracer.stats, request, response, started)
+
+    def finish(self, stats, request, response, started):
+        METRICS.observe(stats)
+        summary = stats.as_dict()
+
+        if self.headers and not response.streaming:
+            response["X-SQL-Queries"] = str(stats.count)
+            response["X-SQL-Time-ms"] = f"{stats.duration * 1000:.2f}"
+            response["X-SQL-Duplicates"] = str(summary["duplicate_queries"])
+
+        logger.info(
+            "%s %s %s queries=%d sql_ms=%.2f duplicates=%d",
+            request.method, request.path, response.status_code,
+            stats.count, summary["sql_ms"], summary["duplicate_queries"],
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                **summary,
+            },
+        )
+
+
+def sql_metrics(request):
+    """GET /metrics — счётчики SQL процесса (формат Prometheus). Только DEBUG или staff."""
+    from django.conf import settings
+    from django.http import HttpResponse, HttpResponseForbidden
+
+    if not (settings.DEBUG or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(METRICS.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
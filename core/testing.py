@@ -0,0 +1,99 @@
+"""
+Вспомогательные средства для тестов производительности.
+
+QueryPlanMixin собирает все SQL-запросы, которые выполняет view (API или
+админка), прогоняет каждый через EXPLAIN QUERY PLAN и падает, если запрос
+с условием WHERE читает таблицу полным сканированием или сортирует всю
+таблицу ради LIMIT. Проверка работает только на SQLite.
+"""
+import re
+from contextlib import contextmanager
+
+from django.contrib import admin
+from django.db import connection
+from django.urls import reverse
+
+
+# "SCAN library_book" — полный проход по таблице. "SCAN ... USING INDEX" /
+# "USING COVERING INDEX" — проход по индексу, это не считаем регрессией.
+FULL_SCAN_RE = re.compile(r"^SCAN (?P<table>[\w\"]+)(?: AS \w+)?$")
+FULL_SORT = "USE TEMP B-TREE FOR ORDER BY"
+
+
+class QueryRecorder:
+    """execute_wrapper, который запоминает SQL и параметры всех SELECT."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith("SELECT"):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(sql, params, allowed_tables=()):
+    """Список претензий к плану запроса (пустой — план в порядке)."""
+    plan = explain(sql, params)
+    upper_sql = sql.upper()
+    problems = []
+
+    if " WHERE " in upper_sql:
+        for line in plan:
+            match = FULL_SCAN_RE.match(line)
+            if match and match.group("table").strip('"') not in allowed_tables:
+                problems.append(line)
+
+    # Сортировка во временном B-дереве допустима для строк, уже отобранных
+    # через индекс (SEARCH), но не для прохода по всей таблице ради LIMIT.
+    # Обход виртуальной таблицы FTS по MATCH — это поиск по индексу, а не скан.
+    scans_everything = any(
+        line.startswith("SCAN ") and "VIRTUAL TABLE" not in line for line in plan
+    )
+    if " LIMIT " in upper_sql and FULL_SORT in plan and scans_everything:
+        problems.append(FULL_SORT)
+
+    return problems
+
+
+def admin_changelist_urls(app_label):
+    """URL'ы changelist'ов всех моделей приложения, зарегистрированных в админке."""
+    return [
+        reverse(f"admin:{model._meta.app_label}_{model._meta.model_name}_changelist")
+        for model in admin.site._registry
+        if model._meta.app_label == app_label
+    ]
+
+
+class QueryPlanMixin:
+    """Миксин для TestCase: assertIndexedQueries(url) проверяет планы всех запросов view."""
+
+    @contextmanager
+    def record_queries(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            yield recorder
+
+    def assertIndexedQueries(self, url, allowed_tables=()):
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN QUERY PLAN доступен только на SQLite")
+
+        with self.record_queries() as recorder:
+            response = self.client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400, f"{url} -> {response.status_code}")
+
+        failures = []
+        for sql, params in recorder.queries:
+            problems = plan_problems(sql, params, allowed_tables)
+            if problems:
+                failures.append(f"{url}\n  {sql}\n  -> {', '.join(problems)}")
+        if failures:
+            self.fail("Запросы без индекса:\n" + "\n".join(failures))
@@ -18,9 +18,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from core.sqltrace import sql_metrics
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', sql_metrics, name='sql-metrics'),
     path('', include('app.urls')),
     path('', include('library.urls')),
     path("", include("Meta_Admin.urls")),
@@ -0,0 +1,221 @@
+"""
+Версии данных для условных запросов (ETag / Last-Modified).
+
+Списки: у каждой группы таблиц есть счётчик изменений (TableVersion),
+его увеличивают сигналы post_save/post_delete/m2m_changed отслеживаемых
+моделей. ETag списка — хэш версий и полного пути запроса, поэтому для
+ответа 304 достаточно одного запроса по PK к маленькой таблице.
+
+Отдельные объекты: ETag — отпечаток колонок, которые попадают в ответ
+(включая поля связанных объектов, выводимые через __str__). Это тоже один
+запрос по PK, и отпечаток меняется только при изменении именно этого
+объекта — поэтому им же проверяется If-Match при PUT/PATCH.
+
+Массовые update()/bulk_update() сигналы не вызывают — там, где они
+используются, версию нужно поднимать вручную через bump_version().
+"""
+import datetime
+import hashlib
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+from .models import TableVersion
+
+
+def bump_version(*names):
+    """Увеличить счётчики изменений указанных групп таблиц."""
+    now = timezone.now()
+    for name in names:
+        changes = {"version": F("version") + 1, "updated_at": now}
+        if TableVersion.objects.filter(name=name).update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                TableVersion.objects.create(name=name, version=1, updated_at=now)
+        except IntegrityError:
+            # строку успел создать параллельный запрос
+            TableVersion.objects.filter(name=name).update(**changes)
+
+
+def _versions_query(names):
+    return TableVersion.objects.filter(name__in=names).values_list("name", "version", "updated_at")
+
+
+def get_versions(*names):
+    """{имя группы: (версия, время изменения)} одним запросом."""
+    versions = {name: (0, None) for name in names}
+    for name, version, updated_at in _versions_query(names):
+        versions[name] = (version, updated_at)
+    return versions
+
+
+async def aget_versions(*names):
+    """Асинхронный вариант get_versions."""
+    versions = {name: (0, None) for name in names}
+    async for name, version, updated_at in _versions_query(names):
+        versions[name] = (version, updated_at)
+    return versions
+
+
+def track_versions(name, *senders):
+    """Поднимать версию группы name при любом изменении моделей senders (и M2M through)."""
+
+    def bump(sender, raw=False, action="post", **kwargs):
+        if raw or not action.startswith("post"):
+            return
+        bump_version(name)
+
+    for sender in senders:
+        dispatch_uid = f"table_version:{name}:{sender._meta.label_lower}"
+        for signal in (post_save, post_delete, m2m_changed):
+            signal.connect(bump, sender=sender, weak=False, dispatch_uid=dispatch_uid)
+
+
+def _fingerprint(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def versions_condition(*names):
+    """
+    Декоратор условных запросов для списков: ETag — версии групп + путь
+    с query-параметрами, Last-Modified — время последнего изменения.
+    Ставится самым внешним (над @api_view), чтобы 304 уходил до DRF.
+    """
+
+    def versions(request):
+        memo = request.__dict__.setdefault("_table_versions", {})
+        if names not in memo:
+            memo[names] = get_versions(*names)
+        return memo[names]
+
+    def etag(request, *args, **kwargs):
+        return _versions_etag(versions(request), request)
+
+    def last_modified(request, *args, **kwargs):
+        return _versions_last_modified(versions(request))
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def _versions_etag(versions, request):
+    return _fingerprint(sorted((name, version) for name, (version, _) in versions.items()),
+                        request.get_full_path())
+
+
+def _versions_last_modified(versions):
+    return max((updated_at for _, updated_at in versions.values() if updated_at), default=None)
+
+
+def row_condition(queryset, fields, modified_field=None):
+    """
+    Декоратор условных запросов для одного объекта (pk из URL):
+    ETag — отпечаток значений fields, Last-Modified — поле modified_field.
+    Для несуществующего объекта ETag нет: GET дойдёт до view и получит 404,
+    а запрос с If-Match — 412.
+    """
+    fields = list(fields)
+    if modified_field and modified_field not in fields:
+        fields.append(modified_field)
+
+    def row(request, pk):
+        memo = _unwrap(request).__dict__.setdefault("_row_values", {})
+        if pk not in memo:
+            memo[pk] = queryset.filter(pk=pk).values_list(*fields).first()
+        return memo[pk]
+
+    def etag(request, *args, pk, **kwargs):
+        values = row(request, pk)
+        fingerprint = None if values is None else _fingerprint(pk, values)
+        _unwrap(request).__dict__.setdefault("_row_versions", {})[pk] = fingerprint
+        return fingerprint
+
+    def last_modified(request, *args, pk, **kwargs):
+        values = row(request, pk)
+        return None if values is None else values[fields.index(modified_field)]
+
+    return condition(etag_func=etag, last_modified_func=last_modified if modified_field else None)
+
+
+def async_condition(compute):
+    """
+    Аналог django.views.decorators.http.condition для async-view, где ETag
+    и Last-Modified считаются асинхронным ORM: compute(request, **kwargs)
+    возвращает пару (etag, last_modified).
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag, last_modified = await compute(request, **kwargs)
+            if last_modified is not None:
+                if not timezone.is_aware(last_modified):
+                    last_modified = timezone.make_aware(last_modified, datetime.timezone.utc)
+                last_modified = int(last_modified.timestamp())
+            etag = quote_etag(etag) if etag is not None else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+
+            if request.method in ("GET", "HEAD"):
+                if last_modified and not response.has_header("Last-Modified"):
+                    response.headers["Last-Modified"] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault("ETag", etag)
+            return response
+
+        return inner
+
+    return decorator
+
+
+def aversions_condition(*names):
+    """versions_condition для async-view."""
+
+    async def compute(request, **kwargs):
+        versions = await aget_versions(*names)
+        return _versions_etag(versions, request), _versions_last_modified(versions)
+
+    return async_condition(compute)
+
+
+def arow_condition(queryset, fields, modified_field=None):
+    """row_condition для async-view (pk из URL)."""
+    fields = list(fields)
+    if modified_field and modified_field not in fields:
+        fields.append(modified_field)
+
+    async def compute(request, pk, **kwargs):
+        values = await queryset.filter(pk=pk).values_list(*fields).afirst()
+        fingerprint = None if values is None else _fingerprint(pk, values)
+        request.__dict__.setdefault("_row_versions", {})[pk] = fingerprint
+        if values is None or not modified_field:
+            return fingerprint, None
+        return fingerprint, values[fields.index(modified_field)]
+
+    return async_condition(compute)
+
+
+def row_version(request, pk):
+    """
+    Отпечаток объекта pk, посчитанный row_condition для этого запроса
+    (None — объекта нет). Используется как версия в кэше ответов.
+    """
+    return _unwrap(request).__dict__.get("_row_versions", {}).get(pk)
+
+
+def _unwrap(request):
+    # во view приходит DRF Request, в декоратор condition — HttpRequest
+    return getattr(request, "_request", request)
+
+
+def concrete_fields(model):
+    """Имена колонок модели (attname, т.е. author_id вместо author)."""
+    return [field.attname for field in model._meta.concrete_fields]
@@ -8,6 +8,7 @@ from .models import (
     Category,
     Posts,
     Borrow,
+    BorrowQuerySet,
     Review,
     AuthorDetail,
     Event,
@@ -27,7 +28,9 @@ class MemberAdmin(admin.ModelAdmin):
 
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'publisher', 'library', 'published_date', 'genre')
+    list_display = ('name', 'author', 'publisher', 'library', 'published_date', 'genre', 'rating_avg')
+    # внешние ключи nullable: автоматический select_related() админки их не подтягивает
+    list_select_related = ('author', 'publisher', 'library')
     list_filter = ('genre', 'library', 'author', 'publisher')
     search_fields = ('name', 'author__first_name', 'author__last_name')
 
@@ -68,6 +71,25 @@ class PostsAdmin(admin.ModelAdmin):
     ordering = ('-created_at',)
 
 
+class OverdueListFilter(admin.SimpleListFilter):
+    """Фильтр по просрочке — условие считается в SQL (Borrow.objects.overdue())."""
+    title = "Просрочено"
+    parameter_name = "overdue"
+
+    def lookups(self, request, model_admin):
+        return (
+            ("yes", "Да"),
+            ("no", "Нет"),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == "yes":
+            return queryset.overdue()
+        if self.value() == "no":
+            return queryset.exclude(BorrowQuerySet.overdue_condition())
+        return queryset
+
+
 @admin.register(Borrow)
 class BorrowAdmin(admin.ModelAdmin):
     list_display = (
@@ -80,6 +102,7 @@ class BorrowAdmin(admin.ModelAdmin):
         'overdue_status',
     )
     list_filter = (
+        OverdueListFilter,
         'library',
         'is_returned',
         'borrow_date',
@@ -92,12 +115,14 @@ class BorrowAdmin(admin.ModelAdmin):
     )
     ordering = ('-borrow_date',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate_overdue()
+
+    @admin.display(description="Просрочено?", ordering="overdue")
     def overdue_status(self, obj):
-        """Показывает: просрочена книга или нет."""
+        """Показывает: просрочена книга или нет (значение уже посчитано в SQL)."""
         return "Да" if obj.is_overdue() else "Нет"
 
-    overdue_status.short_description = "Просрочено?"
-
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
@@ -1,27 +1,106 @@
 # library/api_views.py
 
-from rest_framework.decorators import api_view
+from itertools import islice
+
+from django.db import connection
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.fastpath import FastListSerializer, wants_fast_path
+from core.response_cache import get_cached_payload
+from core.versioning import concrete_fields, row_condition, row_version, versions_condition
 
-from .models import Book
+from .exporter import DATASETS, EXTENSIONS, FORMATS, export, parse_day, select_columns
+from .importer import CONTENT_TYPES, BookImporter, read_records
+from .models import Book, Borrow, LibraryStats
 from .serializers import (
     BookListSerializer,
     BookDetailSerializer,
     BookCreateUpdateSerializer,
 )
+from .signals import BOOKS_TABLES
+
+
+class BookCursorPagination(CursorPagination):
+    """
+    Keyset-пагинация для каталога книг.
+    Курсор непрозрачный (base64), страница выбирается условием id < X,
+    поэтому OFFSET-сканирования нет при любой глубине листания.
+    created_at у книг может быть NULL, поэтому ключ — только id.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = "-id"
+
+
+STREAM_CHUNK_SIZE = 2000
+
+# Быстрый путь (?fast=1): тот же JSON, что у BookListSerializer, но из .values()
+fast_book_list = FastListSerializer(BookListSerializer)
+
+
+def stream_books_ndjson(queryset, chunk_size=STREAM_CHUNK_SIZE, fast=False):
+    """
+    Генератор NDJSON: по одной книге на строку.
+    Книги читаются через iterator(chunk_size=...), сериализуются пачками,
+    так что в памяти одновременно находится не больше chunk_size объектов.
+    """
+    encoder = JSONEncoder(ensure_ascii=False)
+    queryset = queryset.order_by("id")
+    if fast:
+        queryset = fast_book_list.values(queryset)
+    books = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(books, chunk_size))
+        if not chunk:
+            break
+        if fast:
+            data = fast_book_list.serialize(chunk)
+        else:
+            data = BookListSerializer(chunk, many=True).data
+        lines = [encoder.encode(item) for item in data]
+        yield "\n".join(lines) + "\n"
 
 
+@versions_condition(BOOKS_TABLES)
 @api_view(['GET', 'POST'])
 def book_list_create(request):
     """
-    GET  /api/books/  -> список всех книг (краткий сериализатор)
-    POST /api/books/  -> создание новой книги
+    GET  /api/books/           -> список книг с cursor-пагинацией (краткий сериализатор)
+    GET  /api/books/?stream=1  -> весь каталог потоком в формате NDJSON
+    POST /api/books/           -> создание новой книги
+
+    ?fast=1 (для GET) — сериализация через .values() без создания моделей,
+    JSON тот же.
+
+    GET поддерживает If-None-Match / If-Modified-Since: если книги не
+    менялись, отдаётся 304 без запроса к самим книгам.
     """
     if request.method == 'GET':
-        books = Book.objects.all()
-        serializer = BookListSerializer(books, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        books = BookListSerializer.setup_eager_loading(Book.objects.all())
+        fast = wants_fast_path(request)
+
+        if request.query_params.get("stream") in ("1", "true"):
+            return StreamingHttpResponse(
+                stream_books_ndjson(books, fast=fast),
+                content_type="application/x-ndjson",
+            )
+
+        paginator = BookCursorPagination()
+        if fast:
+            page = paginator.paginate_queryset(fast_book_list.values(books), request)
+            return paginator.get_paginated_response(fast_book_list.serialize(page))
+
+        page = paginator.paginate_queryset(books, request)
+        serializer = BookListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     elif request.method == 'POST':
         serializer = BookCreateUpdateSerializer(data=request.data)
@@ -35,26 +114,52 @@ def book_list_create(request):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# Всё, что попадает в BookDetailSerializer: колонки книги и __str__ связей
+BOOK_DETAIL_ETAG_FIELDS = concrete_fields(Book) + [
+    'author__first_name',
+    'author__last_name',
+    'publisher__name',
+    'category__name',
+    'library__name',
+]
+
+
+@row_condition(Book.objects.all(), BOOK_DETAIL_ETAG_FIELDS)
 @api_view(['GET', 'PUT', 'DELETE'])
 def book_detail_update_delete(request, pk):
     """
     GET    /api/books/<pk>/  -> одна книга (полная инфа)
     PUT    /api/books/<pk>/  -> полное обновление
     DELETE /api/books/<pk>/  -> удаление
+
+    ETag — отпечаток строки книги: GET с If-None-Match отвечает 304,
+    PUT/DELETE с устаревшим If-Match — 412 (защита от потерянных обновлений).
     """
+    books = BookDetailSerializer.setup_eager_loading(Book.objects.all())
+
+    if request.method == 'GET':
+        # сериализованная карточка кэшируется по версии (= ETag) книги
+        def serialize():
+            book = books.filter(pk=pk).first()
+            return None if book is None else BookDetailSerializer(book).data
+
+        data = get_cached_payload(Book, pk, row_version(request, pk), serialize)
+        if data is None:
+            return Response(
+                {'error': 'Book not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(data, status=status.HTTP_200_OK)
+
     try:
-        book = Book.objects.get(pk=pk)
+        book = books.get(pk=pk)
     except Book.DoesNotExist:
         return Response(
             {'error': 'Book not found'},
             status=status.HTTP_404_NOT_FOUND
         )
 
-    if request.method == 'GET':
-        serializer = BookDetailSerializer(book)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-
-    elif request.method == 'PUT':
+    if request.method == 'PUT':
         serializer = BookCreateUpdateSerializer(book, data=request.data)
         if serializer.is_valid():
             book = serializer.save()
@@ -73,4 +178,186 @@ def book_detail_update_delete(request, pk):
         return Response(
             {'message': 'Book deleted successfully'},
             status=status.HTTP_204_NO_CONTENT
-        )
\ No newline at end of file
+        )
+
+
+@api_view(['GET'])
+def overdue_report(request):
+    """
+    GET /borrows/overdue-report/ -> количество просроченных выдач
+    по библиотекам и по читателям.
+
+    Всё считается одним GROUP BY (library, member); итоги по библиотекам
+    и по читателям складываются из этих групп в Python.
+    """
+    groups = (
+        Borrow.objects.overdue()
+        .order_by()
+        .values(
+            'library_id',
+            'library__name',
+            'member_id',
+            'member__first_name',
+            'member__last_name',
+        )
+        .annotate(overdue=Count('id'))
+    )
+
+    by_library = {}
+    by_member = {}
+    total = 0
+    for row in groups:
+        total += row['overdue']
+
+        library = by_library.setdefault(
+            row['library_id'],
+            {'library': row['library_id'], 'name': row['library__name'], 'overdue': 0},
+        )
+        library['overdue'] += row['overdue']
+
+        member = by_member.setdefault(
+            row['member_id'],
+            {
+                'member': row['member_id'],
+                'name': f"{row['member__first_name']} {row['member__last_name']}",
+                'overdue': 0,
+            },
+        )
+        member['overdue'] += row['overdue']
+
+    def by_count(item):
+        return -item['overdue'], item['name']
+
+    return Response(
+        {
+            'total_overdue': total,
+            'by_library': sorted(by_library.values(), key=by_count),
+            'by_member': sorted(by_member.values(), key=by_count),
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def book_import(request):
+    """
+    POST /books/import/ -> потоковый импорт книг (только для staff).
+
+    Тело — CSV (Content-Type: text/csv) или NDJSON (application/x-ndjson),
+    колонки — см. library/importer.py. Тело читается построчно прямо из
+    потока запроса, без request.data, поэтому размер файла ограничен
+    только веб-сервером. Ответ — отчёт: сколько книг создано и обновлено
+    и ошибки по номерам строк.
+    """
+    fmt = CONTENT_TYPES.get(request.content_type.split(';')[0].strip().lower())
+    if fmt is None:
+        return Response(
+            {'error': f"Поддерживаются только {', '.join(CONTENT_TYPES)}"},
+            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        )
+
+    stream = request.stream
+    report = BookImporter().run(read_records(stream if stream is not None else [], fmt))
+    return Response(report, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def data_export(request, dataset):
+    """
+    GET /exports/<borrows|reviews>/ -> потоковая выгрузка для аналитики (только для staff).
+
+    ?output=csv|columnar    формат (по умолчанию csv; см. library/exporter.py)
+    ?columns=id,book_name   выбор колонок
+    ?date_from=&date_to=    YYYY-MM-DD, включительно (дата выдачи / дата отзыва)
+
+    Ответ — StreamingHttpResponse: строки читаются из базы чанками и сразу
+    отдаются клиенту.
+    """
+    if dataset not in DATASETS:
+        return Response({'error': 'Unknown dataset'}, status=status.HTTP_404_NOT_FOUND)
+
+    fmt = request.query_params.get('output', 'csv')
+    if fmt not in FORMATS:
+        return Response(
+            {'output': [f"Допустимые значения: {', '.join(FORMATS)}"]},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    dates, errors = {}, {}
+    for name in ('date_from', 'date_to'):
+        value = request.query_params.get(name)
+        if value:
+            try:
+                dates[name] = parse_day(value)
+            except ValueError as exc:
+                errors[name] = [str(exc)]
+    try:
+        columns = select_columns(DATASETS[dataset], request.query_params.get('columns'))
+    except ValueError as exc:
+        errors['columns'] = [str(exc)]
+    if errors:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    chunks = export(dataset, fmt, ','.join(columns), **dates)
+
+    response = StreamingHttpResponse(chunks, content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{EXTENSIONS[fmt]}"'
+    return response
+
+
+LIBRARY_STATS_FIELDS = (
+    'books_count',
+    'members_count',
+    'open_borrows_count',
+    'upcoming_events_count',
+    'next_event_at',
+    'moderated_posts_count',
+    'updated_at',
+)
+
+
+# столбцы событий читаются с поправкой на текущее время (with_current_events)
+CURRENT_EVENT_FIELDS = {
+    'upcoming_events_count': 'current_upcoming_events_count',
+    'next_event_at': 'current_next_event_at',
+}
+
+
+@api_view(['GET'])
+def library_stats(request):
+    """
+    GET /libraries/stats/             -> статистика всех библиотек для дашбордов
+    GET /libraries/stats/?library=<id> -> одной библиотеки
+
+    Читается готовая таблица LibraryStats (поддерживается сигналами) —
+    один запрос по первичному ключу с JOIN на название библиотеки, без
+    агрегатов по книгам, выдачам и читателям. Если у какой-то библиотеки
+    ближайшее событие уже прошло, её события досчитываются подзапросами
+    в том же SELECT; запрос только читает, сохраняет пересчёт
+    manage.py rebuild_library_stats --events.
+    """
+    rows = LibraryStats.objects.order_by('pk')
+    library_id = request.query_params.get('library')
+    if library_id is not None:
+        low, high = connection.ops.integer_field_range(LibraryStats._meta.pk.target_field.get_internal_type())
+        try:
+            library_id = int(library_id)
+            if not low <= library_id <= high:
+                raise ValueError(library_id)
+        except ValueError:
+            return Response({'library': ['Ожидается id библиотеки.']}, status=status.HTTP_400_BAD_REQUEST)
+        rows = rows.filter(pk=library_id)
+
+    columns = [CURRENT_EVENT_FIELDS.get(name, name) for name in LIBRARY_STATS_FIELDS]
+    rows = rows.with_current_events().values('library_id', 'library__name', *columns)
+
+    return Response(
+        [
+            {'library': row['library_id'], 'name': row['library__name'],
+             **{name: row[CURRENT_EVENT_FIELDS.get(name, name)] for name in LIBRARY_STATS_FIELDS}}
+            for row in rows
+        ],
+        status=status.HTTP_200_OK,
+    )
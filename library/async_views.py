@@ -0,0 +1,44 @@
+# library/async_views.py
+"""
+Async-версии читающих эндпоинтов каталога (для запуска под core.asgi).
+JSON и ETag те же, что у library/api_views.py; список листается
+по ключу ?after_id= вместо курсора DRF.
+"""
+from django.views.decorators.http import require_GET
+
+from core.async_api import keyset_page, render_json
+from core.response_cache import aget_cached_payload
+from core.versioning import arow_condition, aversions_condition, row_version
+
+from .api_views import BOOK_DETAIL_ETAG_FIELDS
+from .models import Book
+from .serializers import BookDetailSerializer, BookListSerializer
+from .signals import BOOKS_TABLES
+
+
+@require_GET
+@aversions_condition(BOOKS_TABLES)
+async def book_list(request):
+    """
+    GET /async/books/?after_id=&page_size= -> список книг (краткий сериализатор)
+    """
+    books = BookListSerializer.setup_eager_loading(Book.objects.all())
+    return await keyset_page(
+        request, books, lambda page: BookListSerializer(page, many=True).data, max_page_size=500,
+    )
+
+
+@require_GET
+@arow_condition(Book.objects.all(), BOOK_DETAIL_ETAG_FIELDS)
+async def book_detail(request, pk):
+    """
+    GET /async/books/<pk>/ -> одна книга (полная инфа), кэш по версии книги
+    """
+    async def serialize():
+        book = await BookDetailSerializer.setup_eager_loading(Book.objects.all()).filter(pk=pk).afirst()
+        return None if book is None else BookDetailSerializer(book).data
+
+    data = await aget_cached_payload(Book, pk, row_version(request, pk), serialize)
+    if data is None:
+        return render_json({'error': 'Book not found'}, status=404)
+    return render_json(data)
@@ -0,0 +1,183 @@
+"""
+Потоковая выгрузка выдач и отзывов для аналитики.
+
+Колонки читателя, книги и библиотеки подтягиваются JOIN'ом в том же
+запросе (values_list по lookup'ам), строки идут через
+iterator(chunk_size=...) и кодируются по chunk_size штук — в памяти
+никогда нет всей выборки.
+
+Форматы:
+- csv — заголовок и строки, пустая ячейка = NULL;
+- columnar — NDJSON по колонкам: первая строка — схема
+  {"dataset", "columns"}, дальше на каждый чанк одна строка
+  {"rows": n, "data": [[значения колонки 1], [значения колонки 2], ...]}.
+  Компактнее построчного JSON (имена колонок не повторяются) и
+  читается pandas/pyarrow по чанкам без отдельной зависимости на сервере.
+"""
+import csv
+import datetime
+from dataclasses import dataclass
+from itertools import islice
+
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Borrow, Review
+
+FORMATS = {"csv": "text/csv", "columnar": "application/x-ndjson"}
+EXTENSIONS = {"csv": "csv", "columnar": "ndjson"}
+
+CHUNK_SIZE = 2000
+
+
+def _start_of_day(day):
+    """Начало дня в текущем часовом поясе (aware datetime)."""
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+@dataclass(frozen=True)
+class Dataset:
+    model: type
+    date_field: str  # по нему фильтруются date_from / date_to
+    columns: dict  # имя колонки в выгрузке -> lookup ORM
+
+    def date_filters(self, date_from=None, date_to=None):
+        """
+        Условия на диапазон дат, включительно. Для DateTimeField — границы
+        [начало date_from, начало дня после date_to): сравнение самого
+        столбца идёт по индексу, а __date обернул бы его в DATE() и
+        превратил выборку в полный скан.
+        """
+        filters = {}
+        is_datetime = isinstance(self.model._meta.get_field(self.date_field), models.DateTimeField)
+        if date_from is not None:
+            filters[f"{self.date_field}__gte"] = _start_of_day(date_from) if is_datetime else date_from
+        if date_to is not None:
+            if is_datetime and date_to == datetime.date.max:
+                pass  # начала следующего дня нет (date.max + 1 день — OverflowError), верхней границы тоже
+            elif is_datetime:
+                filters[f"{self.date_field}__lt"] = _start_of_day(date_to + datetime.timedelta(days=1))
+            else:
+                filters[f"{self.date_field}__lte"] = date_to
+        return filters
+
+    def queryset(self, columns, date_from=None, date_to=None):
+        queryset = self.model.objects.filter(**self.date_filters(date_from, date_to)).order_by("pk")
+        return queryset.values_list(*(self.columns[name] for name in columns))
+
+
+DATASETS = {
+    "borrows": Dataset(
+        Borrow,
+        "borrow_date",
+        {
+            "id": "id",
+            "borrow_date": "borrow_date",
+            "return_date": "return_date",
+            "is_returned": "is_returned",
+            "member_id": "member_id",
+            "member_first_name": "member__first_name",
+            "member_last_name": "member__last_name",
+            "book_id": "book_id",
+            "book_name": "book__name",
+            "library_id": "library_id",
+            "library_name": "library__name",
+        },
+    ),
+    "reviews": Dataset(
+        Review,
+        "created_at",
+        {
+            "id": "id",
+            "created_at": "created_at",
+            "rating": "rating",
+            "text": "text",
+            "reviewer_id": "reviewer_id",
+            "reviewer_first_name": "reviewer__first_name",
+            "reviewer_last_name": "reviewer__last_name",
+            "book_id": "book_id",
+            "book_name": "book__name",
+            "library_id": "book__library_id",
+            "library_name": "book__library__name",
+        },
+    ),
+}
+
+
+def parse_day(value):
+    """'YYYY-MM-DD' -> date; ValueError для некорректной даты."""
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValueError(f"Ожидается дата в формате YYYY-MM-DD, получено: {value}")
+    return day
+
+
+def select_columns(dataset, names=None):
+    """Список колонок из строки "a,b,c" (или все). ValueError — если есть неизвестные."""
+    if not names:
+        return list(dataset.columns)
+    columns = [name.strip() for name in names.split(",") if name.strip()]
+    unknown = [name for name in columns if name not in dataset.columns]
+    if unknown or not columns:
+        raise ValueError(f"Неизвестные колонки: {', '.join(unknown)}. Доступны: {', '.join(dataset.columns)}")
+    return columns
+
+
+def _chunks(queryset, chunk_size):
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _Echo:
+    """Файлоподобный объект для csv.writer: write() просто возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(queryset, columns, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for chunk in _chunks(queryset, chunk_size):
+        yield "".join(writer.writerow([_csv_value(value) for value in row]) for row in chunk)
+
+
+def stream_columnar(queryset, columns, dataset_name, chunk_size=CHUNK_SIZE):
+    encoder = JSONEncoder(ensure_ascii=False)
+    yield encoder.encode({"dataset": dataset_name, "columns": columns}) + "\n"
+    for chunk in _chunks(queryset, chunk_size):
+        yield encoder.encode({"rows": len(chunk), "data": [list(column) for column in zip(*chunk)]}) + "\n"
+
+
+def export(dataset_name, fmt, columns=None, date_from=None, date_to=None, chunk_size=CHUNK_SIZE):
+    """
+    Генератор кусков текста выгрузки. dataset_name — ключ DATASETS,
+    columns — строка "a,b,c" или None (все колонки).
+    """
+    dataset = DATASETS[dataset_name]
+    columns = select_columns(dataset, columns)
+    queryset = dataset.queryset(columns, date_from, date_to)
+    if fmt == "csv":
+        return stream_csv(queryset, columns, chunk_size)
+    if fmt == "columnar":
+        return stream_columnar(queryset, columns, dataset_name, chunk_size)
+    raise ValueError(f"Неизвестный формат: {fmt}")
@@ -0,0 +1,398 @@
+"""
+Потоковый импорт книг из CSV и NDJSON.
+
+Файл читается построчно и обрабатывается пачками по batch_size записей,
+поэтому память не зависит от размера файла. На пачку:
+- авторы, издатели, категории и библиотеки ищутся одним запросом на
+  каждый справочник (только ключи, которых ещё нет в словаре-кэше, и
+  точно по ключу: для авторов — OR пар имя+фамилия, а не произведение
+  IN по именам и IN по фамилиям), недостающие создаются одним bulk_create;
+- книги записываются одним bulk_create: записи с "id" — upsert
+  (update_conflicts по id), без "id" — обычная вставка.
+Каждая пачка — своя транзакция; ошибочные строки (в том числе не в
+кодировке UTF-8) пропускаются и попадают в отчёт с номером строки.
+Если база отвергла пачку (IntegrityError), она повторяется по одной
+строке, и ошибка достаётся только виноватым строкам. Книга с одним id,
+встреченная в пачке дважды, записывается по последней строке.
+
+Колонки: id, name, author_first_name, author_last_name, publisher,
+category, library, published_date, description, genre, pages, price,
+discounted_price, is_bestseller. Чтобы создать нового автора, издателя
+или библиотеку, нужны ещё author_birth_date, publisher_established_date
+и library_location соответственно (у моделей это обязательные поля).
+"""
+import csv
+import json
+import operator
+import time
+from dataclasses import dataclass
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db import DataError, IntegrityError, connection, transaction
+from django.db.models import BooleanField, Q
+from django.utils import timezone
+
+from core.versioning import bump_version
+
+from .models import Author, Book, Category, Library, LibraryStats, Publisher
+from .signals import BOOKS_TABLES
+
+FORMATS = ("csv", "ndjson")
+CONTENT_TYPES = {"text/csv": "csv", "application/x-ndjson": "ndjson"}
+
+BOOK_COLUMNS = (
+    "name", "published_date", "description", "genre", "pages",
+    "price", "discounted_price", "is_bestseller",
+)
+
+# ключей справочника на один SELECT: ограничивает и число параметров,
+# и глубину OR-выражения для составных ключей
+FETCH_CHUNK_SIZE = 300
+
+_BOOLEANS = {"true": True, "yes": True, "1": True, "false": False, "no": False, "0": False}
+
+
+@dataclass(frozen=True)
+class Reference:
+    """Справочник, на который ссылается книга, и как найти/создать его строку по записи файла."""
+    field: str
+    model: type
+    key: tuple  # поля модели, по которым ищем существующую строку
+    columns: tuple  # колонки файла с этими значениями
+    create: tuple = ()  # (поле модели, колонка файла) — нужны только для создания
+
+    def key_of(self, record):
+        values = tuple(_clean_text(record.get(column)) for column in self.columns)
+        return None if None in values else values
+
+
+REFERENCES = (
+    Reference("author", Author, ("first_name", "last_name"), ("author_first_name", "author_last_name"),
+              create=(("birth_date", "author_birth_date"),)),
+    Reference("publisher", Publisher, ("name",), ("publisher",),
+              create=(("established_date", "publisher_established_date"),)),
+    Reference("category", Category, ("name",), ("category",)),
+    Reference("library", Library, ("name",), ("library",), create=(("location", "library_location"),)),
+)
+
+
+def _clean_text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _convert(field, value):
+    """Значение из файла -> значение поля модели (с валидаторами поля)."""
+    if isinstance(value, str):
+        value = value.strip()
+        if value == "":
+            value = None
+        elif isinstance(field, BooleanField):
+            value = _BOOLEANS.get(value.lower(), value)
+    if value is None:
+        if field.null:
+            return None
+        if field.has_default():
+            return field.get_default()
+        if field.blank:
+            return ""
+    return field.clean(value, None)
+
+
+def _error_messages(error):
+    return list(error.messages)
+
+
+# --- чтение файлов ---------------------------------------------------------------
+
+class _Lines:
+    """
+    Строки потока как текст. Строка, которую не удалось декодировать,
+    заменяется пустой (csv и NDJSON пустые строки пропускают), а ошибка
+    копится в errors — read_records отдаёт её как ошибку этой строки.
+    """
+
+    def __init__(self, stream, encoding="utf-8"):
+        self.stream = stream
+        self.encoding = encoding
+        self.errors = []
+
+    def __iter__(self):
+        for number, line in enumerate(self.stream, start=1):
+            if isinstance(line, bytes):
+                try:
+                    line = line.decode(self.encoding)
+                except UnicodeDecodeError as exc:
+                    self.errors.append((number, f"Строка не в кодировке {self.encoding}: {exc.reason}."))
+                    line = "\n"
+            if number == 1:
+                line = line.lstrip("\ufeff")  # BOM из Excel
+            yield line
+
+    def drain(self):
+        errors, self.errors = self.errors, []
+        for number, message in errors:
+            yield number, None, message
+
+
+def read_records(stream, fmt, encoding="utf-8"):
+    """
+    Генератор (номер строки, запись или None, ошибка или None) из потока
+    байтов или строк — файла или тела HTTP-запроса. Читает построчно.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+    lines = _Lines(stream, encoding)
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield from lines.drain()
+            yield reader.line_num, record, None
+        yield from lines.drain()
+        return
+    for number, line in enumerate(lines, start=1):
+        yield from lines.drain()
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, None, f"Некорректный JSON: {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "Ожидается JSON-объект."
+            continue
+        yield number, record, None
+
+
+# --- импорт ----------------------------------------------------------------------
+
+class LookupMap:
+    """Ключ справочника -> id. Ограничен по размеру: при переполнении просто очищается."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.ids = {}
+
+    def get(self, key):
+        return self.ids.get(key)
+
+    def update(self, pairs):
+        if len(self.ids) > self.max_size:
+            self.ids.clear()
+        for key, pk in pairs:
+            self.ids.setdefault(key, pk)
+
+
+class BookImporter:
+    def __init__(self, batch_size=5000, lookup_size=100_000, max_errors=100):
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.lookups = {reference.field: LookupMap(lookup_size) for reference in REFERENCES}
+        self.book_fields = {name: Book._meta.get_field(name) for name in BOOK_COLUMNS}
+        self.update_fields = list(BOOK_COLUMNS) + [reference.field for reference in REFERENCES]
+        # библиотеки, у которых поменялось число книг: bulk_create не вызывает сигналы LibraryStats
+        self.touched_libraries = set()
+        self.report = {
+            "rows": 0,
+            "created": 0,
+            "updated": 0,
+            "failed": 0,
+            "duplicates": 0,
+            "references_created": {reference.field: 0 for reference in REFERENCES},
+            "errors": [],
+        }
+
+    def run(self, records):
+        """records — из read_records(). Возвращает отчёт (словарь)."""
+        started = time.perf_counter()
+        batch = []
+        for line, record, error in records:
+            self.report["rows"] += 1
+            if error is not None:
+                self.add_error(line, {"__all__": [error]})
+                continue
+            batch.append((line, record))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+
+        self.report["errors"].sort(key=lambda error: error["line"])
+        if self.report["created"] or self.report["updated"]:
+            bump_version(BOOKS_TABLES)
+        self.touched_libraries.discard(None)
+        if self.touched_libraries:
+            LibraryStats.objects.rebuild(self.touched_libraries)
+        elapsed = time.perf_counter() - started
+        self.report["seconds"] = round(elapsed, 3)
+        self.report["rows_per_second"] = round(self.report["rows"] / elapsed) if elapsed else None
+        return self.report
+
+    def add_error(self, line, errors):
+        self.report["failed"] += 1
+        if len(self.report["errors"]) < self.max_errors:
+            self.report["errors"].append({"line": line, "errors": errors})
+
+    def import_batch(self, batch):
+        rows, by_id = [], {}
+        for line, record in batch:
+            values, errors = self.book_values(record)
+            if errors:
+                self.add_error(line, errors)
+            elif "id" in values:
+                # одна книга дважды в пачке: побеждает последняя строка
+                # (ON CONFLICT DO UPDATE не может обновить строку дважды)
+                if by_id.pop(values["id"], None) is not None:
+                    self.report["duplicates"] += 1
+                by_id[values["id"]] = (line, record, values)
+            else:
+                rows.append((line, record, values))
+        rows = sorted(rows + list(by_id.values()), key=lambda row: row[0])
+
+        state = self.save_state()
+        try:
+            with transaction.atomic():
+                for reference in REFERENCES:
+                    rows = self.resolve(reference, rows)
+                self.save_books(rows)
+        except (IntegrityError, DataError) as exc:
+            # пачка откатилась целиком: возвращаем счётчики и ищем виноватые строки по одной
+            self.restore_state(state)
+            if len(batch) == 1:
+                line, _ = batch[0]
+                self.add_error(line, {"__all__": [f"Ошибка базы данных: {exc}"]})
+                return
+            for row in batch:
+                self.import_batch([row])
+
+    def save_state(self):
+        report = self.report
+        return (
+            {key: report[key] for key in ("created", "updated", "failed", "duplicates")},
+            dict(report["references_created"]),
+            len(report["errors"]),
+            set(self.touched_libraries),
+        )
+
+    def restore_state(self, state):
+        counters, references_created, errors, touched = state
+        self.report.update(counters)
+        self.report["references_created"] = references_created
+        del self.report["errors"][errors:]
+        self.touched_libraries = touched
+        # в кэше могут остаться id справочников из откатившейся транзакции
+        for lookup in self.lookups.values():
+            lookup.ids.clear()
+
+    def book_values(self, record):
+        values, errors = {}, {}
+        raw_id = record.get("id")
+        if raw_id not in (None, ""):
+            try:
+                values["id"] = Book._meta.pk.clean(raw_id, None)
+            except ValidationError as exc:
+                errors["id"] = _error_messages(exc)
+        for name, field in self.book_fields.items():
+            try:
+                values[name] = _convert(field, record.get(name))
+            except ValidationError as exc:
+                errors[name] = _error_messages(exc)
+        return values, errors
+
+    def resolve(self, reference, rows):
+        """Проставляет <field>_id в values; строки, для которых справочник не создать, отбрасываются."""
+        lookup = self.lookups[reference.field]
+        keys = {reference.key_of(record) for _, record, _ in rows} - {None}
+        missing = {key for key in keys if lookup.get(key) is None}
+
+        if missing:
+            lookup.update(self.fetch(reference, missing))
+            missing = {key for key in missing if lookup.get(key) is None}
+
+        failed = {}
+        if missing:
+            failed = self.create(reference, missing, rows)
+            lookup.update(self.fetch(reference, missing - set(failed)))
+
+        resolved = []
+        for line, record, values in rows:
+            key = reference.key_of(record)
+            if key in failed:
+                self.add_error(line, failed[key])
+                continue
+            values[f"{reference.field}_id"] = lookup.get(key) if key is not None else None
+            resolved.append((line, record, values))
+        return resolved
+
+    @staticmethod
+    def fetch(reference, keys):
+        """
+        id существующих строк справочника по ключам (при дублях — меньший id).
+        Выбираются только сами ключи: ключ из одного поля — IN, составной —
+        OR точных пар, по FETCH_CHUNK_SIZE ключей на запрос (обычно один).
+        """
+        fields = [reference.model._meta.get_field(name) for name in reference.key]
+        wanted, keys = set(keys), sorted(keys)
+        chunk_size = min(FETCH_CHUNK_SIZE, connection.ops.bulk_batch_size(fields, keys) or FETCH_CHUNK_SIZE)
+        found = []
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            if len(reference.key) == 1:
+                condition = Q(**{f"{reference.key[0]}__in": [key[0] for key in chunk]})
+            else:
+                condition = reduce(operator.or_, (Q(**dict(zip(reference.key, key))) for key in chunk))
+            rows = reference.model.objects.filter(condition).order_by("pk").values_list("pk", *reference.key)
+            # сравнение в БД может не различать регистр — ключ должен совпасть точно
+            found.extend((tuple(row[1:]), row[0]) for row in rows if tuple(row[1:]) in wanted)
+        return found
+
+    def create(self, reference, keys, rows):
+        """Создаёт недостающие строки справочника; возвращает {ключ: ошибки} для несозданных."""
+        objects, failed = {}, {}
+        for _, record, _ in rows:
+            key = reference.key_of(record)
+            if key not in keys or key in objects or key in failed:
+                continue
+            data = dict(zip(reference.key, key))
+            errors = {}
+            for name, column in reference.create:
+                if _clean_text(record.get(column)) is None:
+                    errors[column] = [f"Нужно для создания «{' '.join(key)}» ({reference.model._meta.verbose_name})."]
+                    continue
+                try:
+                    data[name] = _convert(reference.model._meta.get_field(name), record.get(column))
+                except ValidationError as exc:
+                    errors[column] = _error_messages(exc)
+            if errors:
+                failed[key] = errors
+            else:
+                objects[key] = reference.model(**data)
+        # ignore_conflicts: уникальные справочники (категории) мог создать параллельный импорт
+        reference.model.objects.bulk_create(objects.values(), ignore_conflicts=True)
+        self.report["references_created"][reference.field] += len(objects)
+        return failed
+
+    def save_books(self, rows):
+        with_id = [Book(**values) for _, _, values in rows if "id" in values]
+        without_id = [Book(created_at=timezone.now(), **values) for _, _, values in rows if "id" not in values]
+
+        self.touched_libraries.update(values["library_id"] for _, _, values in rows)
+        if with_id:
+            existing = dict(Book.objects.filter(pk__in=[book.pk for book in with_id]).values_list("pk", "library_id"))
+            self.touched_libraries.update(existing.values())
+            for book in with_id:
+                if book.pk not in existing:
+                    book.created_at = timezone.now()
+            Book.objects.bulk_create(
+                with_id, update_conflicts=True, unique_fields=["id"], update_fields=self.update_fields
+            )
+            self.report["updated"] += len(existing)
+            self.report["created"] += len(with_id) - len(existing)
+        if without_id:
+            Book.objects.bulk_create(without_id)
+            self.report["created"] += len(without_id)
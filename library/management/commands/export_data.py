@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from library.exporter import CHUNK_SIZE, DATASETS, FORMATS, export, parse_day
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоковая выгрузка выдач или отзывов (library/exporter.py) в CSV или "
+        "колоночный NDJSON, с выбором колонок и фильтром по датам."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=DATASETS)
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--columns", help="Колонки через запятую (по умолчанию все).")
+        parser.add_argument("--date-from", help="YYYY-MM-DD, включительно.")
+        parser.add_argument("--date-to", help="YYYY-MM-DD, включительно.")
+        parser.add_argument("--output", help="Файл (по умолчанию stdout).")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Строк на один чанк.")
+
+    def handle(self, *args, **options):
+        try:
+            dates = {name: parse_day(options[name]) for name in ("date_from", "date_to") if options[name]}
+            chunks = export(
+                options["dataset"], options["format"], options["columns"],
+                chunk_size=options["chunk_size"], **dates,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if not options["output"]:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(options["output"], "w", encoding="utf-8", newline="") as fp:
+            for chunk in chunks:
+                fp.write(chunk)
@@ -0,0 +1,47 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.importer import FORMATS, BookImporter, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоковый импорт книг из CSV или NDJSON (library/importer.py). Авторы, "
+        "издатели, категории и библиотеки ищутся по имени и создаются при "
+        "необходимости; записи с id обновляют существующие книги."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл для импорта ('-' — stdin).")
+        parser.add_argument("--format", choices=FORMATS, help="По умолчанию — по расширению файла.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Записей на одну транзакцию.")
+        parser.add_argument("--json", action="store_true", help="Напечатать отчёт в JSON.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or path.rsplit(".", 1)[-1].lower()
+        if fmt not in FORMATS:
+            raise CommandError("Не удалось определить формат — укажите --format.")
+
+        importer = BookImporter(batch_size=options["batch_size"])
+        if path == "-":
+            report = importer.run(read_records(sys.stdin.buffer, fmt))
+        else:
+            try:
+                # байты: декодирует read_records, ошибки кодировки — ошибки строк
+                with open(path, "rb") as fp:
+                    report = importer.run(read_records(fp, fmt))
+            except OSError as exc:
+                raise CommandError(f"Не удалось открыть {path}: {exc}")
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+        for error in report["errors"]:
+            self.stdout.write(self.style.WARNING(f"строка {error['line']}: {error['errors']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Строк: {report['rows']}, создано: {report['created']}, обновлено: {report['updated']}, "
+            f"с ошибками: {report['failed']} ({report['rows_per_second']} строк/с)."
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from library.models import Book
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает сохранённый рейтинг книг (rating_sum / rating_count / rating_avg) по отзывам."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Сколько книг (по диапазону id) пересчитывать одним UPDATE.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        bounds = Book.objects.aggregate(low=Min("id"), high=Max("id"))
+        if bounds["low"] is None:
+            self.stdout.write("Книг нет — пересчитывать нечего.")
+            return
+
+        updated = 0
+        # Идём диапазонами id: каждый UPDATE короткий и не держит блокировку
+        # на всей таблице.
+        for start in range(bounds["low"], bounds["high"] + 1, batch_size):
+            with transaction.atomic():
+                updated += Book.objects.filter(
+                    id__gte=start, id__lt=start + batch_size
+                ).rebuild_ratings()
+
+        self.stdout.write(self.style.SUCCESS(f"Рейтинг пересчитан для {updated} книг."))
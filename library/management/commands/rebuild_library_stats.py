@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from library.models import Library, LibraryStats
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает материализованную статистику библиотек (LibraryStats) с нуля — "
+        "исправляет расхождения после массовых операций в обход сигналов. С --events "
+        "пересчитывает только события библиотек, чьё ближайшее событие уже прошло "
+        "(для периодического запуска)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Сколько библиотек (по диапазону id) пересчитывать одним UPDATE.",
+        )
+        parser.add_argument(
+            "--events",
+            action="store_true",
+            help="Только устаревшие столбцы событий (upcoming_events_count, next_event_at).",
+        )
+
+    def handle(self, *args, **options):
+        if options["events"]:
+            now = timezone.now()
+            updated = LibraryStats.objects.filter(next_event_at__lt=now).refresh_events(now)
+            self.stdout.write(self.style.SUCCESS(f"События пересчитаны для {updated} библиотек."))
+            return
+
+        batch_size = options["batch_size"]
+        bounds = Library.objects.aggregate(low=Min("id"), high=Max("id"))
+        if bounds["low"] is None:
+            self.stdout.write("Библиотек нет — пересчитывать нечего.")
+            return
+
+        updated = 0
+        for start in range(bounds["low"], bounds["high"] + 1, batch_size):
+            with transaction.atomic():
+                updated += LibraryStats.objects.rebuild(
+                    Library.objects.filter(id__gte=start, id__lt=start + batch_size).values("pk")
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Статистика пересчитана для {updated} библиотек."))
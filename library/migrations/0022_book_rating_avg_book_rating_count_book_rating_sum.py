@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:20
+
+from django.db import migrations, models
+from django.db.models import Count, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def backfill_book_ratings(apps, schema_editor):
+    Book = apps.get_model('library', 'Book')
+    Review = apps.get_model('library', 'Review')
+
+    reviews = Review.objects.filter(book=OuterRef('pk')).order_by().values('book')
+    rating_sum = Coalesce(
+        Subquery(reviews.annotate(total=Sum('rating')).values('total')),
+        Value(0, output_field=models.DecimalField()),
+    )
+    rating_count = Coalesce(
+        Subquery(reviews.annotate(total=Count('pk')).values('total')),
+        Value(0),
+    )
+    Book.objects.filter(pk__in=Review.objects.values('book')).update(
+        rating_sum=rating_sum,
+        rating_count=rating_count,
+        rating_avg=Coalesce(
+            Cast(rating_sum, FloatField()) / NullIf(rating_count, Value(0)),
+            Value(0.0),
+            output_field=FloatField(),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0021_alter_book_price_alter_book_publisher'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_avg',
+            field=models.FloatField(db_index=True, default=0, editable=False, verbose_name='Средний рейтинг'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество оценок'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.DecimalField(decimal_places=1, default=0, editable=False, max_digits=12, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(backfill_book_ratings, migrations.RunPython.noop),
+    ]
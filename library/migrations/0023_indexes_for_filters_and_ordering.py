@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0022_book_rating_avg_book_rating_count_book_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['is_returned', 'return_date'], name='borrow_returned_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(condition=models.Q(('is_returned', False)), fields=['return_date'], name='borrow_open_return_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['borrow_date'], name='borrow_borrow_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['event_date'], name='event_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['library', 'event_date'], name='event_library_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='posts',
+            index=models.Index(fields=['created_at'], name='posts_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='posts',
+            index=models.Index(fields=['library', 'is_moderated'], name='posts_library_moderated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['created_at'], name='review_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['book', 'created_at'], name='review_book_created_at_idx'),
+        ),
+    ]
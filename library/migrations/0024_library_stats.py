@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_library_stats(apps, schema_editor):
+    Library = apps.get_model('library', 'Library')
+    LibraryStats = apps.get_model('library', 'LibraryStats')
+    Book = apps.get_model('library', 'Book')
+    Borrow = apps.get_model('library', 'Borrow')
+    Event = apps.get_model('library', 'Event')
+    Member = apps.get_model('library', 'Member')
+    Posts = apps.get_model('library', 'Posts')
+
+    def count(queryset):
+        return Coalesce(
+            Subquery(queryset.order_by().values('library').annotate(total=Count('pk')).values('total')),
+            Value(0),
+        )
+
+    now = django.utils.timezone.now()
+    upcoming = Event.objects.filter(library=OuterRef('pk'), event_date__gte=now)
+    LibraryStats.objects.bulk_create(
+        [LibraryStats(library_id=pk) for pk in Library.objects.values_list('pk', flat=True).iterator()],
+        batch_size=1000,
+    )
+    LibraryStats.objects.update(
+        books_count=count(Book.objects.filter(library=OuterRef('pk'))),
+        members_count=count(Member.libraries.through.objects.filter(library=OuterRef('pk'), member__active=True)),
+        open_borrows_count=count(Borrow.objects.filter(library=OuterRef('pk'), is_returned=False)),
+        upcoming_events_count=count(upcoming),
+        next_event_at=Subquery(upcoming.order_by('event_date').values('event_date')[:1]),
+        moderated_posts_count=count(Posts.objects.filter(library=OuterRef('pk'), is_moderated=True)),
+        updated_at=now,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0023_indexes_for_filters_and_ordering'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibraryStats',
+            fields=[
+                ('library', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='library.library', verbose_name='Библиотека')),
+                ('books_count', models.PositiveIntegerField(default=0, verbose_name='Книг')),
+                ('members_count', models.PositiveIntegerField(default=0, verbose_name='Активных читателей')),
+                ('open_borrows_count', models.PositiveIntegerField(default=0, verbose_name='Книг на руках')),
+                ('upcoming_events_count', models.PositiveIntegerField(default=0, verbose_name='Предстоящих событий')),
+                ('next_event_at', models.DateTimeField(blank=True, null=True, verbose_name='Ближайшее событие')),
+                ('moderated_posts_count', models.PositiveIntegerField(default=0, verbose_name='Промодерированных постов')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Статистика библиотеки',
+                'verbose_name_plural': 'Статистика библиотек',
+            },
+        ),
+        migrations.RunPython(backfill_library_stats, migrations.RunPython.noop),
+    ]
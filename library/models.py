@@ -1,7 +1,8 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
-from django.db.models import Avg
+from django.db.models import BooleanField, Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf
 
 class Author(models.Model):
     name = models.CharField(
@@ -184,10 +185,41 @@ class Posts(models.Model):
         verbose_name_plural = "Посты"
 
         unique_together = ('title', 'created_at')
+        indexes = [
+            # список постов в админке сортируется по -created_at
+            models.Index(fields=['created_at'], name='posts_created_at_idx'),
+            models.Index(fields=['library', 'is_moderated'], name='posts_library_moderated_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+class BorrowQuerySet(models.QuerySet):
+    """
+    Правило просрочки в виде SQL-выражения: сегодня позже даты возврата
+    и книга ещё не возвращена. Позволяет фильтровать, сортировать и
+    считать просрочки в базе, а не перебором объектов в Python.
+    """
+
+    @staticmethod
+    def overdue_condition(today=None):
+        today = today or timezone.localdate()
+        return Q(is_returned=False, return_date__lt=today)
+
+    def overdue(self, today=None):
+        return self.filter(self.overdue_condition(today))
+
+    def annotate_overdue(self, today=None):
+        """Добавляет булеву аннотацию overdue (её использует Borrow.is_overdue())."""
+        return self.annotate(
+            overdue=Case(
+                When(self.overdue_condition(today), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            )
+        )
+
+
 class Borrow(models.Model):
     member = models.ForeignKey(
         "Member",
@@ -223,9 +255,21 @@ class Borrow(models.Model):
         verbose_name='Книга возвращена',
     )
 
+    objects = BorrowQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Выдача книги'
         verbose_name_plural = 'Выдачи книг'
+        indexes = [
+            models.Index(fields=['is_returned', 'return_date'], name='borrow_returned_date_idx'),
+            # частичный индекс только по невозвращённым книгам: просрочки и фильтр админки
+            models.Index(
+                fields=['return_date'],
+                name='borrow_open_return_date_idx',
+                condition=models.Q(is_returned=False),
+            ),
+            models.Index(fields=['borrow_date'], name='borrow_borrow_date_idx'),
+        ]
 
     def __str__(self):
         return f'{self.member} — {self.book}'
@@ -234,7 +278,12 @@ class Borrow(models.Model):
         """
         Проверяет, просрочил ли читатель срок сдачи книги.
         Просрочка = сегодня позже даты возврата и книга ещё не возвращена.
+        Если объект получен через annotate_overdue(), берём готовое значение из SQL.
         """
+        annotated = self.__dict__.get("overdue")
+        if annotated is not None:
+            return annotated
+
         if self.is_returned:
             return False
 
@@ -276,11 +325,79 @@ class Review(models.Model):
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='review_created_at_idx'),
+            models.Index(fields=['book', 'created_at'], name='review_book_created_at_idx'),
+        ]
 
     def __str__(self):
         return f'{self.book} – {self.reviewer} ({self.rating})'
 
 
+class BookQuerySet(models.QuerySet):
+    """
+    Готовые выборки книг под конкретные сериализаторы.
+    Все связанные объекты, которые попадают в ответ API, подтягиваются
+    одним JOIN-ом, чтобы не было отдельного запроса на каждую строку (N+1).
+    """
+
+    LIST_RELATED = ("author", "publisher", "category", "library")
+    DETAIL_RELATED = ("author", "publisher", "category", "library")
+
+    def for_list(self):
+        """Книги для списка (BookListSerializer)."""
+        return self.select_related(*self.LIST_RELATED)
+
+    def for_detail(self):
+        """Книга для детальной карточки (BookDetailSerializer)."""
+        return self.select_related(*self.DETAIL_RELATED)
+
+    def apply_review_delta(self, rating_delta, count_delta):
+        """
+        Атомарно сдвигает сохранённый рейтинг книг на дельту одного отзыва.
+        Сумма и количество сдвигаются одним UPDATE через F(), поэтому
+        параллельные отзывы не затирают друг друга. Среднее пересчитывается
+        вторым UPDATE из уже записанных столбцов: порядок вычисления SET
+        зависит от базы (MySQL применяет присваивания слева направо), и
+        считать среднее в том же UPDATE нельзя.
+        """
+        updated = self.update(
+            rating_sum=F("rating_sum") + Value(rating_delta, output_field=models.DecimalField()),
+            rating_count=F("rating_count") + Value(count_delta),
+        )
+        self.refresh_rating_avg()
+        return updated
+
+    def rebuild_ratings(self):
+        """
+        Пересчитывает рейтинг выбранных книг по таблице отзывов:
+        UPDATE с коррелированными подзапросами, затем среднее из записанных столбцов.
+        """
+        reviews = Review.objects.filter(book=OuterRef("pk")).order_by().values("book")
+        updated = self.update(
+            rating_sum=Coalesce(
+                Subquery(reviews.annotate(total=Sum("rating")).values("total")),
+                Value(0, output_field=models.DecimalField()),
+            ),
+            rating_count=Coalesce(
+                Subquery(reviews.annotate(total=Count("pk")).values("total")),
+                Value(0),
+            ),
+        )
+        self.refresh_rating_avg()
+        return updated
+
+    def refresh_rating_avg(self):
+        """rating_avg из сохранённых rating_sum / rating_count (0, если оценок нет)."""
+        return self.update(
+            rating_avg=Coalesce(
+                Cast(F("rating_sum"), FloatField()) / NullIf(F("rating_count"), Value(0)),
+                Value(0.0),
+                output_field=FloatField(),
+            ),
+        )
+
+
 class Book(models.Model):
     GENRE_CHOICES = [
         ('Fiction', 'Fiction'),
@@ -377,6 +494,29 @@ class Book(models.Model):
 
     created_at = models.DateTimeField(null=True, blank=True)
 
+    # Денормализованный рейтинг: поддерживается сигналами Review
+    # (library/signals.py) и пересчитывается командой rebuild_book_ratings.
+    rating_sum = models.DecimalField(
+        max_digits=12,
+        decimal_places=1,
+        default=0,
+        editable=False,
+        verbose_name="Сумма оценок",
+    )
+    rating_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Количество оценок",
+    )
+    rating_avg = models.FloatField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name="Средний рейтинг",
+    )
+
+    objects = BookQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name} by {self.author or 'Unknown'}"
 
@@ -384,8 +524,7 @@ class Book(models.Model):
 
     @property
     def rating(self):
-        result = self.reviews.aggregate(avg_rating=Avg('rating'))['avg_rating']
-        return  float(result) if result is not None else 0.0
+        return float(self.rating_avg or 0.0)
 
     def __str__(self):
         return self.name
@@ -423,6 +562,10 @@ class Event(models.Model):
         verbose_name = 'Событие'
         verbose_name_plural = 'События'
         ordering = ['-event_date']
+        indexes = [
+            models.Index(fields=['event_date'], name='event_date_idx'),
+            models.Index(fields=['library', 'event_date'], name='event_library_date_idx'),
+        ]
 
     def __str__(self):
 
@@ -532,3 +675,143 @@ class Publisher(models.Model):
 
     def __str__(self):
         return self.name
+
+
+def _subquery_count(queryset, field):
+    """Коррелированный COUNT(*) по queryset, сгруппированному по field (0, если строк нет)."""
+    return Coalesce(
+        Subquery(queryset.order_by().values(field).annotate(total=Count("pk")).values("total")),
+        Value(0),
+    )
+
+
+def library_stats_expressions(now, events_only=False):
+    """
+    Выражения для столбцов LibraryStats через коррелированные подзапросы
+    по OuterRef("pk") — pk строки статистики совпадает с id библиотеки.
+    Каждый подзапрос идёт по индексу (library_id, ...) своей таблицы.
+    """
+    upcoming = Event.objects.filter(library=OuterRef("pk"), event_date__gte=now)
+    expressions = {
+        "upcoming_events_count": _subquery_count(upcoming, "library"),
+        "next_event_at": Subquery(upcoming.order_by("event_date").values("event_date")[:1]),
+        "updated_at": Value(now, output_field=models.DateTimeField()),
+    }
+    if events_only:
+        return expressions
+    return {
+        "books_count": _subquery_count(Book.objects.filter(library=OuterRef("pk")), "library"),
+        "members_count": _subquery_count(
+            Member.libraries.through.objects.filter(library=OuterRef("pk"), member__active=True), "library"
+        ),
+        "open_borrows_count": _subquery_count(
+            Borrow.objects.filter(library=OuterRef("pk"), is_returned=False), "library"
+        ),
+        "moderated_posts_count": _subquery_count(
+            Posts.objects.filter(library=OuterRef("pk"), is_moderated=True), "library"
+        ),
+        **expressions,
+    }
+
+
+class LibraryStatsQuerySet(models.QuerySet):
+    """
+    Инкрементальное обновление и полный пересчёт LibraryStats.
+    Сигналы (library/signals.py) сдвигают счётчики через apply_delta();
+    массовые операции (bulk_create, update()) сигналов не вызывают —
+    после них нужен rebuild() затронутых библиотек.
+    """
+
+    def apply_delta(self, **deltas):
+        """
+        Атомарно сдвигает счётчики одним UPDATE через F(). Возвращает число строк.
+        Уменьшение не опускает счётчик ниже нуля: после операций в обход
+        сигналов он может отставать от данных, и удаление исходной строки не
+        должно падать на CHECK >= 0 — расхождение исправит rebuild().
+        """
+        changes = {}
+        for name, delta in deltas.items():
+            if delta > 0:
+                changes[name] = F(name) + Value(delta)
+            elif delta < 0:
+                changes[name] = Greatest(F(name) + Value(delta), Value(0), output_field=models.PositiveIntegerField())
+        if not changes:
+            return 0
+        return self.update(updated_at=timezone.now(), **changes)
+
+    def refresh_events(self, now=None):
+        """Пересчитывает ближайшие события выбранных строк (одним UPDATE)."""
+        return self.update(**library_stats_expressions(now or timezone.now(), events_only=True))
+
+    def with_current_events(self, now=None):
+        """
+        Аннотации current_upcoming_events_count и current_next_event_at —
+        столбцы событий на момент now без записи в таблицу: для строк, чьё
+        ближайшее событие уже прошло, они считаются подзапросами в том же
+        SELECT, для остальных берутся сохранённые значения.
+        """
+        now = now or timezone.now()
+        expressions = library_stats_expressions(now, events_only=True)
+        stale = Q(next_event_at__lt=now)
+        return self.annotate(
+            current_upcoming_events_count=Case(
+                When(stale, then=expressions["upcoming_events_count"]),
+                default=F("upcoming_events_count"),
+                output_field=models.PositiveIntegerField(),
+            ),
+            current_next_event_at=Case(
+                When(stale, then=expressions["next_event_at"]),
+                default=F("next_event_at"),
+                output_field=models.DateTimeField(),
+            ),
+        )
+
+    def rebuild(self, library_ids=None, now=None):
+        """
+        Пересчитывает статистику библиотек library_ids (список или подзапрос
+        id; None — все) с нуля: недостающие строки создаются, затем все
+        столбцы считаются одним UPDATE с коррелированными подзапросами.
+        """
+        libraries = Library.objects.using(self.db)
+        rows = self
+        if library_ids is not None:
+            libraries = libraries.filter(pk__in=library_ids)
+            rows = rows.filter(pk__in=library_ids)
+        missing = libraries.filter(stats__isnull=True).values_list("pk", flat=True)
+        self.bulk_create([self.model(library_id=pk) for pk in missing], ignore_conflicts=True)
+        return rows.update(**library_stats_expressions(now or timezone.now()))
+
+
+class LibraryStats(models.Model):
+    """
+    Материализованная статистика библиотеки для дашбордов — одна строка
+    на библиотеку, читается по первичному ключу без агрегатов.
+    Счётчики поддерживаются сигналами, manage.py rebuild_library_stats
+    пересчитывает их с нуля. «Ближайшие события» зависят от текущего
+    времени, поэтому рядом хранится next_event_at: когда оно прошло,
+    строка устарела — чтение пересчитывает события на лету
+    (with_current_events), сохраняет их rebuild_library_stats (refresh_events).
+    """
+    library = models.OneToOneField(
+        Library,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+        verbose_name="Библиотека",
+    )
+    books_count = models.PositiveIntegerField(default=0, verbose_name="Книг")
+    members_count = models.PositiveIntegerField(default=0, verbose_name="Активных читателей")
+    open_borrows_count = models.PositiveIntegerField(default=0, verbose_name="Книг на руках")
+    upcoming_events_count = models.PositiveIntegerField(default=0, verbose_name="Предстоящих событий")
+    next_event_at = models.DateTimeField(null=True, blank=True, verbose_name="Ближайшее событие")
+    moderated_posts_count = models.PositiveIntegerField(default=0, verbose_name="Промодерированных постов")
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name="Обновлено")
+
+    objects = LibraryStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Статистика библиотеки"
+        verbose_name_plural = "Статистика библиотек"
+
+    def __str__(self):
+        return f"Статистика: {self.library_id}"
@@ -23,6 +23,11 @@ class BookListSerializer(serializers.ModelSerializer):
             "is_bestseller",
         )
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Подгружаем все связи, которые выводятся через StringRelatedField."""
+        return queryset.for_list()
+
 
 class BookDetailSerializer(serializers.ModelSerializer):
     """Полная информация о книге"""
@@ -35,6 +40,11 @@ class BookDetailSerializer(serializers.ModelSerializer):
         model = Book
         fields = "__all__"
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Подгружаем все связи, которые выводятся через StringRelatedField."""
+        return queryset.for_detail()
+
 
 class BookCreateUpdateSerializer(serializers.ModelSerializer):
     """
@@ -0,0 +1,207 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from core.versioning import track_versions
+
+from .models import Author, Book, Borrow, Category, Event, Library, LibraryStats, Member, Posts, Publisher, Review
+
+
+# Группа таблиц, от которой зависит список книг (ETag списка, см. core/versioning.py):
+# сами книги и связи, выводимые через __str__.
+BOOKS_TABLES = "library.books"
+track_versions(BOOKS_TABLES, Book, Author, Publisher, Category, Library)
+
+
+# ======== Денормализованный рейтинг книги ========
+
+@receiver(pre_save, sender=Review)
+def remember_previous_review(sender, instance, raw=False, **kwargs):
+    """Запоминаем старые book_id и rating, чтобы при изменении отзыва снять их с книги."""
+    instance._previous_review = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_review = (
+        Review.objects.filter(pk=instance.pk).values_list("book_id", "rating").first()
+    )
+
+
+@receiver(post_save, sender=Review)
+def apply_review_to_book(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    rating = Decimal(str(instance.rating))
+    previous = getattr(instance, "_previous_review", None)
+
+    with transaction.atomic():
+        if previous is None:
+            Book.objects.filter(pk=instance.book_id).apply_review_delta(rating, 1)
+            return
+
+        old_book_id, old_rating = previous
+        if old_book_id == instance.book_id:
+            Book.objects.filter(pk=instance.book_id).apply_review_delta(rating - old_rating, 0)
+        else:
+            Book.objects.filter(pk=old_book_id).apply_review_delta(-old_rating, -1)
+            Book.objects.filter(pk=instance.book_id).apply_review_delta(rating, 1)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_book(sender, instance, **kwargs):
+    rating = Decimal(str(instance.rating))
+    Book.objects.filter(pk=instance.book_id).apply_review_delta(-rating, -1)
+
+
+# ======== Материализованная статистика библиотек (LibraryStats) ========
+
+def shift_library_stats(library_id, **deltas):
+    """
+    Сдвигает счётчики статистики библиотеки. Если строки ещё нет (библиотека
+    создана через bulk_create) — после коммита библиотека пересчитывается
+    целиком; к этому моменту она может быть уже удалена, тогда rebuild() ничего не делает.
+    """
+    if library_id is None or not any(deltas.values()):
+        return
+    if not LibraryStats.objects.filter(pk=library_id).apply_delta(**deltas):
+        transaction.on_commit(lambda: LibraryStats.objects.rebuild([library_id]))
+
+
+@receiver(post_save, sender=Library)
+def create_library_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        LibraryStats.objects.get_or_create(library=instance)
+
+
+# Модель -> (счётчик LibraryStats, условие попадания строки в счётчик)
+COUNTED_IN_LIBRARY_STATS = {
+    Book: ("books_count", {}),
+    Borrow: ("open_borrows_count", {"is_returned": False}),
+    Posts: ("moderated_posts_count", {"is_moderated": True}),
+}
+
+
+def _counted_library(values, condition):
+    """id библиотеки, в счётчик которой попадает строка с такими значениями (или None)."""
+    if all(values[name] == expected for name, expected in condition.items()):
+        return values["library_id"]
+    return None
+
+
+def remember_counted_library(sender, instance, raw=False, **kwargs):
+    """Запоминаем, в счётчик какой библиотеки строка входила до сохранения."""
+    _, condition = COUNTED_IN_LIBRARY_STATS[sender]
+    instance._previous_counted_library = None
+    if raw or instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values("library_id", *condition).first()
+    if previous is not None:
+        instance._previous_counted_library = _counted_library(previous, condition)
+
+
+def _current_counted_library(sender, instance):
+    _, condition = COUNTED_IN_LIBRARY_STATS[sender]
+    values = {name: getattr(instance, name) for name in ("library_id", *condition)}
+    return _counted_library(values, condition)
+
+
+def count_saved_in_library_stats(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    counter, _ = COUNTED_IN_LIBRARY_STATS[sender]
+    previous = getattr(instance, "_previous_counted_library", None)
+    current = _current_counted_library(sender, instance)
+    if previous != current:
+        shift_library_stats(previous, **{counter: -1})
+        shift_library_stats(current, **{counter: 1})
+
+
+def count_deleted_in_library_stats(sender, instance, **kwargs):
+    counter, _ = COUNTED_IN_LIBRARY_STATS[sender]
+    shift_library_stats(_current_counted_library(sender, instance), **{counter: -1})
+
+
+for _sender in COUNTED_IN_LIBRARY_STATS:
+    _uid = f"library_stats:{_sender._meta.label_lower}"
+    pre_save.connect(remember_counted_library, sender=_sender, dispatch_uid=_uid)
+    post_save.connect(count_saved_in_library_stats, sender=_sender, dispatch_uid=_uid)
+    post_delete.connect(count_deleted_in_library_stats, sender=_sender, dispatch_uid=_uid)
+
+
+@receiver(pre_save, sender=Event)
+def remember_event_library(sender, instance, raw=False, **kwargs):
+    instance._previous_library_id = None
+    if not raw and instance.pk is not None:
+        instance._previous_library_id = (
+            Event.objects.filter(pk=instance.pk).values_list("library_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def refresh_library_events(sender, instance, raw=False, **kwargs):
+    """Ближайшие события зависят от времени — их проще пересчитать, чем сдвигать."""
+    if raw:
+        return
+    library_ids = {instance.library_id, getattr(instance, "_previous_library_id", None)} - {None}
+    updated = LibraryStats.objects.filter(pk__in=library_ids).refresh_events()
+    if updated < len(library_ids):
+        transaction.on_commit(lambda: LibraryStats.objects.rebuild(library_ids))
+
+
+# --- активные читатели: Member.libraries и Member.active ---
+
+def _active_links(sender, instance, reverse, pk_set):
+    """{library_id: число связей} среди затронутых связей активных читателей."""
+    links = sender.objects.filter(library=instance) if reverse else sender.objects.filter(member=instance)
+    if pk_set is not None:
+        links = links.filter(**{"member__in" if reverse else "library__in": pk_set})
+    return Counter(links.filter(member__active=True).values_list("library_id", flat=True))
+
+
+@receiver(m2m_changed, sender=Member.libraries.through)
+def count_member_libraries(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Работает с обеих сторон связи (member.libraries и library.members).
+    Удаляемые связи считаем в pre_*: pk_set у remove не фильтруется по
+    существующим связям, а после удаления их уже не найти.
+    """
+    if action in ("pre_remove", "pre_clear"):
+        instance._removed_stats_links = _active_links(sender, instance, reverse, pk_set)
+    elif action in ("post_remove", "post_clear"):
+        for library_id, count in getattr(instance, "_removed_stats_links", {}).items():
+            shift_library_stats(library_id, members_count=-count)
+    elif action == "post_add" and pk_set:
+        for library_id, count in _active_links(sender, instance, reverse, pk_set).items():
+            shift_library_stats(library_id, members_count=count)
+
+
+@receiver(pre_save, sender=Member)
+def remember_member_active(sender, instance, raw=False, **kwargs):
+    instance._previous_active = None
+    if not raw and instance.pk is not None:
+        instance._previous_active = Member.objects.filter(pk=instance.pk).values_list("active", flat=True).first()
+
+
+@receiver(post_save, sender=Member)
+def count_member_active(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, "_previous_active", None)
+    if raw or created or previous is None or previous == instance.active:
+        return
+    for library_id in instance.libraries.values_list("pk", flat=True):
+        shift_library_stats(library_id, members_count=1 if instance.active else -1)
+
+
+@receiver(pre_delete, sender=Member)
+def remember_member_libraries(sender, instance, **kwargs):
+    # связи удаляются каскадом без m2m_changed — запоминаем их до удаления
+    instance._stats_library_ids = list(instance.libraries.values_list("pk", flat=True)) if instance.active else []
+
+
+@receiver(post_delete, sender=Member)
+def uncount_deleted_member(sender, instance, **kwargs):
+    for library_id in getattr(instance, "_stats_library_ids", []):
+        shift_library_stats(library_id, members_count=-1)
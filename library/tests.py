@@ -1,3 +1,894 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.response_cache import reset_response_cache_stats, response_cache_stats
+from core.testing import QueryPlanMixin, admin_changelist_urls, explain, plan_problems
+
+from .exporter import DATASETS
+from .importer import REFERENCES, BookImporter
+from .models import Author, Book, Borrow, Category, Event, Library, LibraryStats, Member, Posts, Publisher, Review
+
+
+class BookTestDataMixin:
+    """Общие тестовые данные для API книг."""
+
+    @classmethod
+    def create_books(cls, count, start=0):
+        books = []
+        for i in range(start, start + count):
+            author = Author.objects.create(
+                first_name=f"Имя{i}",
+                last_name=f"Фамилия{i}",
+                birth_date=date(1970, 1, 1),
+            )
+            publisher = Publisher.objects.create(
+                name=f"Издатель {i}",
+                established_date=date(2000, 1, 1),
+            )
+            category = Category.objects.create(name=f"Категория {i}")
+            library = Library.objects.create(name=f"Библиотека {i}", location="Berlin")
+            books.append(
+                Book.objects.create(
+                    name=f"Книга {i}",
+                    author=author,
+                    publisher=publisher,
+                    category=category,
+                    library=library,
+                    price="10.00",
+                )
+            )
+        return books
+
+
+class BookQueryCountTests(BookTestDataMixin, TestCase):
+    """Количество SQL-запросов не должно зависеть от числа книг."""
+
+    def setUp(self):
+        caches["responses"].clear()
+
+    def test_list_query_count_is_flat(self):
+        url = reverse("book-list-create")
+
+        # версия таблиц для ETag + сами книги
+        self.create_books(1)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.create_books(20, start=1)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(len(results), 21)
+        self.assertEqual(results[-1]["author"], "Имя0 Фамилия0")
+
+    def test_detail_uses_single_query(self):
+        # отпечаток строки для ETag + сама книга
+        book = self.create_books(1)[0]
+        url = reverse("book-detail-update-delete", args=[book.pk])
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["publisher"], "Издатель 0")
+
+        # повторно — только отпечаток, ответ из кэша
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).json(), response.json())
+
+    def test_admin_changelist_query_count_is_flat(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+        url = reverse("admin:library_book_changelist")
+
+        self.create_books(1)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        self.create_books(10, start=1)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(many), len(few))
+
+
+class BookPaginationTests(BookTestDataMixin, TestCase):
+    """Cursor-пагинация и потоковая выгрузка каталога."""
+
+    def test_cursor_walks_whole_catalogue(self):
+        books = self.create_books(7)
+        url = reverse("book-list-create") + "?page_size=3"
+
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            payload = response.json()
+            seen.extend(item["id"] for item in payload["results"])
+            url = payload["next"]
+
+        self.assertEqual(seen, sorted((b.pk for b in books), reverse=True))
+
+    def test_page_query_has_no_offset(self):
+        self.create_books(3)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("book-list-create"))
+        self.assertNotIn("OFFSET", ctx.captured_queries[0]["sql"].upper())
+
+    def test_stream_returns_ndjson(self):
+        books = self.create_books(5)
+        response = self.client.get(reverse("book-list-create") + "?stream=1")
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        body = b"".join(response.streaming_content).decode()
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row["id"] for row in rows], [b.pk for b in books])
+        self.assertEqual(rows[0]["library"], "Библиотека 0")
+
+
+class BookRatingTests(BookTestDataMixin, TestCase):
+    """Сохранённый рейтинг книги поддерживается отзывами."""
+
+    def setUp(self):
+        self.book, self.other_book = self.create_books(2)
+        self.member = Member.objects.create(
+            first_name="Анна",
+            last_name="Петрова",
+            email="anna@example.com",
+            gender="female",
+            birth_date=date(1990, 1, 1),
+            age=35,
+            role="reader",
+        )
+
+    def review(self, book, rating):
+        return Review.objects.create(book=book, reviewer=self.member, rating=Decimal(rating), text="...")
+
+    def test_create_update_delete_keep_rating_in_sync(self):
+        first = self.review(self.book, "4.0")
+        self.review(self.book, "5.0")
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.rating_count, 2)
+        self.assertEqual(self.book.rating, 4.5)
+
+        first.rating = Decimal("2.0")
+        first.save()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.rating, 3.5)
+
+        first.book = self.other_book
+        first.save()
+        self.book.refresh_from_db()
+        self.other_book.refresh_from_db()
+        self.assertEqual((self.book.rating_count, self.book.rating), (1, 5.0))
+        self.assertEqual((self.other_book.rating_count, self.other_book.rating), (1, 2.0))
+
+        first.delete()
+        self.other_book.refresh_from_db()
+        self.assertEqual((self.other_book.rating_count, self.other_book.rating), (0, 0.0))
+
+    def test_reading_rating_does_not_query(self):
+        self.review(self.book, "3.0")
+        book = Book.objects.get(pk=self.book.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(book.rating, 3.0)
+
+    def test_rebuild_command_fixes_drift(self):
+        Review.objects.bulk_create([
+            Review(book=self.book, reviewer=self.member, rating=Decimal("1.0"), text="a"),
+            Review(book=self.book, reviewer=self.member, rating=Decimal("4.0"), text="b"),
+        ])
+        Book.objects.filter(pk=self.other_book.pk).update(rating_count=7, rating_avg=1.0)
+
+        call_command("rebuild_book_ratings", batch_size=1, stdout=StringIO())
+
+        self.book.refresh_from_db()
+        self.other_book.refresh_from_db()
+        self.assertEqual((self.book.rating_count, self.book.rating), (2, 2.5))
+        self.assertEqual((self.other_book.rating_count, self.other_book.rating), (0, 0.0))
+
+
+class LibraryQueryPlanTests(QueryPlanMixin, BookTestDataMixin, TestCase):
+    """Все запросы API и changelist'ов админки должны идти через индексы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = cls.create_books(3)
+        member = Member.objects.create(
+            first_name="Иван",
+            last_name="Иванов",
+            email="ivan@example.com",
+            gender="male",
+            birth_date=date(1990, 1, 1),
+            age=35,
+            role="reader",
+        )
+        library = cls.books[0].library
+        member.libraries.add(library)
+        today = timezone.localdate()
+        Borrow.objects.create(member=member, book=cls.books[0], library=library,
+                              borrow_date=today, return_date=today)
+        Review.objects.create(book=cls.books[0], reviewer=member, rating=Decimal("4.0"), text="ok")
+        Posts.objects.create(title="Пост", text="...", author=member, library=library, created_at=today)
+        Event.objects.create(title="Встреча", description="...", event_date=timezone.now(), library=library)
+        cls.admin_user = User.objects.create_superuser("admin", "admin@example.com", "password")
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def test_api_queries_use_indexes(self):
+        book = self.books[0]
+        for url in (
+            reverse("book-list-create"),
+            reverse("book-list-create") + "?stream=1",
+            reverse("book-detail-update-delete", args=[book.pk]),
+            reverse("borrow-overdue-report"),
+        ):
+            self.assertIndexedQueries(url)
+
+    def test_admin_changelists_use_indexes(self):
+        for url in admin_changelist_urls("library"):
+            self.assertIndexedQueries(url)
+
+    def test_admin_filtered_changelists_use_indexes(self):
+        library = self.books[0].library
+        for url in (
+            "/admin/library/borrow/?is_returned__exact=0",
+            "/admin/library/borrow/?overdue=yes",
+            f"/admin/library/borrow/?library__id__exact={library.pk}",
+            "/admin/library/posts/?is_moderated__exact=1",
+            f"/admin/library/book/?library__id__exact={library.pk}",
+            f"/admin/library/review/?book__id__exact={self.books[0].pk}",
+            f"/admin/library/event/?library__id__exact={library.pk}",
+        ):
+            self.assertIndexedQueries(url)
+
+
+class BorrowOverdueTests(BookTestDataMixin, TestCase):
+    """Просрочка считается в SQL: фильтр, аннотация, отчёт и админка."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = cls.create_books(2)
+        cls.lib_a, cls.lib_b = cls.books[0].library, cls.books[1].library
+        cls.members = [
+            Member.objects.create(
+                first_name=name, last_name="Читатель", email=f"{name}@example.com",
+                gender="male", birth_date=date(1990, 1, 1), age=35, role="reader",
+            )
+            for name in ("Пётр", "Олег")
+        ]
+        today = timezone.localdate()
+        past, future = today - timedelta(days=3), today + timedelta(days=3)
+
+        def borrow(member, library, return_date, is_returned=False):
+            return Borrow.objects.create(
+                member=member, book=cls.books[0], library=library,
+                borrow_date=today - timedelta(days=10), return_date=return_date,
+                is_returned=is_returned,
+            )
+
+        cls.overdue = [
+            borrow(cls.members[0], cls.lib_a, past),
+            borrow(cls.members[0], cls.lib_b, past),
+            borrow(cls.members[1], cls.lib_a, past),
+        ]
+        cls.on_time = [
+            borrow(cls.members[1], cls.lib_a, future),
+            borrow(cls.members[1], cls.lib_b, past, is_returned=True),
+        ]
+
+    def test_queryset_matches_python_rule(self):
+        self.assertEqual(set(Borrow.objects.overdue()), set(self.overdue))
+
+        annotated = list(Borrow.objects.annotate_overdue())
+        for borrow in annotated:
+            fresh = Borrow.objects.get(pk=borrow.pk)
+            self.assertEqual(borrow.is_overdue(), fresh.is_overdue())
+        self.assertEqual(sum(borrow.overdue for borrow in annotated), 3)
+
+    def test_report_in_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("borrow-overdue-report"))
+
+        data = response.json()
+        self.assertEqual(data["total_overdue"], 3)
+        self.assertEqual(
+            [(row["library"], row["overdue"]) for row in data["by_library"]],
+            [(self.lib_a.pk, 2), (self.lib_b.pk, 1)],
+        )
+        self.assertEqual(
+            [(row["member"], row["overdue"]) for row in data["by_member"]],
+            [(self.members[0].pk, 2), (self.members[1].pk, 1)],
+        )
+
+    def test_admin_filter_and_sort(self):
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(admin_user)
+
+        response = self.client.get("/admin/library/borrow/?overdue=yes")
+        self.assertEqual(response.context["cl"].result_count, 3)
+
+        response = self.client.get("/admin/library/borrow/?overdue=no")
+        self.assertEqual(response.context["cl"].result_count, 2)
+
+        # "Просрочено?" — седьмая колонка list_display; с колонкой чекбокса её индекс 7
+        response = self.client.get("/admin/library/borrow/?o=-7")
+        self.assertEqual(response.status_code, 200)
+        flags = [borrow.overdue for borrow in response.context["cl"].result_list]
+        self.assertEqual(flags, sorted(flags, reverse=True))
+
+
+class BookConditionalRequestTests(BookTestDataMixin, TestCase):
+    """ETag для каталога и карточки книги."""
+
+    def setUp(self):
+        self.book, self.other = self.create_books(2)
+        self.detail_url = reverse("book-detail-update-delete", args=[self.book.pk])
+
+    def test_list_not_modified_until_catalogue_changes(self):
+        url = reverse("book-list-create")
+        etag = self.client.get(url)["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # имя автора выводится в списке — его изменение тоже меняет ETag
+        author = self.other.author
+        author.last_name = "Новая"
+        author.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_etag_is_per_book(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+
+        Book.objects.filter(pk=self.other.pk).update(name="Другая")
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        publisher = self.book.publisher
+        publisher.name = "Переименован"
+        publisher.save()
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_put_with_stale_if_match_is_rejected(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        Book.objects.filter(pk=self.book.pk).update(price="99.00")
+
+        payload = {
+            "name": "Книга",
+            "author": self.book.author_id,
+            "publisher": self.book.publisher_id,
+            "category": self.book.category_id,
+            "library": self.book.library_id,
+            "price": "12.00",
+        }
+        response = self.client.put(
+            self.detail_url, data=json.dumps(payload), content_type="application/json",
+            HTTP_IF_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 412)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.price, Decimal("99.00"))
+
+
+class BookResponseCacheTests(BookTestDataMixin, TestCase):
+    """Кэш карточки книги: версия в ключе, счётчики, ограничение размера."""
+
+    def setUp(self):
+        caches["responses"].clear()
+        reset_response_cache_stats()
+        self.book = self.create_books(1)[0]
+        self.url = reverse("book-detail-update-delete", args=[self.book.pk])
+
+    def test_hits_and_misses_are_counted(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(response_cache_stats()["hits"], 1)
+        self.assertEqual(response_cache_stats()["misses"], 1)
+
+    def test_related_and_rating_changes_bypass_stale_entry(self):
+        self.client.get(self.url)
+
+        author = self.book.author
+        author.first_name = "Лев"
+        author.save()
+        self.assertEqual(self.client.get(self.url).json()["author"], "Лев Фамилия0")
+
+        # рейтинг обновляется через update() без сигналов Book — ключ всё равно новый
+        member = Member.objects.create(
+            first_name="Анна", last_name="Петрова", email="anna@example.com",
+            gender="female", birth_date=date(1990, 1, 1), age=35, role="reader",
+        )
+        Review.objects.create(book=self.book, reviewer=member, rating=Decimal("5.0"), text="...")
+        self.assertEqual(self.client.get(self.url).json()["rating_count"], 1)
+        self.assertEqual(response_cache_stats()["hits"], 0)
+
+    def test_file_based_backend_and_size_limit(self):
+        with tempfile.TemporaryDirectory() as location:
+            responses = {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": location,
+                "OPTIONS": {"MAX_ENTRIES": 3, "CULL_FREQUENCY": 3},
+            }
+            with self.settings(CACHES={**settings.CACHES, "responses": responses}):
+                books = self.create_books(5, start=1)
+                for book in books:
+                    self.client.get(reverse("book-detail-update-delete", args=[book.pk]))
+                self.assertLessEqual(len(os.listdir(location)), 3)
+
+                self.client.get(reverse("book-detail-update-delete", args=[books[-1].pk]))
+                self.assertEqual(response_cache_stats()["hits"], 1)
+
+
+class BookFastPathTests(BookTestDataMixin, TestCase):
+    """?fast=1 для каталога: тот же JSON, что у BookListSerializer."""
+
+    def test_page_and_stream_are_byte_identical(self):
+        self.create_books(6)
+        Book.objects.filter(pk=Book.objects.order_by("id").first().pk).update(
+            category=None, discounted_price="7.50", is_bestseller=True,
+        )
+        url = reverse("book-list-create")
+
+        renderer = JSONRenderer()
+        for query in ("", "?page_size=4"):
+            slow = self.client.get(url + query).data["results"]
+            fast = self.client.get(url + (query + "&" if query else "?") + "fast=1").data["results"]
+            self.assertEqual(renderer.render(fast), renderer.render(slow))
+
+        slow = b"".join(self.client.get(url + "?stream=1").streaming_content)
+        fast = b"".join(self.client.get(url + "?stream=1&fast=1").streaming_content)
+        self.assertEqual(fast, slow)
+
+
+class AsyncBookApiTests(BookTestDataMixin, TestCase):
+    """Async-эндпоинты каталога отдают тот же JSON, что и синхронные."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = cls.create_books(5)
+
+    def setUp(self):
+        caches["responses"].clear()
+
+    async def test_list_matches_sync_and_walks_by_key(self):
+        sync = (await self.async_client.get(reverse("book-list-create"))).json()["results"]
+
+        url, seen = reverse("async-book-list") + "?page_size=2", []
+        while url:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(response.json()["results"])
+            url = response.json()["next"]
+        self.assertEqual(seen, sync)
+
+        response = await self.async_client.get(reverse("async-book-list") + "?after_id=abc")
+        self.assertEqual(response.status_code, 400)
+
+    async def test_detail_with_etag(self):
+        book = self.books[0]
+        sync = await self.async_client.get(reverse("book-detail-update-delete", args=[book.pk]))
+        response = await self.async_client.get(reverse("async-book-detail", args=[book.pk]))
+        self.assertEqual(response.content, sync.content)
+        self.assertEqual(response["ETag"], sync["ETag"])
+
+        response = await self.async_client.get(
+            reverse("async-book-detail", args=[book.pk]), headers={"If-None-Match": sync["ETag"]},
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = await self.async_client.get(reverse("async-book-detail", args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class BookImportTests(TestCase):
+    """Потоковый импорт книг: команда import_books и POST /books/import/."""
+
+    HEADER = "id,name,author_first_name,author_last_name,author_birth_date,publisher,publisher_established_date,pages,is_bestseller\n"
+
+    def import_csv(self, text, *args):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8") as fp:
+            fp.write(text)
+        self.addCleanup(os.remove, fp.name)
+        out = StringIO()
+        call_command("import_books", fp.name, "--json", *args, stdout=out)
+        return json.loads(out.getvalue())
+
+    def test_author_lookup_fetches_exact_name_pairs(self):
+        for first_name, last_name in (("Иван", "Бунин"), ("Иван", "Тургенев"), ("Антон", "Чехов"), ("Фёдор", "Тютчев")):
+            Author.objects.create(first_name=first_name, last_name=last_name, birth_date=date(1850, 1, 1))
+        reference = next(reference for reference in REFERENCES if reference.field == "author")
+        keys = {("Иван", "Чехов"), ("Антон", "Чехов"), ("Иван", "Бунин"), ("Фёдор", "Бунин"), ("Фёдор", "Тютчев")}
+
+        with mock.patch("library.importer.FETCH_CHUNK_SIZE", 2), CaptureQueriesContext(connection) as ctx:
+            found = dict(BookImporter.fetch(reference, keys))
+
+        self.assertEqual(set(found), {("Антон", "Чехов"), ("Иван", "Бунин"), ("Фёдор", "Тютчев")})
+        self.assertEqual(found[("Иван", "Бунин")], Author.objects.get(last_name="Бунин").pk)
+        self.assertEqual(len(ctx.captured_queries), 3)
+        # точные пары, а не first_name IN (...) AND last_name IN (...)
+        self.assertTrue(all(" IN (" not in query["sql"] for query in ctx.captured_queries))
+
+    def test_csv_reuses_references_and_reports_bad_rows(self):
+        Author.objects.create(first_name="Лев", last_name="Толстой", birth_date=date(1828, 9, 9))
+        report = self.import_csv(
+            self.HEADER
+            + ",Война и мир,Лев,Толстой,,Эксмо,1991-01-01,1300,true\n"
+            + ",Анна Каренина,Лев,Толстой,,Эксмо,,800,false\n"
+            + ",Без даты,Новый,Автор,,Эксмо,,100,\n"
+            + ",Слишком толстая,Лев,Толстой,,Эксмо,,20000,\n"
+        )
+
+        self.assertEqual((report["rows"], report["created"], report["failed"]), (4, 2, 2))
+        self.assertEqual(report["references_created"], {"author": 0, "publisher": 1, "category": 0, "library": 0})
+        self.assertEqual([error["line"] for error in report["errors"]], [4, 5])
+        self.assertIn("author_birth_date", report["errors"][0]["errors"])
+        self.assertIn("pages", report["errors"][1]["errors"])
+
+        self.assertEqual(Author.objects.count(), 1)
+        self.assertEqual(Publisher.objects.count(), 1)
+        book = Book.objects.get(name="Война и мир")
+        self.assertTrue(book.is_bestseller)
+        self.assertEqual(book.author.last_name, "Толстой")
+        self.assertIsNotNone(book.created_at)
+
+    def test_rows_with_id_are_upserted(self):
+        created_at = timezone.now() - timedelta(days=30)
+        book = Book.objects.create(name="Старое имя", pages=10, created_at=created_at)
+
+        report = self.import_csv(
+            self.HEADER
+            + f"{book.pk},Новое имя,,,,,,20,false\n"
+            + f"{book.pk + 100},Другая книга,,,,,,30,false\n"
+        )
+
+        self.assertEqual((report["created"], report["updated"], report["failed"]), (1, 1, 0))
+        book.refresh_from_db()
+        self.assertEqual((book.name, book.pages, book.created_at), ("Новое имя", 20, created_at))
+        self.assertTrue(Book.objects.filter(pk=book.pk + 100, name="Другая книга").exists())
+
+    def test_duplicate_ids_in_batch_last_row_wins(self):
+        book = Book.objects.create(name="Старое имя", pages=10)
+
+        report = self.import_csv(
+            self.HEADER
+            + f"{book.pk},Первая правка,,,,,,20,false\n"
+            + f"{book.pk},Вторая правка,,,,,,30,false\n"
+        )
+
+        self.assertEqual((report["created"], report["updated"], report["duplicates"]), (0, 1, 1))
+        book.refresh_from_db()
+        self.assertEqual((book.name, book.pages), ("Вторая правка", 30))
+
+    def test_bad_encoding_is_a_line_error(self):
+        with tempfile.NamedTemporaryFile("wb", suffix=".csv", delete=False) as fp:
+            fp.write(self.HEADER.encode())
+            fp.write(",Хорошая,,,,,,10,false\n".encode())
+            fp.write(",Плохая,,,,,,10,false\n".encode("cp1251"))
+            fp.write(",Ещё хорошая,,,,,,10,false\n".encode())
+        self.addCleanup(os.remove, fp.name)
+        out = StringIO()
+        call_command("import_books", fp.name, "--json", stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual((report["created"], report["failed"]), (2, 1))
+        self.assertEqual(report["errors"][0]["line"], 3)
+
+        self.client.force_login(User.objects.create_user("staff", password="x", is_staff=True))
+        response = self.client.post(
+            reverse("book-import"), '{"name": "Плохая"}\n'.encode("cp1251"), content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["created"], response.data["errors"][0]["line"]), (0, 1))
+
+    def test_database_error_is_reported_against_the_row(self):
+        save_books = BookImporter.save_books
+
+        def failing_save(importer, rows):
+            if any(values["name"] == "Нарушает ограничение" for _, _, values in rows):
+                raise IntegrityError("FOREIGN KEY constraint failed")
+            return save_books(importer, rows)
+
+        with mock.patch.object(BookImporter, "save_books", failing_save):
+            report = self.import_csv(
+                self.HEADER
+                + ",Первая,,,,Новое издательство,2000-01-01,10,false\n"
+                + ",Нарушает ограничение,,,,,,10,false\n"
+                + ",Третья,,,,,,,\n"
+            )
+
+        self.assertEqual((report["created"], report["failed"]), (2, 1))
+        self.assertEqual(report["references_created"]["publisher"], 1)
+        self.assertEqual(report["errors"][0]["line"], 3)
+        self.assertEqual(Publisher.objects.filter(name="Новое издательство").count(), 1)
+        self.assertFalse(Book.objects.filter(name="Нарушает ограничение").exists())
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def import_rows(count, offset):
+            lines = "".join(
+                f",Книга {i},Имя{i},Фамилия{i},1970-01-01,Издатель {i},2000-01-01,100,false\n"
+                for i in range(offset, offset + count)
+            )
+            with CaptureQueriesContext(connection) as ctx:
+                report = self.import_csv(self.HEADER + lines)
+            self.assertEqual(report["created"], count)
+            return len(ctx.captured_queries)
+
+        import_rows(1, 0)  # первая запись версий таблиц — отдельные запросы
+        self.assertEqual(import_rows(5, 100), import_rows(50, 200))
+
+    def test_api_ndjson_for_staff_only(self):
+        url = reverse("book-import")
+        body = "\n".join([
+            json.dumps({"name": "Из API", "category": "Проза", "library": "Центральная", "library_location": "Москва"}),
+            "не json",
+            "",
+        ])
+
+        user = User.objects.create_user("reader", password="x")
+        self.client.force_login(user)
+        response = self.client.post(url, body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.post(url, body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["created"], response.data["failed"]), (1, 1))
+        self.assertEqual(response.data["errors"][0]["line"], 2)
+        book = Book.objects.select_related("category", "library").get(name="Из API")
+        self.assertEqual((book.category.name, book.library.location), ("Проза", "Москва"))
+
+        response = self.client.post(url, body, content_type="application/json")
+        self.assertEqual(response.status_code, 415)
+
+
+class DataExportTests(BookTestDataMixin, TestCase):
+    """Потоковая выгрузка выдач и отзывов: команда export_data и GET /exports/<dataset>/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = cls.create_books(2)
+        cls.member = Member.objects.create(
+            first_name="Анна", last_name="Читатель", email="anna@example.com",
+            gender="female", birth_date=date(1990, 1, 1), age=35, role="reader",
+        )
+        cls.borrows = [
+            Borrow.objects.create(
+                member=cls.member, book=cls.books[i % 2], library=cls.books[i % 2].library,
+                borrow_date=date(2024, 1, 1) + timedelta(days=i), return_date=date(2024, 2, 1),
+                is_returned=i == 0,
+            )
+            for i in range(5)
+        ]
+        Review.objects.create(book=cls.books[0], reviewer=cls.member, rating=Decimal("4.5"), text="Хорошо, но «длинно»\nи спорно")
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("analyst", password="x", is_staff=True))
+
+    def export(self, *args):
+        out = StringIO()
+        call_command("export_data", *args, stdout=out)
+        return out.getvalue()
+
+    def test_csv_with_columns_and_dates(self):
+        rows = list(csv.reader(StringIO(self.export(
+            "borrows", "--columns", "id,borrow_date,is_returned,member_last_name,library_name",
+            "--date-from", "2024-01-02", "--date-to", "2024-01-04", "--chunk-size", "2",
+        ))))
+
+        self.assertEqual(rows[0], ["id", "borrow_date", "is_returned", "member_last_name", "library_name"])
+        self.assertEqual(
+            rows[1:],
+            [
+                [str(borrow.pk), borrow.borrow_date.isoformat(), "false", "Читатель", borrow.library.name]
+                for borrow in self.borrows[1:4]
+            ],
+        )
+
+        rows = list(csv.reader(StringIO(self.export("reviews", "--columns", "text,rating,library_name"))))
+        self.assertEqual(rows[1], ["Хорошо, но «длинно»\nи спорно", "4.5", self.books[0].library.name])
+
+    def test_review_date_range_uses_created_at_index(self):
+        review = Review.objects.get()
+        day = timezone.localtime(review.created_at).date()
+        for date_from, date_to, expected in (
+            (day, day, [review.pk]),
+            (day - timedelta(days=3), day - timedelta(days=1), []),
+            (day + timedelta(days=1), None, []),
+            (date.min, date.max, [review.pk]),
+        ):
+            queryset = DATASETS["reviews"].queryset(["id"], date_from, date_to)
+            self.assertEqual(list(queryset.values_list("id", flat=True)), expected)
+
+        sql, params = DATASETS["reviews"].queryset(["id", "book_name"], day, day).query.sql_with_params()
+        self.assertNotIn("django_datetime_cast_date", sql)
+        self.assertEqual(plan_problems(sql, params), [])
+        self.assertTrue(any("review_created_at_idx" in line for line in explain(sql, params)))
+
+        # крайние допустимые даты (date.max + 1 день переполнялся в 500)
+        response = self.client.get(reverse("data-export", args=["reviews"]), {"date_from": "0001-01-01", "date_to": "9999-12-31"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(list(csv.reader(StringIO(b"".join(response.streaming_content).decode())))), 2)
+        self.assertEqual(len(list(csv.reader(StringIO(self.export("reviews", "--date-to", "9999-12-31"))))), 2)
+
+    def test_columnar_chunks(self):
+        lines = [json.loads(line) for line in self.export(
+            "borrows", "--format", "columnar", "--columns", "id,book_name", "--chunk-size", "2",
+        ).splitlines()]
+
+        self.assertEqual(lines[0], {"dataset": "borrows", "columns": ["id", "book_name"]})
+        self.assertEqual([line["rows"] for line in lines[1:]], [2, 2, 1])
+        self.assertEqual(
+            [pk for line in lines[1:] for pk in line["data"][0]],
+            [borrow.pk for borrow in self.borrows],
+        )
+
+    def test_api_streams_with_one_query_per_chunk(self):
+        url = reverse("data-export", args=["borrows"])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {"output": "columnar"})
+            body = b"".join(response.streaming_content).decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn('filename="borrows.ndjson"', response["Content-Disposition"])
+        self.assertEqual(len(body.splitlines()), 2)
+        export_queries = [q["sql"] for q in ctx.captured_queries if "library_borrow" in q["sql"]]
+        self.assertEqual(len(export_queries), 1)
+        self.assertIn("JOIN", export_queries[0])
+
+        for params in ({"output": "parquet"}, {"columns": "id,password"}, {"date_from": "2024-13-01"}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+        self.assertEqual(self.client.get(reverse("data-export", args=["members"])).status_code, 404)
+
+        self.client.force_login(User.objects.create_user("reader", password="x"))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class LibraryStatsTests(TestCase):
+    """Материализованная статистика библиотек: сигналы, пересчёт и эндпоинт."""
+
+    FIELDS = (
+        "books_count", "members_count", "open_borrows_count",
+        "upcoming_events_count", "next_event_at", "moderated_posts_count",
+    )
+
+    def setUp(self):
+        self.lib_a = Library.objects.create(name="Центральная", location="Москва")
+        self.lib_b = Library.objects.create(name="Районная", location="Тверь")
+        self.members = [
+            Member.objects.create(
+                first_name=f"Читатель{i}", last_name="Тестовый", email=f"reader{i}@example.com",
+                gender="male", birth_date=date(1990, 1, 1), age=35, role="reader",
+            )
+            for i in range(3)
+        ]
+
+    def snapshot(self):
+        return {row[0]: row[1:] for row in LibraryStats.objects.order_by("pk").values_list("pk", *self.FIELDS)}
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        LibraryStats.objects.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def stats(self, library):
+        return LibraryStats.objects.get(pk=library.pk)
+
+    def test_signals_match_full_rebuild(self):
+        book = Book.objects.create(name="Книга", library=self.lib_a)
+        Book.objects.create(name="Вторая", library=self.lib_b)
+        borrow = Borrow.objects.create(
+            member=self.members[0], book=book, library=self.lib_a,
+            borrow_date=date(2024, 1, 1), return_date=date(2024, 2, 1),
+        )
+        post = Posts.objects.create(
+            title="Новости", text="...", author=self.members[0], library=self.lib_a, created_at=date(2024, 1, 1),
+        )
+        self.members[0].libraries.add(self.lib_a, self.lib_b)
+        self.lib_a.members.add(self.members[1], self.members[2])
+        soon = timezone.now() + timedelta(days=3)
+        event = Event.objects.create(title="Встреча", description="...", event_date=soon, library=self.lib_a)
+        Event.objects.create(title="Прошло", description="...", event_date=timezone.now() - timedelta(days=1), library=self.lib_a)
+
+        stats = self.stats(self.lib_a)
+        self.assertEqual(
+            (stats.books_count, stats.members_count, stats.open_borrows_count,
+             stats.upcoming_events_count, stats.next_event_at, stats.moderated_posts_count),
+            (1, 3, 1, 1, soon, 0),
+        )
+        self.assertMatchesRebuild()
+
+        book.library = self.lib_b
+        book.save()
+        borrow.is_returned = True
+        borrow.save()
+        post.is_moderated = True
+        post.save()
+        event.library = self.lib_b
+        event.save()
+        self.members[1].active = False
+        self.members[1].save()
+        self.members[0].libraries.remove(self.lib_a, Library.objects.create(name="Чужая", location="-"))
+        self.assertEqual(
+            (self.stats(self.lib_a).books_count, self.stats(self.lib_b).books_count, self.stats(self.lib_a).members_count),
+            (0, 2, 1),
+        )
+        self.assertMatchesRebuild()
+
+        self.lib_a.members.clear()
+        post.delete()
+        self.members[0].delete()
+        book.delete()
+        event.delete()
+        self.assertEqual(self.stats(self.lib_b).members_count, 0)
+        self.assertMatchesRebuild()
+
+    def test_rebuild_command_and_bulk_hooks(self):
+        Book.objects.create(name="Книга", library=self.lib_a)
+        Book.objects.filter(library=self.lib_a).update(library=self.lib_b)  # в обход сигналов
+        Library.objects.bulk_create([Library(name="Без статистики", location="-")])
+
+        call_command("rebuild_library_stats", stdout=StringIO())
+        self.assertEqual((self.stats(self.lib_a).books_count, self.stats(self.lib_b).books_count), (0, 1))
+        self.assertEqual(LibraryStats.objects.count(), Library.objects.count())
+
+        out = StringIO()
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8") as fp:
+            fp.write("name,library\nИз файла,Центральная\n")
+        self.addCleanup(os.remove, fp.name)
+        call_command("import_books", fp.name, stdout=out)
+        self.assertEqual(self.stats(self.lib_a).books_count, 1)
+
+    def test_decrement_below_zero_does_not_block_delete(self):
+        # bulk_create в обход сигналов: счётчик отстаёт от данных
+        book = Book.objects.bulk_create([Book(name="Без сигналов", library=self.lib_a)])[0]
+        self.assertEqual(self.stats(self.lib_a).books_count, 0)
+
+        self.assertEqual(self.client.delete(reverse("book-detail-update-delete", args=[book.pk])).status_code, 204)
+        self.assertFalse(Book.objects.filter(pk=book.pk).exists())
+        self.assertEqual(self.stats(self.lib_a).books_count, 0)
+
+    def test_endpoint_is_one_read_query_with_current_events(self):
+        later = timezone.now() + timedelta(days=2)
+        past = timezone.now() - timedelta(minutes=1)
+        Event.objects.create(title="Прошло", description="...", event_date=timezone.now() + timedelta(days=1), library=self.lib_a)
+        Event.objects.create(title="Позже", description="...", event_date=later, library=self.lib_a)
+        # событие «прошло»: подвинули дату в обход сигналов
+        Event.objects.filter(title="Прошло").update(event_date=past)
+        LibraryStats.objects.filter(pk=self.lib_a.pk).update(next_event_at=past)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("library-stats"))
+        self.assertEqual(response.status_code, 200)
+        row = next(row for row in response.data if row["library"] == self.lib_a.pk)
+        self.assertEqual((row["name"], row["upcoming_events_count"], row["next_event_at"]), ("Центральная", 1, later))
+        # GET ничего не пишет: сохранённая строка пересчитывается командой
+        self.assertEqual(self.stats(self.lib_a).next_event_at, past)
+        call_command("rebuild_library_stats", "--events", stdout=StringIO())
+        self.assertEqual((self.stats(self.lib_a).upcoming_events_count, self.stats(self.lib_a).next_event_at), (1, later))
 
-# Create your tests here.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("library-stats"), {"library": self.lib_b.pk})
+        self.assertEqual([row["library"] for row in response.data], [self.lib_b.pk])
+        for value in ("x", "²", "", str(10 ** 30)):
+            self.assertEqual(self.client.get(reverse("library-stats"), {"library": value}).status_code, 400, value)
@@ -1,7 +1,16 @@
 from django.urls import path
-from .api_views import book_list_create, book_detail_update_delete
+from . import async_views
+from .api_views import book_import, book_list_create, book_detail_update_delete, data_export, library_stats, overdue_report
 
 urlpatterns = [
     path('books/', book_list_create, name='book-list-create'),
+    path('books/import/', book_import, name='book-import'),
     path('books/<int:pk>/', book_detail_update_delete, name='book-detail-update-delete'),
+    path('borrows/overdue-report/', overdue_report, name='borrow-overdue-report'),
+    path('libraries/stats/', library_stats, name='library-stats'),
+    path('exports/<str:dataset>/', data_export, name='data-export'),
+
+    # async-версии (ASGI)
+    path('async/books/', async_views.book_list, name='async-book-list'),
+    path('async/books/<int:pk>/', async_views.book_detail, name='async-book-detail'),
 ]
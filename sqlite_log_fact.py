@@ -1,9 +1,27 @@
 import sqlite3
 
-def trace_callback(stmt):
-    print("[SQL]", stmt)
+from core.sqltrace import QueryStats
+
 
 class TracedConnection(sqlite3.Connection):
+    """
+    sqlite3-соединение для скриптов вне Django.
+
+    Раньше печатало каждый запрос; под нагрузкой это бесполезно. Теперь
+    запросы складываются в QueryStats (те же отпечатки, что у
+    core.sqltrace.SQLTraceMiddleware): сколько выполнено и какие повторялись.
+    set_trace_callback не сообщает время выполнения, поэтому длительность
+    здесь не учитывается — для замеров внутри Django используйте middleware.
+
+        conn = sqlite3.connect("db.sqlite3", factory=TracedConnection)
+        ...
+        print(conn.stats.as_dict())
+    """
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.set_trace_callback(trace_callback)
+        self.stats = QueryStats()
+        self.set_trace_callback(self.trace)
+
+    def trace(self, statement):
+        self.stats.record(statement, 0.0)